@@ -1,64 +1,1477 @@
-from InquirerPy import inquirer
-from InquirerPy.base.control import Choice
-import requests
-import pandas as pd
+import importlib
+import importlib.util
 import os
+import sys
 from rich import print
-from rich.progress import track
 import time
 import logging
+import json
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+
+
+
+class LazyModule:
+    """
+    Módulo importado só no primeiro acesso a um atributo. Mantém a inicialização rápida: o
+    menu aparece e a CLI responde (--help, erros de uso) sem esperar pandas, requests e
+    InquirerPy, que juntos levam quase um segundo para carregar.
+    """
+
+    def __init__(self, name):
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
+
+    def load(self):
+        module = self.__dict__["_module"]
+        if module is None:
+            module = importlib.import_module(self.__dict__["_name"])
+            self.__dict__["_module"] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+    def __repr__(self):
+        state = "carregado" if self.__dict__["_module"] is not None else "não carregado"
+        return f"<módulo preguiçoso '{self.__dict__['_name']}' ({state})>"
+
+
+pd = LazyModule("pandas")
+requests = LazyModule("requests")
+asyncio = LazyModule("asyncio")
+# O modo não interativo (CLI) não depende do InquirerPy
+inquirer = LazyModule("InquirerPy.inquirer") if importlib.util.find_spec("InquirerPy") else None
+
+
+def Choice(*args, **kwargs):
+    """Opção de menu do InquirerPy (importado só quando o menu é montado)."""
+    from InquirerPy.base.control import Choice as InquirerChoice
+
+    return InquirerChoice(*args, **kwargs)
+
+
+def track(*args, **kwargs):
+    """Barra de progresso do rich (o rich.progress só é importado na primeira barra)."""
+    from rich.progress import track as rich_track
+
+    return rich_track(*args, **kwargs)
+
 
 # Configuração do logger
 logging.basicConfig(filename='app.log', level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# --------------------- Métricas por etapa --------------------- #
+# Cada ação registra suas etapas (carga, passos, gravação...) com tempo de parede, CPU, pico de
+# memória, linhas e bytes. As métricas aparecem no resumo e são gravadas como JSON lines em
+# METRICS_LOG_PATH (ao lado do app.log); DATAMAGI_METRICAS define outro arquivo ou "0" desativa.
+METRICS_LOG_PATH = os.environ.get("DATAMAGI_METRICAS", "app_metrics.jsonl")
+
+
+def peak_rss_mb():
+    """Pico de memória (RSS) do processo até agora, em MB; None onde o módulo resource não existe (Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+class ActionMetrics:
+    """
+    Métricas de uma ação, por etapa. Enquanto a ação está ativa (bloco `with`), a leitura e a
+    gravação de tabelas e os passos de receita registram suas etapas automaticamente (via
+    metrics_stage); etapas aninhadas contam dentro da etapa externa. Ao sair, o tempo não
+    coberto por etapas vira a etapa "demais" e o registro é gravado em METRICS_LOG_PATH.
+    """
+
+    active = None
+
+    def __init__(self, action, origin="menu", **context):
+        self.action = action
+        self.origin = origin
+        self.context = context
+        self.stages = []
+        self.status = "ok"
+        self._depth = 0
+
+    def __enter__(self):
+        self._previous = ActionMetrics.active
+        ActionMetrics.active = self
+        self._started = time.perf_counter()
+        self._cpu_started = time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        ActionMetrics.active = self._previous
+        self.duration = time.perf_counter() - self._started
+        self.cpu = time.process_time() - self._cpu_started
+        if exc_type is not None:
+            self.status = "erro"
+        self.write()
+        return False
+
+    @contextmanager
+    def stage(self, name, **fields):
+        """Mede uma etapa; a etapa pode completar `fields` (linhas_saida, bytes_gravados...) pelo dict retornado."""
+        info = dict(fields)
+        self._depth += 1
+        if self._depth > 1:
+            try:
+                yield info
+            finally:
+                self._depth -= 1
+            return
+
+        started, cpu_started, rss_before = time.perf_counter(), time.process_time(), peak_rss_mb()
+        try:
+            yield info
+        finally:
+            self._depth -= 1
+            rss_after = peak_rss_mb()
+            entry = {
+                "etapa": name,
+                "duracao_s": round(time.perf_counter() - started, 3),
+                "cpu_s": round(time.process_time() - cpu_started, 3),
+                "pico_rss_mb": round(rss_after, 1) if rss_after is not None else None,
+                "aumento_rss_mb": round(rss_after - rss_before, 1) if rss_after is not None else None,
+            }
+            entry.update((key, value) for key, value in info.items() if value is not None)
+            self.stages.append(entry)
+
+    def report(self):
+        """Registro completo da ação (o mesmo gravado no arquivo de métricas)."""
+        import datetime
+
+        stages = list(self.stages)
+        duration = getattr(self, "duration", time.perf_counter() - self._started)
+        cpu = getattr(self, "cpu", time.process_time() - self._cpu_started)
+        rest = duration - sum(s["duracao_s"] for s in stages)
+        if stages and rest >= 0.01:
+            stages.append({"etapa": "demais", "duracao_s": round(rest, 3),
+                           "cpu_s": round(max(0.0, cpu - sum(s["cpu_s"] for s in stages)), 3)})
+        peak = peak_rss_mb()
+        return {
+            "data": datetime.datetime.now().isoformat(timespec="seconds"),
+            "acao": self.action,
+            "origem": self.origin,
+            "status": self.status,
+            "duracao_s": round(duration, 3),
+            "cpu_s": round(cpu, 3),
+            "pico_rss_mb": round(peak, 1) if peak is not None else None,
+            "pid": os.getpid(),
+            **self.context,
+            "etapas": stages,
+        }
+
+    def write(self, path=None):
+        path = path or METRICS_LOG_PATH
+        if path == "0":
+            return
+        try:
+            # Uma única escrita por registro: processos do lote podem gravar no mesmo arquivo
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(self.report(), ensure_ascii=False, default=str) + "\n")
+        except OSError as e:
+            logging.warning(f"Não foi possível gravar as métricas em '{path}': {e}")
+
+    def print_summary(self):
+        """Mostra as etapas no padrão dos resumos das ações (somente se alguma etapa foi registrada)."""
+        report = self.report()
+        if not self.stages:
+            return
+        print("[bold yellow]╔══ Métricas por Etapa ══╗[/bold yellow]")
+        for stage in report["etapas"]:
+            label = stage["etapa"] + (f" ({os.path.basename(stage['arquivo'])})" if stage.get("arquivo") else "")
+            print(f"[cyan]• {label}:[/cyan] {describe_stage(stage)}")
+        total = f"{report['duracao_s']:.2f}s (CPU {report['cpu_s']:.2f}s)"
+        if report["pico_rss_mb"] is not None:
+            total += f", pico {report['pico_rss_mb']:,.0f} MB"
+        print(f"[cyan]• Total:[/cyan] {total}")
+        print("[bold yellow]╚════════════════════════╝[/bold yellow]\n")
+
+
+def describe_stage(stage):
+    """Texto de uma etapa para os resumos: tempo, CPU, memória, linhas e bytes."""
+    parts = [f"{stage['duracao_s']:.2f}s (CPU {stage['cpu_s']:.2f}s)"]
+    if stage.get("pico_rss_mb") is not None:
+        parts.append(f"pico {stage['pico_rss_mb']:,.0f} MB (+{stage['aumento_rss_mb']:,.0f})")
+    if "linhas_entrada" in stage or "linhas_saida" in stage:
+        rows_in, rows_out = stage.get("linhas_entrada"), stage.get("linhas_saida")
+        parts.append(f"{rows_in:,} → {rows_out:,} linhas" if rows_in is not None and rows_out is not None
+                     else f"{rows_out if rows_out is not None else rows_in:,} linhas")
+    for key, label in (("bytes_lidos", "lidos"), ("bytes_gravados", "gravados")):
+        if stage.get(key) is not None:
+            parts.append(f"{stage[key] / 1024 / 1024:,.1f} MB {label}")
+    if stage.get("cache"):
+        parts.append("cache")
+    return ", ".join(parts)
+
+
+def metrics_stage(name, **fields):
+    """Etapa da ação ativa; sem ação ativa, apenas devolve o dict de campos (sem medir)."""
+    if ActionMetrics.active is None:
+        return nullcontext(dict(fields))
+    return ActionMetrics.active.stage(name, **fields)
+
+
+def run_action(func):
+    """
+    Executa uma ação do menu registrando as métricas por etapa e mostrando-as ao final.
+    Com DATAMAGI_PERFIL=cpu|memoria, a ação também é perfilada (artefatos em PROFILE_DIR).
+    """
+    mode = os.environ.get("DATAMAGI_PERFIL")
+    if mode and mode not in PROFILE_MODES:
+        print(f"[yellow]DATAMAGI_PERFIL='{mode}' ignorado. Use: {', '.join(PROFILE_MODES)}[/yellow]")
+        mode = None
+    profiler = nullcontext()
+    if mode:
+        stamp = time.strftime("%Y%m%d_%H%M%S")
+        profiler = ActionProfiler(mode, os.path.join(PROFILE_DIR, f"{func.__name__}_{stamp}"))
+    with profiler:
+        with ActionMetrics(func.__name__) as metrics:
+            result = func()
+    metrics.print_summary()
+    if mode:
+        print(f"[dim]Perfil ({mode}) gravado em: {', '.join(profiler.artifacts)}[/dim]\n")
+    return result
+
+
+# --------------------- Perfil de execução (diagnóstico) --------------------- #
+# Modo opcional para investigar uma ação lenta sem alterar o código: "cpu" grava o perfil
+# determinístico do cProfile (.pstats) e as pilhas amostradas no formato "collapsed" (para
+# flamegraph.pl, speedscope, etc.); "memoria" rastreia alocações com o tracemalloc.
+# Só o processo principal é perfilado (os processos de blocos/lotes não).
+PROFILE_MODES = ("cpu", "memoria")
+PROFILE_DIR = os.path.join(os.path.expanduser("~"), ".datamagi", "perfis")
+PROFILE_SAMPLE_INTERVAL = 0.005  # segundos entre amostras de pilha
+PROFILE_TRACE_FRAMES = 5  # quadros por alocação no modo memoria; cada quadro a mais deixa a ação mais lenta
+
+
+class StackSampler:
+    """Amostra periodicamente a pilha de uma thread e conta as pilhas iguais (formato collapsed)."""
+
+    def __init__(self, thread_id, interval=PROFILE_SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts = {}
+        self._labels = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="datamagi-amostragem", daemon=True)
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            label = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ",")
+            self._labels[code] = label
+        return label
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                key = ";".join(reversed(stack))
+                self.counts[key] = self.counts.get(key, 0) + 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write_collapsed(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in sorted(self.counts.items()):
+                f.write(f"{stack} {count}\n")
+
+
+class ActionProfiler:
+    """
+    Perfila o bloco `with` no modo escolhido e grava os artefatos com o prefixo `base_path`:
+    - "cpu": <base>.perfil.pstats (cProfile) e <base>.perfil.collapsed (pilhas amostradas);
+    - "memoria": <base>.perfil.memoria.txt (maiores alocações no pico e ao final) e
+      <base>.perfil.tracemalloc (snapshot do pico, para tracemalloc.Snapshot.load).
+    """
+
+    def __init__(self, mode, base_path):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Modo de perfil desconhecido: '{mode}'. Use: {', '.join(PROFILE_MODES)}")
+        self.mode = mode
+        self.base_path = base_path
+        suffixes = (".perfil.pstats", ".perfil.collapsed") if mode == "cpu" else (".perfil.memoria.txt", ".perfil.tracemalloc")
+        self.artifacts = [base_path + suffix for suffix in suffixes]
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.base_path)), exist_ok=True)
+        if self.mode == "cpu":
+            import cProfile
+
+            self._sampler = StackSampler(threading.get_ident())
+            self._profile = cProfile.Profile()
+            self._sampler.start()
+            self._profile.enable()
+        else:
+            import tracemalloc
+
+            self._started_tracing = not tracemalloc.is_tracing()
+            if self._started_tracing:
+                tracemalloc.start(PROFILE_TRACE_FRAMES)
+            tracemalloc.reset_peak()
+            # Guarda um snapshot próximo do pico: as maiores alocações costumam já ter sido
+            # liberadas ao final da ação
+            self._peak_snapshot, self._peak_bytes = None, 0
+            self._stop = threading.Event()
+            self._watcher = threading.Thread(target=self._watch_peak, name="datamagi-pico", daemon=True)
+            self._watcher.start()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self._started
+        try:
+            if self.mode == "cpu":
+                self._profile.disable()
+                self._sampler.stop()
+                self._profile.dump_stats(self.artifacts[0])
+                self._sampler.write_collapsed(self.artifacts[1])
+            else:
+                self._write_memory_report(elapsed)
+            logging.info(f"Perfil ({self.mode}) gravado em: {', '.join(self.artifacts)}")
+        except OSError as e:
+            logging.error(f"Não foi possível gravar o perfil em '{self.base_path}': {e}")
+        return False
+
+    def _watch_peak(self, interval=0.1, growth=1.25, floor=16 * 1024 * 1024):
+        """Tira um novo snapshot quando a memória rastreada passa de 16 MB e cresce 25% sobre o último."""
+        import tracemalloc
+
+        while not self._stop.wait(interval):
+            current = tracemalloc.get_traced_memory()[0]
+            if current > max(self._peak_bytes * growth, floor):
+                self._peak_snapshot, self._peak_bytes = tracemalloc.take_snapshot(), current
+
+    def _write_memory_report(self, elapsed):
+        import tracemalloc
+
+        self._stop.set()
+        self._watcher.join()
+        final = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        if self._started_tracing:
+            tracemalloc.stop()
+        ignore = [tracemalloc.Filter(False, tracemalloc.__file__)]
+        snapshot = (self._peak_snapshot or final).filter_traces(ignore)
+        snapshot.dump(self.artifacts[1])
+
+        with open(self.artifacts[0], "w", encoding="utf-8") as f:
+            f.write(f"Duração: {elapsed:.2f}s\n")
+            f.write(f"Pico de memória rastreada: {peak / 1024 / 1024:,.1f} MB\n")
+            f.write(f"Memória no snapshot do pico: {self._peak_bytes / 1024 / 1024:,.1f} MB\n")
+            f.write(f"Memória rastreada ao final: {current / 1024 / 1024:,.1f} MB\n\n")
+            f.write("Maiores alocações no pico, por linha:\n")
+            for stat in snapshot.statistics("lineno")[:30]:
+                f.write(f"  {stat}\n")
+            f.write("\nMaiores alocações no pico, por pilha:\n")
+            for stat in snapshot.statistics("traceback")[:10]:
+                f.write(f"\n  {stat.size / 1024 / 1024:,.1f} MB em {stat.count:,} blocos\n")
+                for line in stat.traceback.format(limit=10):
+                    f.write(f"    {line}\n")
+            f.write("\nMaiores alocações ainda vivas ao final, por linha:\n")
+            for stat in final.filter_traces(ignore).statistics("lineno")[:10]:
+                f.write(f"  {stat}\n")
+
+
+# --------------------- Leitura e gravação de arquivos --------------------- #
+EXCEL_EXTENSIONS = (".xlsx", ".xlsb", ".xls")
+CSV_EXTENSIONS = (".csv", ".txt")
+COMPRESSED_CSV_EXTENSIONS = (".csv.gz", ".txt.gz", ".csv.zst", ".txt.zst")
+COLUMNAR_EXTENSIONS = (".parquet", ".feather")
+TABLE_EXTENSIONS = EXCEL_EXTENSIONS + CSV_EXTENSIONS + COMPRESSED_CSV_EXTENSIONS + COLUMNAR_EXTENSIONS
+
+# Formatos de saída aceitos por --formato / prompts de formato
+OUTPUT_FORMATS = {
+    "xlsx": ".xlsx",
+    "csv": ".csv",
+    "csv.gz": ".csv.gz",
+    "csv.zst": ".csv.zst",
+    "parquet": ".parquet",
+    "feather": ".feather",
+}
+
+
+def table_extension(file_path):
+    """Extensão do arquivo considerando a compressão (ex.: '.csv.gz'); '' se não for suportada."""
+    lower = file_path.lower()
+    for ext in COMPRESSED_CSV_EXTENSIONS + EXCEL_EXTENSIONS + CSV_EXTENSIONS + COLUMNAR_EXTENSIONS:
+        if lower.endswith(ext):
+            return ext
+    return ""
+
+
+def with_table_extension(file_path, ext):
+    """Troca a extensão do arquivo (inclusive '.csv.gz' e similares) por `ext`."""
+    current = table_extension(file_path) or os.path.splitext(file_path)[1]
+    return (file_path[:-len(current)] if current else file_path) + ext
+
+
+def open_binary(file_path):
+    """Abre o arquivo para leitura binária, descompactando .gz e .zst de forma transparente."""
+    lower = file_path.lower()
+    if lower.endswith(".gz"):
+        import gzip
+        return gzip.open(file_path, "rb")
+    if lower.endswith(".zst"):
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("Arquivos .zst exigem o pacote zstandard (pip install zstandard).")
+        return zstandard.open(file_path, "rb")
+    return open(file_path, "rb")
+
+
+def open_text_output(file_path, append=False):
+    """
+    Abre o arquivo para escrita de texto utf-8, compactando .gz e .zst (usado na gravação em blocos).
+    Com `append`, acrescenta ao fim; nos compactados isso grava um novo membro/quadro, que os
+    leitores tratam como continuação do mesmo arquivo.
+    """
+    mode = "at" if append else "wt"
+    lower = file_path.lower()
+    if lower.endswith(".gz"):
+        import gzip
+        return gzip.open(file_path, mode, encoding="utf-8", newline="")
+    if lower.endswith(".zst"):
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("Arquivos .zst exigem o pacote zstandard (pip install zstandard).")
+        return zstandard.open(file_path, mode, encoding="utf-8", newline="")
+    return open(file_path, mode[0], encoding="utf-8", newline="")
+
+
+def detect_csv_separator(file_path):
+    """Detecta o separador do CSV (';' ou ',') pela primeira linha."""
+    with open_binary(file_path) as f:
+        first_line = f.readline().decode("latin-1")
+    return ";" if first_line.count(";") >= first_line.count(",") else ","
+
+
+def read_table(file_path, usecols=None, dtype=str, cache=True, compact=None, **kwargs):
+    """
+    Carrega um arquivo XLSX/XLS/XLSB, CSV (também .gz/.zst), Parquet ou Feather como
+    DataFrame (por padrão tudo como string).
+    - CSV: separador detectado pela primeira linha e fallback de encoding utf-8 -> latin-1.
+    - cache: reaproveita a leitura anterior do mesmo arquivo nesta sessão (FRAME_CACHE).
+    - Se houver cache colunar (Parquet) atualizado do arquivo, ele é lido no lugar da origem.
+    - compact: texto em strings Arrow e colunas de baixa cardinalidade como categorias
+      (padrão: ativo; DATAMAGI_COMPACTAR=0 desativa). O relatório de memória fica em df.attrs["memoria"].
+    """
+    if compact is None:
+        compact = os.environ.get("DATAMAGI_COMPACTAR", "1") != "0"
+    loader = _read_table_compact if compact and dtype is str else _read_table_uncached
+    if cache:
+        return FRAME_CACHE.load(file_path, loader, usecols=usecols, dtype=dtype, **kwargs)
+    with metrics_stage("carga", arquivo=file_path, bytes_lidos=os.path.getsize(file_path)) as stage:
+        df = loader(file_path, usecols=usecols, dtype=dtype, **kwargs)
+        stage["linhas_saida"] = len(df)
+    return df
+
+
+def _read_table_compact(file_path, usecols=None, dtype=str, **kwargs):
+    """Leitura já em strings Arrow (quando disponível), seguida da conversão para categorias."""
+    return compact_frame(_read_table_uncached(file_path, usecols=usecols, dtype=text_dtype(), **kwargs))
+
+
+def _read_table_uncached(file_path, usecols=None, dtype=str, **kwargs):
+    if is_text_dtype(dtype) and not kwargs:
+        df = read_columnar_cache(file_path, usecols, dtype=dtype)
+        if df is not None:
+            return df
+    return _parse_table(file_path, usecols=usecols, dtype=dtype, **kwargs)
+
+
+def _parse_table(file_path, usecols=None, dtype=str, **kwargs):
+    """Lê o arquivo de origem (sem cache)."""
+    lower = file_path.lower()
+    if lower.endswith(EXCEL_EXTENSIONS):
+        engine = "pyxlsb" if lower.endswith(".xlsb") else None
+        return pd.read_excel(file_path, dtype=dtype, usecols=usecols, engine=engine, **kwargs)
+    if lower.endswith(CSV_EXTENSIONS + COMPRESSED_CSV_EXTENSIONS):
+        sep = detect_csv_separator(file_path)
+        # Com dtype de texto não há inferência de tipos: o parser pode tokenizar em blocos,
+        # o que reduz o pico de memória (principalmente lendo poucas colunas de um arquivo largo)
+        low_memory = is_text_dtype(dtype)
+        try:
+            return pd.read_csv(file_path, sep=sep, encoding="utf-8", dtype=dtype, usecols=usecols,
+                               low_memory=low_memory, **kwargs)
+        except UnicodeDecodeError:
+            return pd.read_csv(file_path, sep=sep, encoding="latin-1", dtype=dtype, usecols=usecols,
+                               low_memory=low_memory, **kwargs)
+    if lower.endswith(COLUMNAR_EXTENSIONS):
+        if callable(usecols) or (usecols is not None and any(isinstance(c, int) for c in usecols)):
+            raise ValueError("Para Parquet/Feather, informe as colunas pelo nome.")
+        columns = list(usecols) if usecols is not None else None
+        reader = pd.read_parquet if lower.endswith(".parquet") else pd.read_feather
+        df = reader(file_path, columns=columns)
+        if "nrows" in kwargs:
+            df = df.head(kwargs["nrows"])
+        if is_text_dtype(dtype):
+            df = _as_text_frame(df, dtype)
+        return df
+    raise ValueError(f"Formato de arquivo não suportado: {file_path}")
+
+
+def output_path_for(input_file, output_dir, prefix, formato=None):
+    """
+    Caminho de saída padrão: `prefixo + nome da entrada` em `output_dir`, no mesmo formato da
+    entrada (Excel é gravado como .xlsx) ou no `formato` pedido (chave de OUTPUT_FORMATS).
+    """
+    name = os.path.basename(input_file)
+    ext = table_extension(name)
+    if formato:
+        ext = OUTPUT_FORMATS[formato]
+    elif ext in EXCEL_EXTENSIONS:
+        ext = ".xlsx"
+    return os.path.join(output_dir, prefix + with_table_extension(name, ext))
+
+
+def _as_text_frame(df, dtype=str):
+    """
+    Deixa um DataFrame lido de Parquet/Feather igual à leitura de CSV com o mesmo dtype:
+    texto com vazios como NaN (dtype=str) ou strings Arrow.
+    """
+    for column in df.columns:
+        values = df[column]
+        if dtype is not str:
+            if values.dtype != dtype:
+                df[column] = values.astype(dtype)
+        elif values.dtype != object:
+            df[column] = values.astype(str).where(values.notna(), float("nan"))
+        elif values.isna().any():
+            df[column] = values.where(values.notna(), float("nan"))
+    return df
+
+
+# --------------------- Uso de memória (strings Arrow e categorias) --------------------- #
+# Colunas de texto como objetos Python custam ~50-70 bytes por célula. Strings Arrow guardam
+# os caracteres em um buffer contínuo, e colunas com poucos valores distintos (UF, sexo, banco,
+# agência, UPAG...) viram categorias: um código inteiro por linha.
+COMPACT_MIN_ROWS = 10_000        # abaixo disso não vale converter para categoria
+COMPACT_MAX_UNIQUE_RATIO = 0.1   # até 10% de valores distintos
+COMPACT_MAX_CATEGORIES = 10_000
+
+
+def text_dtype():
+    """dtype de texto usado na leitura: strings Arrow se houver pyarrow (DATAMAGI_ARROW_STRINGS=0 desativa)."""
+    if os.environ.get("DATAMAGI_ARROW_STRINGS", "1") != "0" and pyarrow_available():
+        return pd.StringDtype("pyarrow")
+    return str
+
+
+def is_text_dtype(dtype):
+    return dtype is str or isinstance(dtype, pd.StringDtype)
+
+
+def as_text(series):
+    """Devolve a série como texto comum quando ela é categórica (para fillna/atribuições com valores novos)."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.astype(series.cat.categories.dtype)
+    return series
+
+
+def transform_unique(series, func):
+    """
+    Aplica `func` a cada valor distinto da série, em vez de a cada linha, e espalha os
+    resultados pelas linhas com pd.factorize. Para funções sem efeitos colaterais o resultado é
+    o mesmo de `series.apply(func)`. Colunas como CEP, agência, banco, UF ou data de nascimento
+    têm muito menos valores distintos que linhas. Os valores ausentes chamam `func` uma vez.
+    """
+    codes, uniques = pd.factorize(series)
+    results = [func(value) for value in uniques]
+    missing = codes < 0
+    if missing.any():
+        # Último item da tabela: o código -1 dos ausentes aponta para ele
+        results.append(func(series.iloc[int(missing.argmax())]))
+    table = pd.Series(results, dtype=object).to_numpy()
+    return pd.Series(table[codes], index=series.index, name=series.name).infer_objects()
+
+
+def estimated_object_bytes(series):
+    """Estimativa do tamanho da coluna se fosse armazenada como objetos Python (str)."""
+    if series.dtype == object:
+        return int(series.memory_usage(index=False, deep=True))
+    lengths = series.astype("string").str.len()
+    filled = int(lengths.notna().sum())
+    return int(8 * len(series) + 49 * filled + lengths.sum(skipna=True))
+
+
+def frame_memory_bytes(df):
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def memory_summary(df):
+    """Resumo do relatório de memória gravado por compact_frame (em MB), ou None."""
+    report = df.attrs.get("memoria")
+    if not report:
+        return None
+    before, after = report["bytes_sem_compactacao"], report["bytes"]
+    return {
+        "antes_mb": round(before / 1024 / 1024, 1),
+        "depois_mb": round(after / 1024 / 1024, 1),
+        "reducao": f"{before / after:.1f}x" if after else None,
+        "categoricas": report["categoricas"],
+    }
+
+
+def compact_frame(df, min_rows=COMPACT_MIN_ROWS, max_unique_ratio=COMPACT_MAX_UNIQUE_RATIO,
+                  max_categories=COMPACT_MAX_CATEGORIES):
+    """
+    Reduz o uso de memória das colunas de texto: baixa cardinalidade -> categoria; demais ->
+    strings Arrow (se disponível). Registra o relatório em df.attrs["memoria"].
+    """
+    arrow = text_dtype()
+    before = 0
+    categorical = []
+    for column in df.columns:
+        values = df[column]
+        if not (values.dtype == object or isinstance(values.dtype, pd.StringDtype)):
+            before += int(values.memory_usage(index=False, deep=True))
+            continue
+        before += estimated_object_bytes(values)
+        if len(df) >= min_rows:
+            unique = values.nunique(dropna=True)
+            if unique <= max_categories and unique <= max_unique_ratio * len(df):
+                df[column] = values.astype("category")
+                categorical.append(column)
+                continue
+        if arrow is not str and values.dtype == object:
+            df[column] = values.astype(arrow)
+
+    df.attrs["memoria"] = {
+        "bytes_sem_compactacao": before + int(df.index.memory_usage(deep=True)),
+        "bytes": frame_memory_bytes(df),
+        "categoricas": categorical,
+    }
+    return df
+
+
+def write_table(df, file_path):
+    """
+    Salva o DataFrame no formato indicado pela extensão: .xlsx, CSV com ';' e utf-8
+    (.csv/.txt, compactado com .gz ou .zst), .parquet ou .feather.
+    """
+    lower = file_path.lower()
+    if not lower.endswith((".xlsx",) + CSV_EXTENSIONS + COMPRESSED_CSV_EXTENSIONS + COLUMNAR_EXTENSIONS):
+        raise ValueError(f"Formato de saída não suportado: {file_path}")
+    with metrics_stage("gravacao", arquivo=file_path, linhas_entrada=len(df)) as stage:
+        if lower.endswith(".xlsx"):
+            df.to_excel(file_path, index=False, engine="openpyxl")
+        elif lower.endswith(CSV_EXTENSIONS + COMPRESSED_CSV_EXTENSIONS):
+            df.to_csv(file_path, index=False, sep=';', encoding='utf-8')
+        else:
+            if not pyarrow_available():
+                raise ImportError("Parquet/Feather exigem o pacote pyarrow (pip install pyarrow).")
+            # Esses formatos exigem nomes de coluna em texto e índice padrão
+            df = df.rename(columns=str).reset_index(drop=True)
+            if lower.endswith(".parquet"):
+                df.to_parquet(file_path, index=False, compression="zstd")
+            else:
+                df.to_feather(file_path)
+        stage["bytes_gravados"] = os.path.getsize(file_path)
+    return file_path
+
+
+class FrameCache:
+    """
+    Cache de DataFrames da sessão: evita reler o mesmo arquivo entre ações do menu.
+    A chave inclui caminho, data de modificação, tamanho e as opções de leitura, então
+    um arquivo alterado em disco é relido automaticamente. Os frames mais antigos são
+    descartados (LRU) quando o uso de memória passa de `max_bytes`.
+    """
+
+    def __init__(self, max_bytes=None):
+        if max_bytes is None:
+            max_bytes = int(os.environ.get("DATAMAGI_CACHE_MB", "1024")) * 1024 * 1024
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries = OrderedDict()  # chave -> (DataFrame, bytes)
+        self._lock = threading.Lock()
+        self.stats = {"acertos": 0, "leituras": 0, "descartados": 0}
+
+    @staticmethod
+    def _key(file_path, reader, options):
+        stat = os.stat(file_path)
+        return (os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size,
+                getattr(reader, "__name__", repr(reader)), repr(sorted(options.items())))
+
+    def load(self, file_path, reader, copy=True, **options):
+        """
+        Retorna `reader(file_path, **options)`, usando o cache quando possível.
+        Por padrão devolve uma cópia, para que a ação possa alterar o DataFrame livremente.
+        """
+        if self.max_bytes <= 0:
+            with metrics_stage("carga", arquivo=file_path, bytes_lidos=os.path.getsize(file_path)) as stage:
+                df = reader(file_path, **options)
+                stage["linhas_saida"] = len(df)
+            return df
+
+        key = self._key(file_path, reader, options)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.stats["acertos"] += 1
+                with metrics_stage("carga", arquivo=file_path, cache=True, linhas_saida=len(entry[0])):
+                    return entry[0].copy() if copy else entry[0]
+
+        with metrics_stage("carga", arquivo=file_path, bytes_lidos=key[2]) as stage:
+            df = reader(file_path, **options)
+            stage["linhas_saida"] = len(df)
+        size = int(df.memory_usage(index=True, deep=True).sum())
+        with self._lock:
+            self.stats["leituras"] += 1
+            # Versões antigas do mesmo arquivo não serão mais usadas
+            for stale in [k for k in self._entries if k[0] == key[0] and k[1:3] != key[1:3]]:
+                self._discard(stale)
+            if size <= self.max_bytes:
+                self._entries[key] = (df, size)
+                self.total_bytes += size
+                while self.total_bytes > self.max_bytes:
+                    self._discard(next(iter(self._entries)))
+                    self.stats["descartados"] += 1
+        return df.copy() if copy else df
+
+    def _discard(self, key):
+        _, size = self._entries.pop(key)
+        self.total_bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+
+FRAME_CACHE = FrameCache()
+
+
+def disable_frame_cache():
+    """
+    Desliga o cache da sessão neste processo. A CLI e os processos do pool leem cada arquivo
+    uma vez só: o cache apenas dobraria a memória (cópia) e mediria o frame à toa.
+    """
+    FRAME_CACHE.clear()
+    FRAME_CACHE.max_bytes = 0
+
+
+def probe_table(file_path, sample_rows=5, sample_bytes=64 * 1024):
+    """
+    Lê apenas o cabeçalho e algumas linhas do arquivo, sem carregar o restante.
+    - XLSX: primeiras linhas da primeira planilha em modo streaming (openpyxl read_only).
+    - CSV (inclusive .gz/.zst): primeiros `sample_bytes` bytes, cortados na última linha completa.
+    - Parquet: apenas o primeiro lote de linhas.
+    - XLS/XLSB/Feather: leitura limitada a `sample_rows` linhas.
+    Retorna um DataFrame pequeno, com os mesmos nomes de colunas da leitura completa.
+    """
+    import io
+    from itertools import islice
+
+    lower = file_path.lower()
+    if lower.endswith(".xlsx"):
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            rows = list(islice(workbook.worksheets[0].iter_rows(values_only=True), sample_rows + 1))
+        finally:
+            workbook.close()
+        if not rows:
+            return pd.DataFrame()
+        header = list(rows[0])
+        while header and header[-1] is None:
+            header.pop()
+        # Mesmos nomes que o pandas gera para cabeçalhos vazios ou repetidos
+        columns, seen = [], {}
+        for idx, name in enumerate(header):
+            name = f"Unnamed: {idx}" if name is None else name
+            if name in seen:
+                seen[name] += 1
+                name = f"{name}.{seen[name]}"
+            else:
+                seen[name] = 0
+            columns.append(name)
+        data = [list(row[:len(columns)]) + [None] * (len(columns) - len(row)) for row in rows[1:]]
+        return pd.DataFrame(data, columns=columns)
+
+    if lower.endswith(CSV_EXTENSIONS + COMPRESSED_CSV_EXTENSIONS):
+        with open_binary(file_path) as f:
+            raw = f.read(sample_bytes)
+            if f.read(1):
+                raw = raw[:raw.rfind(b"\n") + 1] or raw
+        try:
+            text = raw.decode("utf-8")
+        except UnicodeDecodeError:
+            text = raw.decode("latin-1")
+        return pd.read_csv(io.StringIO(text), sep=detect_csv_separator(file_path), dtype=str, nrows=sample_rows)
+
+    if lower.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(file_path)
+        batch = next(parquet_file.iter_batches(batch_size=sample_rows), None)
+        if batch is None:
+            return parquet_file.schema_arrow.empty_table().to_pandas()
+        return batch.to_pandas()
+
+    return _read_table_uncached(file_path, nrows=sample_rows)
+
+
+def ask_output_format(message="Formato do arquivo de saída:"):
+    """Pergunta o formato de saída; retorna None para manter o formato da entrada."""
+    return inquirer.select(
+        message=message,
+        choices=[Choice(None, "Mesmo formato da entrada")] + [
+            Choice(key, label) for key, label in (
+                ("xlsx", "Excel (.xlsx)"),
+                ("csv", "CSV (.csv)"),
+                ("csv.gz", "CSV compactado (.csv.gz)"),
+                ("csv.zst", "CSV compactado (.csv.zst)"),
+                ("parquet", "Parquet (.parquet)"),
+                ("feather", "Feather (.feather)"),
+            )
+        ],
+        default=None
+    ).execute()
+
+
+def column_choices(sample_df):
+    """Opções de coluna para os prompts, com um valor de exemplo tirado da amostra."""
+    choices = []
+    for column in sample_df.columns:
+        values = sample_df[column].dropna().astype(str).str.strip()
+        values = values[values != ""]
+        label = f"{column} (ex.: {values.iloc[0][:30]})" if len(values) else str(column)
+        choices.append(Choice(column, label))
+    return choices
+
+# --------------------- Cache colunar (Parquet) --------------------- #
+# Bases reprocessadas com frequência podem ser convertidas uma vez para Parquet (strings
+# com codificação de dicionário e compressão zstd). Enquanto o arquivo de origem não mudar
+# (mesma data de modificação e tamanho), read_table lê o Parquet, apenas com as colunas pedidas.
+# Requer o pacote opcional pyarrow; sem ele, a leitura segue normalmente pelo arquivo de origem.
+COLUMNAR_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".datamagi", "colunar")
+
+
+def pyarrow_available():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def columnar_cache_paths(file_path):
+    """Caminhos (parquet, metadados) do cache colunar de um arquivo de origem."""
+    import hashlib
+
+    digest = hashlib.sha1(os.path.abspath(file_path).encode("utf-8")).hexdigest()[:16]
+    name = f"{os.path.splitext(os.path.basename(file_path))[0]}_{digest}"
+    return os.path.join(COLUMNAR_CACHE_DIR, f"{name}.parquet"), os.path.join(COLUMNAR_CACHE_DIR, f"{name}.json")
+
+
+def _source_signature(file_path):
+    stat = os.stat(file_path)
+    return {"fonte": os.path.abspath(file_path), "mtime_ns": stat.st_mtime_ns, "tamanho": stat.st_size}
+
+
+def columnar_cache_meta(file_path):
+    """Metadados do cache colunar do arquivo, se ele existir e estiver atualizado; caso contrário None."""
+    if not pyarrow_available():
+        return None
+    parquet_path, meta_path = columnar_cache_paths(file_path)
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get("assinatura") != _source_signature(file_path) or not os.path.isfile(parquet_path):
+        return None
+    return meta
+
+
+def read_columnar_cache(file_path, usecols=None, dtype=str):
+    """
+    Lê o cache colunar do arquivo, se existir e estiver atualizado; caso contrário retorna None.
+    `usecols` (lista de nomes) limita a leitura às colunas pedidas.
+    """
+    meta = columnar_cache_meta(file_path)
+    if meta is None:
+        return None
+    parquet_path = columnar_cache_paths(file_path)[0]
+
+    # O Parquet guarda os nomes como texto; cabeçalhos numéricos do Excel voltam ao tipo original
+    original_names = {str(c): c for c in meta["colunas"]}
+    columns = None
+    if usecols is not None and not callable(usecols):
+        # Como no pandas, inteiros em usecols são posições de coluna
+        columns = [str(meta["colunas"][c]) if isinstance(c, int) else str(c) for c in usecols]
+    df = _as_text_frame(pd.read_parquet(parquet_path, columns=columns), dtype)
+    df.columns = [original_names.get(c, c) for c in df.columns]
+    if callable(usecols):
+        df = df[[c for c in df.columns if usecols(c)]]
+    return df
+
+
+def build_columnar_cache(file_path, chunk_rows=500_000):
+    """
+    Converte o arquivo (CSV/Excel, tudo como string) para o cache colunar Parquet.
+    CSVs são convertidos em blocos, sem carregar o arquivo inteiro na memória.
+    Retorna um resumo com linhas, colunas e tamanhos.
+    """
+    if not pyarrow_available():
+        raise ImportError("O cache colunar requer o pacote pyarrow (pip install pyarrow).")
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    os.makedirs(COLUMNAR_CACHE_DIR, exist_ok=True)
+    parquet_path, meta_path = columnar_cache_paths(file_path)
+    signature = _source_signature(file_path)
+    temp_path = parquet_path + ".tmp"
+    rows = 0
+
+    if file_path.lower().endswith(CSV_EXTENSIONS + COMPRESSED_CSV_EXTENSIONS):
+        sep = detect_csv_separator(file_path)
+        for encoding in ("utf-8", "latin-1"):
+            writer = None
+            rows = 0
+            try:
+                for chunk in pd.read_csv(file_path, sep=sep, encoding=encoding, dtype=str,
+                                         chunksize=chunk_rows):
+                    if writer is None:
+                        columns = list(chunk.columns)
+                        schema = pa.schema([(str(c), pa.string()) for c in columns])
+                        writer = pq.ParquetWriter(temp_path, schema, compression="zstd")
+                    writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+                    rows += len(chunk)
+                break
+            except UnicodeDecodeError:
+                continue
+            finally:
+                if writer is not None:
+                    writer.close()
+    else:
+        df = _parse_table(file_path)
+        columns = list(df.columns)
+        rows = len(df)
+        df.to_parquet(temp_path, index=False, compression="zstd")
+
+    os.replace(temp_path, parquet_path)
+    meta = {"assinatura": signature, "colunas": [c if isinstance(c, int) else str(c) for c in columns], "linhas": rows}
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+    return {
+        "cache": parquet_path,
+        "linhas": rows,
+        "colunas": len(columns),
+        "bytes_origem": signature["tamanho"],
+        "bytes_cache": os.path.getsize(parquet_path),
+    }
+
+
+def default_workers():
+    """Número padrão de processos paralelos: um por núcleo (DATAMAGI_WORKERS sobrepõe)."""
+    return max(1, int(os.environ.get("DATAMAGI_WORKERS") or os.cpu_count() or 1))
+
+
+def list_input_files(source, extensions=TABLE_EXTENSIONS):
+    """Lista os arquivos suportados de uma pasta ou de um padrão glob (ex.: 'dados/*.xlsx'), em ordem alfabética."""
+    import glob
+
+    if os.path.isdir(source):
+        paths = [os.path.join(source, name) for name in os.listdir(source)]
+    else:
+        paths = glob.glob(source)
+    return sorted(p for p in paths if os.path.isfile(p) and p.lower().endswith(extensions))
+
+
+def _read_table_task(task):
+    """Lê um arquivo em um processo do pool; erros voltam como texto para não interromper o lote."""
+    file_path, kwargs = task
+    try:
+        return file_path, read_table(file_path, **kwargs), None
+    except Exception as e:
+        return file_path, None, f"{type(e).__name__}: {e}"
+
+
+def read_tables_parallel(paths, workers=None, **read_kwargs):
+    """
+    Lê vários arquivos em paralelo, um arquivo por processo.
+    Retorna [(caminho, DataFrame ou None, erro ou None)] na mesma ordem de `paths`.
+    """
+    workers = min(workers or default_workers(), len(paths))
+    tasks = [(path, read_kwargs) for path in paths]
+    if workers <= 1:
+        return [_read_table_task(task) for task in tasks]
+
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=workers, initializer=disable_frame_cache) as pool:
+        return list(pool.map(_read_table_task, tasks))
+
+
+# --------------------- Condições de filtro (motor de predicados) --------------------- #
+# Uma condição em texto é compilada uma vez em uma árvore e avaliada como máscara vetorizada
+# sobre o DataFrame (ou sobre cada bloco lido). Gramática, com palavras-chave sem acento ou caixa:
+#   condicao   := termo (ou termo)*          termo := fator (e fator)*
+#   fator      := nao fator | ( condicao ) | COLUNA comparacao
+#   comparacao := = v | != v | > v | >= v | < v | <= v | [nao] em (v, v, ...) | [nao] entre v e v
+#                 | [nao] comeca com v | [nao] termina com v | [nao] contem v | [nao] regex v | [nao] vazio
+# Colunas e valores com espaços ou palavras-chave vão entre aspas: "DATA NASC" = '01/01/2000'.
+PREDICATE_TOKEN = r"""\s*(?:(?P<texto>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')|(?P<simbolo>==|!=|<>|>=|<=|=|>|<|\(|\)|,)|(?P<palavra>[^\s()=<>!,"']+))"""
+PREDICATE_SYMBOLS = {"=": "=", "==": "=", "!=": "!=", "<>": "!=", ">": ">", ">=": ">=", "<": "<", "<=": "<="}
+PREDICATE_ORDERING = {">": "gt", ">=": "ge", "<": "lt", "<=": "le"}
+
+_PREDICATE_CACHE = {}
+
+
+class _PredicateParser:
+    """Analisador descendente da condição; gera nós ("e"|"ou", [filhos]), ("nao", filho) ou ("cmp", coluna, op, valores)."""
+
+    def __init__(self, text):
+        import re
+
+        self.text = text
+        self.tokens = []  # (tipo, valor): tipo em "texto" (entre aspas), "simbolo" ou "palavra"
+        position = 0
+        pattern = re.compile(PREDICATE_TOKEN)
+        while text[position:].strip():
+            match = pattern.match(text, position)
+            if not match:
+                raise ValueError(f"Condição inválida: caractere inesperado em '{text[position:].strip()[:20]}'")
+            kind = match.lastgroup
+            value = match.group(kind)
+            if kind == "texto":
+                # Só aspas escapadas: as barras das expressões regulares ficam como estão
+                value = re.sub(r"\\([\"'])", r"\1", value[1:-1])
+            self.tokens.append((kind, value))
+            position = match.end()
+        self.position = 0
+        self.columns = []
+
+    @staticmethod
+    def _keyword(token):
+        import unicodedata
+
+        kind, value = token
+        if kind != "palavra":
+            return None
+        return unicodedata.normalize("NFKD", value).encode("ascii", "ignore").decode().lower()
+
+    def _peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else (None, None)
+
+    def _next(self, expected="um valor"):
+        if self.position >= len(self.tokens):
+            raise ValueError(f"Condição inválida: esperado {expected} no fim de '{self.text}'")
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def _accept(self, *words):
+        """Consome a palavra-chave (ou símbolo) se for o próximo token."""
+        token = self._peek()
+        if self._keyword(token) in words or (token[0] == "simbolo" and token[1] in words):
+            self.position += 1
+            return True
+        return False
+
+    def _expect(self, *words):
+        if not self._accept(*words):
+            found = self._peek()[1]
+            raise ValueError(f"Condição inválida: esperado '{words[0]}'" + (f" antes de '{found}'" if found else " no fim"))
+
+    def _value(self):
+        kind, value = self._next()
+        if kind == "simbolo":
+            raise ValueError(f"Condição inválida: esperado um valor, encontrado '{value}'")
+        return value
+
+    def parse(self):
+        if not self.tokens:
+            raise ValueError("Condição vazia.")
+        node = self._or()
+        if self.position < len(self.tokens):
+            raise ValueError(f"Condição inválida: trecho inesperado '{self.tokens[self.position][1]}'")
+        return node
+
+    def _or(self):
+        children = [self._and()]
+        while self._accept("ou"):
+            children.append(self._and())
+        return children[0] if len(children) == 1 else ("ou", children)
+
+    def _and(self):
+        children = [self._not()]
+        while self._accept("e"):
+            children.append(self._not())
+        return children[0] if len(children) == 1 else ("e", children)
+
+    def _not(self):
+        if self._accept("nao"):
+            return ("nao", self._not())
+        if self._accept("("):
+            node = self._or()
+            self._expect(")")
+            return node
+        return self._comparison()
+
+    def _comparison(self):
+        import re
+
+        kind, column = self._next("uma coluna")
+        if kind == "simbolo":
+            raise ValueError(f"Condição inválida: esperado o nome de uma coluna, encontrado '{column}'")
+        if column not in self.columns:
+            self.columns.append(column)
+        token = self._next(f"uma comparação depois de '{column}'")
+        if token[0] == "simbolo" and token[1] in PREDICATE_SYMBOLS:
+            op = PREDICATE_SYMBOLS[token[1]]
+            node = ("cmp", column, "=" if op == "!=" else op, [self._value()])
+            return ("nao", node) if op == "!=" else node
+
+        negate = self._keyword(token) == "nao"
+        if negate:
+            token = self._next(f"uma comparação depois de '{column} nao'")
+        word = self._keyword(token)
+        if word == "em":
+            self._expect("(")
+            values = [self._value()]
+            while self._accept(","):
+                values.append(self._value())
+            self._expect(")")
+            node = ("cmp", column, "em", values)
+        elif word == "entre":
+            low = self._value()
+            self._expect("e")
+            node = ("cmp", column, "entre", [low, self._value()])
+        elif word in ("comeca", "termina"):
+            self._expect("com")
+            node = ("cmp", column, word, [self._value()])
+        elif word == "contem":
+            node = ("cmp", column, "contem", [self._value()])
+        elif word == "regex":
+            pattern = self._value()
+            try:
+                re.compile(pattern)
+            except re.error as e:
+                raise ValueError(f"Condição inválida: expressão regular '{pattern}' - {e}")
+            node = ("cmp", column, "regex", [pattern])
+        elif word in ("vazio", "vazia", "nulo"):
+            node = ("cmp", column, "vazio", [])
+        else:
+            raise ValueError(f"Condição inválida: comparação desconhecida '{token[1]}' depois de '{column}'")
+        return ("nao", node) if negate else node
+
+
+class Predicate:
+    """
+    Condição compilada (ver a gramática acima). `mask(df)` devolve um array booleano por linha.
+    Comparações com célula vazia são falsas; `!=` e `nao` são a negação, então incluem as vazias.
+    Igualdade e listas comparam o texto exato (zeros à esquerda contam). Colunas numéricas e de
+    data do Excel comparam como número/data. >, <, entre usam número quando os valores são
+    numéricos e texto nos demais casos (ex.: datas ISO).
+    """
+
+    def __init__(self, text):
+        parser = _PredicateParser(text)
+        self.text = text
+        self.node = parser.parse()
+        self.columns = parser.columns
+
+    def __repr__(self):
+        return f"Predicate({self.text!r})"
+
+    def __str__(self):
+        return self.text
+
+    def mask(self, df, rows=None):
+        """Máscara booleana sobre todas as linhas, ou só sobre as posições `rows`."""
+        return _evaluate_predicate(self.node, df, rows)
+
+
+def compile_predicate(text):
+    """Compila a condição (com cache por texto); erros de sintaxe geram ValueError."""
+    if isinstance(text, Predicate):
+        return text
+    predicate = _PREDICATE_CACHE.get(text)
+    if predicate is None:
+        predicate = _PREDICATE_CACHE[text] = Predicate(text)
+    return predicate
+
+
+def _evaluate_predicate(node, df, rows):
+    """Máscara do nó sobre as linhas `rows` (posições; None = todas). E/OU só avaliam as linhas ainda em aberto."""
+    import numpy as np
+
+    kind = node[0]
+    if kind == "cmp":
+        series = df[node[1]]
+        if rows is not None:
+            series = series.take(rows)
+        return _compare_series(series, node[2], node[3])
+    if kind == "nao":
+        return ~_evaluate_predicate(node[1], df, rows)
+
+    size = len(df) if rows is None else len(rows)
+    positions = np.arange(size) if rows is None else rows
+    result = np.full(size, kind == "e")
+    for child in node[1]:
+        pending = result if kind == "e" else ~result
+        if not pending.any():
+            break
+        if pending.all():
+            result = _evaluate_predicate(child, df, rows)
+        else:
+            # Só as linhas ainda indefinidas: no E, as verdadeiras; no OU, as falsas
+            open_rows = np.flatnonzero(pending)
+            result[open_rows] = _evaluate_predicate(child, df, positions[open_rows])
+    return result
+
+
+def _predicate_text(series):
+    """Série como texto, mantendo as células vazias como NA (números do Excel viram texto)."""
+    if isinstance(series.dtype, pd.StringDtype):
+        return series
+    if series.dtype == object and pd.api.types.infer_dtype(series, skipna=True) in ("string", "empty"):
+        return series
+    return series.astype("string")
+
+
+def _predicate_numbers(values):
+    numbers = []
+    for value in values:
+        try:
+            numbers.append(float(value))
+        except ValueError:
+            return None
+    return numbers
+
+
+def _compare_series(series, op, values):
+    """Uma comparação vetorizada; colunas categóricas comparam só as categorias."""
+    import numpy as np
+
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        categories = pd.Series(series.cat.categories)
+        empty = pd.Series([None], dtype=object)
+        table = np.append(_compare_series(categories, op, values), _compare_series(empty, op, values))
+        return table[series.cat.codes.to_numpy()]
+
+    if op == "vazio":
+        text = _predicate_text(series)
+        return (text.isna() | (text.str.strip() == "")).to_numpy(dtype=bool, na_value=True)
+
+    if op in ("=", "em", "entre") or op in PREDICATE_ORDERING:
+        numbers = _predicate_numbers(values)
+        if pd.api.types.is_datetime64_any_dtype(series.dtype):
+            left, right = series, list(DateColumn(pd.Series(values, dtype=object)).dates())
+        elif pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype):
+            if numbers is None:
+                left, right = _predicate_text(series), values
+            else:
+                left, right = series, numbers
+        elif numbers is not None and op not in ("=", "em"):
+            left, right = pd.to_numeric(series, errors="coerce"), numbers
+        else:
+            left, right = _predicate_text(series), values
+
+        if op in ("=", "em"):
+            result = left.isin(right)
+        elif op == "entre":
+            result = (left >= right[0]) & (left <= right[1])
+        else:
+            result = getattr(left, PREDICATE_ORDERING[op])(right[0])
+        return result.to_numpy(dtype=bool, na_value=False)
+
+    text = _predicate_text(series).str
+    if op == "comeca":
+        result = text.startswith(values[0])
+    elif op == "termina":
+        result = text.endswith(values[0])
+    elif op == "contem":
+        result = text.contains(values[0], regex=False)
+    else:
+        result = text.contains(values[0], regex=True)
+    return result.to_numpy(dtype=bool, na_value=False)
+
+
+def _intersect_sorted(a, b):
+    """Posições presentes nos dois arrays ordenados, buscando as do menor no maior."""
+    import numpy as np
+
+    small, large = (a, b) if len(a) <= len(b) else (b, a)
+    if not len(small) or not len(large):
+        return small[:0]
+    found = np.searchsorted(large, small)
+    found[found == len(large)] = 0
+    return small[large[found] == small]
+
+
 class ExcelFilter:
+    """
+    Filtros de igualdade sobre uma planilha carregada.
+    As linhas que passam pelos filtros ficam em `rows`, um array ordenado de posições (None =
+    todas). A cada filtro novo o array é refinado, sem reaplicar os anteriores. Cada coluna
+    filtrada ganha um índice invertido (valor -> posições), montado na primeira vez que a
+    coluna é usada. Depois disso, listar valores e filtrar custam o número de linhas
+    encontradas, e não o tamanho da planilha. Quando os filtros anteriores já deixaram poucas
+    linhas, uma coluna ainda sem índice é comparada só nessas linhas. Condições compostas
+    (compile_predicate) refinam as mesmas linhas.
+    """
+
     def __init__(self):
         self.df = None
         self.filepath = None
         self.headers = None
-        
+        self.filters = {}
+        self.conditions = []
+        self.rows = None
+        self._indexes = {}
+
     def load_excel(self, filepath):
         """Carrega o arquivo Excel e extrai os cabeçalhos"""
         try:
             self.filepath = filepath
-            self.df = pd.read_excel(filepath)
+            # Cópia própria: ações como o ajuste de CPFs alteram filter_system.df
+            self.df = FRAME_CACHE.load(filepath, pd.read_excel)
             self.headers = list(self.df.columns)
+            self._indexes = {}
+            self.reset_filters()
             return True
         except Exception as e:
             print(f"Erro ao carregar arquivo: {e}")
             return False
 
+    def column_index(self, column):
+        """Índice invertido da coluna: (valor -> posições ordenadas, posições das células vazias)."""
+        import numpy as np
+
+        if column not in self._indexes:
+            series = self.df[column]
+            index = dict(series.groupby(series, sort=False, observed=True).indices)
+            missing = np.flatnonzero(series.isna().to_numpy())
+            self._indexes[column] = index, missing
+        return self._indexes[column]
+
+    def matching_rows(self, column, value):
+        """Posições (ordenadas) das linhas em que a coluna tem o valor; vazio casa com vazio."""
+        import numpy as np
+
+        index, missing = self.column_index(column)
+        if pd.isna(value):
+            return missing
+        return index.get(value, np.empty(0, dtype=np.intp))
+
+    def reset_filters(self):
+        """Remove todos os filtros e condições (todas as linhas voltam a valer)."""
+        self.filters = {}
+        self.conditions = []
+        self.rows = None
+
+    def _rebuild(self, filters):
+        """Refaz as linhas a partir de `filters`, mantendo as condições já adicionadas."""
+        conditions = self.conditions
+        self.reset_filters()
+        for column, value in filters.items():
+            self.add_filter(column, value)
+        for predicate in conditions:
+            self.add_condition(predicate)
+
+    def add_filter(self, column, value):
+        """Refina as linhas atuais com mais um filtro (coluna == valor)."""
+        if column in self.filters:
+            # Troca de valor numa coluna já filtrada: refaz a partir dos demais filtros
+            self._rebuild({**self.filters, column: value})
+            return
+        if column not in self._indexes and self.rows is not None and len(self.rows) * 8 < len(self.df):
+            values = self.df[column].take(self.rows)
+            keep = values.isna() if pd.isna(value) else values == value
+            self.rows = self.rows[keep.to_numpy(dtype=bool, na_value=False)]
+        else:
+            matches = self.matching_rows(column, value)
+            self.rows = matches if self.rows is None else _intersect_sorted(self.rows, matches)
+        self.filters[column] = value
+
+    def apply_filters(self, filters):
+        """Deixa os filtros iguais a `filters`, aproveitando os que já estão aplicados."""
+        applied = list(self.filters.items())
+        wanted = list(filters.items())
+        if wanted[:len(applied)] != applied:
+            self._rebuild(filters)
+            return
+        for column, value in wanted[len(applied):]:
+            self.add_filter(column, value)
+
+    def add_condition(self, condition):
+        """Refina as linhas atuais com uma condição composta (texto ou Predicate), avaliada só nessas linhas."""
+        import numpy as np
+
+        predicate = compile_predicate(condition)
+        if self.rows is None:
+            self.rows = np.flatnonzero(predicate.mask(self.df))
+        else:
+            self.rows = self.rows[predicate.mask(self.df, self.rows)]
+        self.conditions.append(predicate)
+
+    def row_count(self):
+        """Quantidade de linhas que passam pelos filtros atuais."""
+        return len(self.df) if self.rows is None else len(self.rows)
+
+    def filtered_frame(self):
+        """DataFrame com as linhas que passam pelos filtros atuais."""
+        return self.df if self.rows is None else self.df.take(self.rows)
+
     def get_unique_values(self, column):
-        """Retorna valores únicos de uma coluna específica"""
-        return self.df[column].unique().tolist()
+        """Retorna valores únicos de uma coluna específica (na ordem em que aparecem)"""
+        index, missing = self.column_index(column)
+        first_rows = {value: positions[0] for value, positions in index.items()}
+        if len(missing):
+            first_rows[self.df[column].iloc[missing[0]]] = missing[0]
+        return sorted(first_rows, key=first_rows.get)
 
     def filter_and_save(self, column, value, output_path):
         """Filtra o DataFrame e salva em novo arquivo"""
-        filtered_df = self.df[self.df[column] == value]
+        self.reset_filters()
+        self.add_filter(column, value)
+        return self.save_filtered(output_path)
+
+    def save_filtered(self, output_path):
+        """Salva as linhas que passam pelos filtros atuais em novo arquivo"""
         output_file = os.path.join(output_path, f'filtered_{os.path.basename(self.filepath)}')
-        filtered_df.to_excel(output_file, index=False)
+        self.filtered_frame().to_excel(output_file, index=False)
         return output_file
 
     def filter_and_save_multiple(self, filters, output_path):
         """Filtra o DataFrame com múltiplos critérios e salva em novo arquivo"""
         print("\n[bold yellow]╔══ Iniciando Filtragem Múltipla ══╗[/bold yellow]\n")
         
-        filtered_df = self.df.copy()
-        total_inicial = len(filtered_df)
-        
-        steps = len(filters)
-        step_size = 100 // steps
-        
-        for column, value in filters.items():
-            for _ in track(range(step_size), description=f"[cyan]Aplicando filtro para {column}...[/cyan]"):
-                time.sleep(0.01)
-            filtered_df = filtered_df[filtered_df[column] == value]
+        total_inicial = len(self.df)
+        self.apply_filters(filters)
+        filtered_df = self.filtered_frame()
         
         output_file = os.path.join(output_path, f'filtered_{os.path.basename(self.filepath)}')
         filtered_df.to_excel(output_file, index=False)
         
         print("\n[bold green]╔══ Resumo da Operação ══╗[/bold green]")
         print(f"[white]► Registros originais:[/white]    {total_inicial:,}")
+        if self.conditions:
+            print(f"[white]► Condições:[/white]              {' e '.join(f'({c})' for c in self.conditions)}")
         print(f"[white]► Registros após filtros:[/white] {len(filtered_df):,}")
         print(f"[white]► Registros filtrados:[/white]    {total_inicial - len(filtered_df):,}")
         print(f"\n[bold green]✓ Processo concluído com sucesso![/bold green]")
@@ -68,10 +1481,10 @@ class ExcelFilter:
 
     def get_unique_values_filtered(self, column, current_filters):
         """Retorna valores únicos de uma coluna com filtros aplicados"""
-        filtered_df = self.df.copy()
-        for col, val in current_filters.items():
-            filtered_df = filtered_df[filtered_df[col] == val]
-        return filtered_df[column].unique().tolist()
+        self.apply_filters(current_filters)
+        if self.rows is None:
+            return self.get_unique_values(column)
+        return self.df[column].take(self.rows).unique().tolist()
 
     def keep_columns(self, columns, output_path):
         """Mantém apenas as colunas selecionadas"""
@@ -138,14 +1551,17 @@ class ExcelFilter:
     @staticmethod
     def unify_excel_files(directory_path, output_path):
         """Unifica arquivos Excel baseado no CPF"""
-        all_files = [f for f in os.listdir(directory_path) if f.endswith(('.xlsx', '.xls'))]
+        all_files = list_input_files(directory_path, extensions=('.xlsx', '.xls'))
         if not all_files:
             print("Nenhum arquivo Excel encontrado no diretório.")
             return None
 
         dfs = []
-        for file in all_files:
-            df = pd.read_excel(os.path.join(directory_path, file))
+        for file_path, df, error in read_tables_parallel(all_files, dtype=None):
+            file = os.path.basename(file_path)
+            if error:
+                print(f"Erro ao ler o arquivo {file}: {error}. Ignorando...")
+                continue
             if 'CPF' not in df.columns:
                 print(f"Arquivo {file} não contém a coluna 'CPF'. Ignorando...")
                 continue
@@ -207,8 +1623,8 @@ class ExcelFilter:
         """Remove do arquivo base os CPFs que existem no arquivo de remoção"""
         print("\n[bold yellow]╔══ Iniciando Remoção de CPFs ══╗[/bold yellow]\n")
         
-        base_df = pd.read_excel(base_file_path)
-        removal_df = pd.read_excel(removal_file_path)
+        base_df = FRAME_CACHE.load(base_file_path, pd.read_excel)
+        removal_df = FRAME_CACHE.load(removal_file_path, pd.read_excel)
         total_base = len(base_df)
         
         # Normaliza os CPFs
@@ -246,7 +1662,7 @@ class ExcelFilter:
         """Remove CPFs duplicados mantendo apenas a primeira ocorrência"""
         print("\n[bold yellow]╔══ Iniciando Remoção de Duplicatas ══╗[/bold yellow]\n")
         
-        df = pd.read_excel(file_path)
+        df = FRAME_CACHE.load(file_path, pd.read_excel)
         total = len(df)
         
         # Normaliza os CPFs
@@ -283,6 +1699,35 @@ class ExcelFilter:
         # Adiciona zeros à esquerda se necessário para ter 11 dígitos
         return cpf_clean.zfill(11)
 
+def ask_filter_type():
+    """Pergunta se o filtro é um valor exato da coluna ou uma condição composta."""
+    return inquirer.select(
+        message="Tipo de filtro:",
+        choices=[
+            Choice("valor", "Valor exato de uma coluna"),
+            Choice("condicao", "Condição (em, entre, começa com, contém, regex, vazio, e/ou/não)"),
+        ]
+    ).execute()
+
+
+def ask_condition(headers):
+    """Pede uma condição até ela ser válida para as colunas do arquivo; retorna o Predicate compilado."""
+    print("[dim]Ex.: UF em (SP, RJ) e IDADE entre 18 e 60 | NOME contem SILVA ou CPF vazio | "
+          "nao STATUS = CANCELADO | \"DATA NASC\" >= 1960-01-01[/dim]")
+    while True:
+        text = inquirer.text(message="Digite a condição:").execute()
+        try:
+            predicate = compile_predicate(text)
+        except ValueError as e:
+            print(f"[bold red]✗ {e}[/bold red]")
+            continue
+        missing = [column for column in predicate.columns if column not in headers]
+        if missing:
+            print(f"[bold red]✗ Coluna(s) inexistente(s): {', '.join(missing)}[/bold red]")
+            continue
+        return predicate
+
+
 def filter_single_excel():
     filter_system = ExcelFilter()
     
@@ -296,34 +1741,39 @@ def filter_single_excel():
         print("[bold red]✗ Erro ao carregar arquivo![/bold red]\n")
         return
     
-    selected_header = inquirer.select(
-        message="Selecione o cabeçalho para filtrar:",
-        choices=filter_system.headers
-    ).execute()
-    
-    unique_values = filter_system.get_unique_values(selected_header)
-    
-    selected_value = inquirer.select(
-        message=f"Selecione o valor para filtrar em '{selected_header}':",
-        choices=unique_values
-    ).execute()
-    
-    output_dir = inquirer.text(
-        message="Digite o caminho para salvar o arquivo filtrado:"
-    ).execute()
+    if ask_filter_type() == "condicao":
+        predicate = ask_condition(filter_system.headers)
+        output_dir = inquirer.text(
+            message="Digite o caminho para salvar o arquivo filtrado:"
+        ).execute()
+        filter_system.add_condition(predicate)
+        output_file = filter_system.save_filtered(output_dir)
+    else:
+        selected_header = inquirer.select(
+            message="Selecione o cabeçalho para filtrar:",
+            choices=filter_system.headers
+        ).execute()
+        
+        unique_values = filter_system.get_unique_values(selected_header)
+        
+        selected_value = inquirer.select(
+            message=f"Selecione o valor para filtrar em '{selected_header}':",
+            choices=unique_values
+        ).execute()
+        
+        output_dir = inquirer.text(
+            message="Digite o caminho para salvar o arquivo filtrado:"
+        ).execute()
+        
+        output_file = filter_system.filter_and_save(selected_header, selected_value, output_dir)
     
     total_registros = len(filter_system.df)
-    
-    for _ in track(range(100), description="[cyan]Aplicando filtro...[/cyan]"):
-        time.sleep(0.01)
-    
-    filtered_df = filter_system.df[filter_system.df[selected_header] == selected_value].copy()
-    output_file = filter_system.filter_and_save(selected_header, selected_value, output_dir)
+    filtrados = filter_system.row_count()
     
     print("\n[bold green]╔══ Resumo da Operação ══╗[/bold green]")
     print(f"[white]► Registros originais:[/white]    {total_registros:,}")
-    print(f"[white]► Registros filtrados:[/white]    {len(filtered_df):,}")
-    print(f"[white]► Registros removidos:[/white]    {total_registros - len(filtered_df):,}")
+    print(f"[white]► Registros filtrados:[/white]    {filtrados:,}")
+    print(f"[white]► Registros removidos:[/white]    {total_registros - filtrados:,}")
     print(f"\n[bold green]✓ Processo concluído com sucesso![/bold green]")
     print(f"[dim]📁 Arquivo salvo em: {output_file}[/dim]\n")
 
@@ -347,6 +1797,14 @@ def filter_multiple_excel():
         
         if not should_continue:
             break
+        
+        if ask_filter_type() == "condicao":
+            filter_system.add_condition(ask_condition(filter_system.headers))
+            print(f"[dim]Linhas que atendem aos filtros: {filter_system.row_count():,}[/dim]")
+            if not filter_system.row_count():
+                print("Não há linhas que atendam aos filtros atuais.")
+                break
+            continue
             
         # Seleciona o cabeçalho
         selected_header = inquirer.select(
@@ -369,7 +1827,7 @@ def filter_multiple_excel():
         
         filters[selected_header] = selected_value
     
-    if filters:
+    if filters or filter_system.conditions:
         output_dir = inquirer.text(
             message="Digite o caminho para salvar o arquivo filtrado:"
         ).execute()
@@ -672,97 +2130,458 @@ def unify_files_with_cpf_csv():
     console.print(f"[dim]📁 Arquivo salvo em: {output_file}[dim]\n")
 
 
-def adicionar_coluna_idade():
+# --------------------- Motor de datas --------------------- #
+# Datas de cadastro chegam em formatos misturados (dd/mm/aaaa, ISO, série do Excel, com hora...)
+# e se repetem muito. O motor converte cada valor distinto uma vez só (pd.factorize), usando o
+# formato dominante inferido de uma amostra, e tenta os demais formatos apenas no que sobrar.
+# Formatos com dia e mês invertidos só entram quando dominam a amostra: dd/mm nunca é lido
+# como mm/dd (nem o contrário) por engano.
+DATE_DAY_FIRST_FORMATS = ("%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y")
+DATE_MONTH_FIRST_FORMATS = ("%m/%d/%Y", "%m-%d-%Y")
+DATE_YEAR_FIRST_FORMATS = ("%Y-%m-%d", "%Y/%m/%d")
+# Candidatos da inferência, em ordem de preferência nos empates
+DATE_FORMATS = (*DATE_DAY_FIRST_FORMATS, *DATE_YEAR_FIRST_FORMATS, "%d/%m/%y", "%Y%m%d", "%d%m%Y",
+                *DATE_MONTH_FIRST_FORMATS)
+DATE_INFER_SAMPLE = 5_000  # linhas usadas para inferir o formato dominante
+DATE_TIME_SUFFIX = r"[ T]\d{1,2}:\d{2}(?::\d{2}(?:[.,]\d+)?)?\s*(?:Z|[+-]\d{2}:?\d{2})?$"
+EXCEL_EPOCH = "1899-12-30"  # dia 0 dos números de série de data do Excel
+EXCEL_MAX_SERIAL = 100_000  # números maiores não são tratados como datas (série 100000 = ano 2173)
+
+
+def _fixed_width_layout(formato):
+    """
+    Posições de dia/mês/ano e dos separadores de um formato de largura fixa ("%d/%m/%Y",
+    "%Y-%m-%d", "%d%m%Y"...). Retorna (campos, separadores, largura) ou None se o formato
+    tiver outras diretivas.
+    """
+    widths = {"%d": 2, "%m": 2, "%Y": 4}
+    fields, separators, position, i = {}, [], 0, 0
+    while i < len(formato):
+        token = formato[i:i + 2]
+        if token in widths and token not in fields:
+            fields[token] = (position, widths[token])
+            position += widths[token]
+            i += 2
+        elif formato[i] == "%":
+            return None
+        else:
+            separators.append((position, formato[i]))
+            position += 1
+            i += 1
+    return (fields, separators, position) if len(fields) == 3 else None
 
-    import pandas as pd
-    import os
-    from datetime import datetime
-    from pytz import timezone
-    from InquirerPy import inquirer
-    from rich import print
 
+def _parse_fixed_width_dates(text, formato):
+    """
+    Converte as datas com exatamente a largura do formato lendo os dígitos direto de um array
+    numpy (bem mais rápido que o strptime do pandas). Retorna (datas datetime64[ns] com NaT,
+    máscara das posições tratadas) ou None quando o formato não é de largura fixa.
+    """
+    import numpy as np
+
+    layout = _fixed_width_layout(formato)
+    if layout is None:
+        return None
+    fields, separators, width = layout
+    dates = np.full(len(text), np.datetime64("NaT"), dtype="datetime64[ns]")
+    handled = (text.str.len() == width).fillna(False).to_numpy(dtype=bool)
+    positions = np.flatnonzero(handled)
+    if not len(positions):
+        return dates, handled
+
+    chars = text[handled].to_numpy(dtype=f"U{width}").view(np.uint32).reshape(-1, width).astype(np.int64)
+    ok = np.ones(len(chars), dtype=bool)
+    for offset, separator in separators:
+        ok &= chars[:, offset] == ord(separator)
+    numbers = {}
+    for token, (offset, size) in fields.items():
+        digits = chars[:, offset:offset + size] - ord("0")
+        ok &= ((digits >= 0) & (digits <= 9)).all(axis=1)
+        numbers[token] = (digits * 10 ** np.arange(size - 1, -1, -1)).sum(axis=1)
+    day, month, year = numbers["%d"], numbers["%m"], numbers["%Y"]
+    # Limites do datetime64[ns] usado pelo pandas
+    ok &= (month >= 1) & (month <= 12) & (day >= 1) & (day <= 31) & (year >= 1678) & (year <= 2261)
+
+    month_start = (year[ok] - 1970).astype("datetime64[Y]").astype("datetime64[M]") + (month[ok] - 1)
+    values = month_start.astype("datetime64[D]") + (day[ok] - 1)
+    # 31/02 "transborda" para março: a data só vale se continuar no mesmo mês
+    real = values.astype("datetime64[M]") == month_start
+    dates[positions[ok][real]] = values[real]
+    return dates, handled
+
+
+def _parse_with_format(text, formato):
+    """Converte `text` (índice 0..n-1) com um formato explícito; NaT onde não converter."""
+    fast = _parse_fixed_width_dates(text, formato)
+    if fast is None:
+        return pd.to_datetime(text, format=formato, errors="coerce").to_numpy()
+    dates, handled = fast
+    # O strptime aceita dia/mês com um dígito (1/2/1990): só o que tem outra largura vai para ele
+    rest = ~handled & text.notna().to_numpy(dtype=bool)
+    if rest.any():
+        dates[rest] = pd.to_datetime(text[rest], format=formato, errors="coerce").to_numpy()
+    return dates
+
+
+def _date_fallbacks(formato):
+    """Formatos tentados depois do dominante: a mesma ordem de dia/mês com outros separadores e aaaa-mm-dd."""
+    family = DATE_MONTH_FIRST_FORMATS if formato.startswith("%m") else DATE_DAY_FIRST_FORMATS
+    return [f for f in (*family, *DATE_YEAR_FIRST_FORMATS) if f != formato]
+
+
+def _date_text(values):
+    """
+    Datas como texto sem espaços nas pontas, com os ausentes ainda ausentes. Sem strings Arrow,
+    usa o dtype "string" do pandas: astype(str) transformaria NaN/None em "nan"/"None".
+    """
+    dtype = text_dtype()
+    return as_text(values).astype("string" if dtype is str else dtype).str.strip()
+
+
+def infer_date_format(text, sample_size=DATE_INFER_SAMPLE):
+    """
+    Formato de DATE_FORMATS que converte mais valores de uma amostra das linhas (a hora, se
+    houver, é ignorada). Nos empates vale a ordem de DATE_FORMATS (dia antes do mês).
+    Sem nenhum acerto, retorna "%d/%m/%Y".
+    """
+    sample = text.dropna()
+    if len(sample) > sample_size:
+        sample = sample.sample(sample_size, random_state=0)
+    sample = sample.str.replace(DATE_TIME_SUFFIX, "", regex=True).reset_index(drop=True)
+    best, best_hits = "%d/%m/%Y", 0
+    for formato in DATE_FORMATS:
+        hits = int(pd.notna(_parse_with_format(sample, formato)).sum())
+        if hits > best_hits:
+            best, best_hits = formato, hits
+    return best
+
+
+class DateColumn:
+    """
+    Coluna de datas convertida pelo motor: um código por linha (pd.factorize) e a data de cada
+    valor distinto. As datas, a formatação e o relatório saem dos valores distintos, sem
+    repetir o trabalho para valores iguais.
+    - formato: formato de entrada (strptime); None infere o dominante a partir de uma amostra.
+    - Tentativas, nesta ordem: formato dominante, fallbacks da mesma família, ISO (com hora ou
+      fuso) e número de série do Excel. O que não converter é contado como inválido.
+    """
+
+    def __init__(self, values, formato=None):
+        import numpy as np
+
+        self.index = values.index
+        if pd.api.types.is_datetime64_any_dtype(values.dtype):
+            values = values.dt.tz_localize(None) if getattr(values.dt, "tz", None) else values
+            self.codes, uniques = pd.factorize(values)
+            self.formato = "datetime"
+            self.uniques = pd.Series(uniques.astype(str))
+            self.parsed = np.asarray(uniques, dtype="datetime64[ns]")
+            self.empty = np.zeros(len(uniques), dtype=bool)
+            return
+
+        text = _date_text(values)
+        self.codes, uniques = pd.factorize(text)
+        self.uniques = pd.Series(uniques)
+        self.formato = formato or infer_date_format(text)
+        stripped = self.uniques.str.replace(DATE_TIME_SUFFIX, "", regex=True)
+        self.empty = (stripped == "").to_numpy(dtype=bool, na_value=True)
+
+        parsed = np.full(len(stripped), np.datetime64("NaT"), dtype="datetime64[ns]")
+        pending = ~self.empty
+        for candidate in [self.formato, *_date_fallbacks(self.formato)]:
+            if not pending.any():
+                break
+            parsed[pending] = _parse_with_format(stripped[pending].reset_index(drop=True), candidate)
+            pending &= np.isnat(parsed)
+        if pending.any():
+            # Só a parte da data: a hora e o fuso horário não mudam o dia
+            iso = stripped[pending].str.slice(0, 10).reset_index(drop=True)
+            parsed[pending] = pd.to_datetime(iso, format="ISO8601", errors="coerce").to_numpy()
+            pending &= np.isnat(parsed)
+        if pending.any():
+            serial = pd.to_numeric(stripped[pending], errors="coerce").to_numpy(dtype=float)
+            ok = (serial >= 1) & (serial < EXCEL_MAX_SERIAL)
+            positions = np.flatnonzero(pending)[ok]
+            parsed[positions] = np.datetime64(EXCEL_EPOCH, "D") + serial[ok].astype(np.int64)
+        self.parsed = parsed
+
+    def broadcast(self, unique_values, fill):
+        """Valor por linha a partir do valor de cada valor distinto (códigos -1 recebem `fill`)."""
+        import numpy as np
+
+        table = np.asarray(unique_values)
+        if (self.codes < 0).any():
+            # Último item da tabela: o código -1 aponta para ele
+            table = np.append(table.astype(object) if fill is None else table, [fill])
+        return table[self.codes]
+
+    def dates(self):
+        """Série datetime64 com o índice original (NaT para vazias e inválidas)."""
+        import numpy as np
+
+        return pd.Series(self.broadcast(self.parsed, np.datetime64("NaT")), index=self.index)
+
+    def format(self, formato="%d/%m/%Y"):
+        """Datas como texto no `formato` (None para vazias e inválidas), formatando só os valores distintos."""
+        labels = pd.Series(self.parsed).dt.strftime(formato).to_numpy(dtype=object)
+        labels[pd.isna(labels)] = None
+        return pd.Series(self.broadcast(labels, None), index=self.index, dtype=object)
+
+    def invalid_rows(self):
+        """Máscara das linhas preenchidas cuja data não pôde ser convertida."""
+        import numpy as np
+
+        invalid = np.isnat(self.parsed) & ~self.empty
+        return self.broadcast(invalid, False).astype(bool)
+
+    def report(self, examples=10):
+        """Resumo: formato de entrada, datas convertidas/vazias/inválidas e os valores inválidos mais frequentes."""
+        import numpy as np
+
+        counts = np.bincount(self.codes[self.codes >= 0], minlength=len(self.parsed))
+        invalid = np.isnat(self.parsed) & ~self.empty
+        top = np.argsort(-counts[invalid], kind="stable")[:examples]
+        return {
+            "formato_entrada": self.formato,
+            "valores_distintos": int(len(self.parsed)),
+            "datas_convertidas": int(counts[~np.isnat(self.parsed)].sum()),
+            "datas_vazias": int(counts[self.empty].sum() + (self.codes < 0).sum()),
+            "datas_invalidas": int(counts[invalid].sum()),
+            "exemplos_invalidos": [[str(value), int(count)] for value, count in
+                                   zip(self.uniques[invalid].to_numpy()[top], counts[invalid][top])],
+        }
+
+
+def parse_dates(values, formato=None):
+    """Converte uma série de datas em texto para datetime64 pelo motor de datas (NaT = vazia ou inválida)."""
+    return DateColumn(values, formato).dates()
+
+
+def ages_in_years(birth_dates, today=None, formato=None):
+    """
+    Idade em anos completos para cada data de nascimento (dd/mm/aaaa, ISO ou série do Excel),
+    como array float com NaN para datas inválidas. `today` é a data de referência (padrão:
+    hoje no fuso horário de São Paulo); `formato` é o formato de entrada (padrão: inferido).
+    """
+    import numpy as np
+
+    if today is None:
+        from datetime import datetime
+        from pytz import timezone
+
+        today = datetime.now(timezone("America/Sao_Paulo")).date()
+    # Uma idade por data distinta, espalhada pelas linhas pelos códigos
+    column = DateColumn(birth_dates, formato)
+    ages = np.full(len(column.parsed), np.nan)
+    valid = ~np.isnat(column.parsed)
+    if valid.any():
+        dates = pd.DatetimeIndex(column.parsed[valid])
+        month_day = dates.month.to_numpy() * 100 + dates.day.to_numpy()
+        # Ainda não fez aniversário neste ano -> um ano a menos
+        ages[valid] = today.year - dates.year.to_numpy() - ((today.month * 100 + today.day) < month_day)
+    return column.broadcast(ages, np.nan)
+
+
+def _int_labels(numbers):
+    """Converte um array float de inteiros (NaN = vazio) em textos, pela tabela dos valores distintos."""
+    import numpy as np
+
+    labels = np.full(len(numbers), None, dtype=object)
+    valid = ~np.isnan(numbers)
+    if valid.any():
+        values = numbers[valid].astype(np.int64)
+        low = values.min()
+        table = np.array([str(n) for n in range(low, values.max() + 1)], dtype=object)
+        labels[valid] = table[values - low]
+    return labels
+
+
+def compute_ages(birth_dates, today=None):
+    """
+    Calcula a idade (em anos, como string) a partir das datas de nascimento (dd/mm/aaaa,
+    com fallback para ISO e série do Excel), usando a data atual no fuso horário do Brasil
+    (São Paulo). Datas inválidas resultam em None.
+    """
+    return pd.Series(_int_labels(ages_in_years(birth_dates, today)), index=birth_dates.index, dtype=object)
+
+
+def parse_age_ranges(spec):
+    """
+    Converte a especificação de faixas etárias em [(mínimo, máximo ou None, rótulo)].
+    Aceita "18-25,26-59,60+" ou uma lista ["18-25", "26-59", "60+"]; os limites são inclusivos.
+    """
+    items = spec.split(",") if isinstance(spec, str) else list(spec)
+    ranges = []
+    for item in (str(i).strip() for i in items):
+        if not item:
+            continue
+        low, sep, high = item.partition("-")
+        if item.endswith("+") and low[:-1].strip().isdigit() and not sep:
+            ranges.append((int(low[:-1]), None, item))
+        elif sep and low.strip().isdigit() and high.strip().isdigit() and int(low) <= int(high):
+            ranges.append((int(low), int(high), item))
+        else:
+            raise ValueError(f"Faixa etária inválida: '{item}'. Use o formato 18-25 ou 60+.")
+    if not ranges:
+        raise ValueError("Informe ao menos uma faixa etária (ex.: 18-25,26-59,60+).")
+    return ranges
+
+
+def age_range_labels(ages, ranges):
+    """Rótulo da primeira faixa que contém cada idade (None fora das faixas ou idade inválida)."""
+    import numpy as np
+
+    conditions = [(ages >= low) & (ages <= (np.inf if high is None else high)) for low, high, _ in ranges]
+    return np.select(conditions, [label for _, _, label in ranges], default=None).astype(object)
+
+
+def adicionar_coluna_idade():
     """
-    Recebe um arquivo CSV, permite a seleção de uma coluna de data de nascimento
-    e adiciona uma nova coluna "idade" calculada com base na data atual (Brasil - São Paulo).
-    - Detecta automaticamente o delimitador do CSV.
-    - Ignora linhas problemáticas ao carregar o arquivo.
-    - Trata a coluna "idade" como string para evitar formatação decimal.
+    Adiciona a coluna "idade" (e, opcionalmente, "faixa_etaria") a partir da coluna de data de
+    nascimento escolhida, com base na data atual (Brasil - São Paulo).
+    - Aceita dd/mm/aaaa, ISO (aaaa-mm-dd) e números de série do Excel.
+    - Remove as linhas com data de nascimento inválida.
+    - CSVs grandes podem ser processados em blocos paralelos.
     """
     print("\n[bold yellow]╔══ Adicionar Coluna de Idade ══╗[/bold yellow]\n")
 
-    # Recebe o caminho do arquivo CSV
     file_path = inquirer.text(
-        message="Digite o caminho do arquivo CSV:"
+        message="Digite o caminho do arquivo (Excel, CSV, Parquet ou Feather):"
     ).execute()
 
-    # Tenta detectar o delimitador automaticamente
     try:
-        with open(file_path, "r", encoding="utf-8") as file:
-            first_line = file.readline()
-            delimiter = ";" if ";" in first_line else ","
+        sample = probe_table(file_path)
     except Exception as e:
-        print(f"[bold red]✗ Erro ao ler o arquivo: {e}[bold red]\n")
+        print(f"[bold red]✗ Erro ao ler o arquivo: {e}[/bold red]\n")
         return
-
-    print(f"[cyan]✓ Delimitador detectado: '{delimiter}'[cyan]")
-
-    try:
-        # Lê o CSV ignorando erros e pulando linhas inconsistentes
-        df = pd.read_csv(file_path, dtype=str, sep=delimiter, on_bad_lines="skip", encoding="utf-8")
-        
-        if df.empty:
-            print("[bold red]✗ O arquivo CSV está vazio ou não contém dados válidos.[bold red]\n")
-            return
-    except Exception as e:
-        print(f"[bold red]✗ Erro ao carregar o arquivo CSV: {e}[bold red]\n")
+    if sample.columns.empty:
+        print("[bold red]✗ O arquivo está vazio ou não contém dados válidos.[/bold red]\n")
         return
 
-    # Seleciona a coluna de data de nascimento
     date_column = inquirer.select(
         message="Selecione a coluna de Data de Nascimento:",
-        choices=df.columns.tolist()
+        choices=column_choices(sample)
+    ).execute()
+
+    def valid_ranges(text):
+        try:
+            return not text.strip() or bool(parse_age_ranges(text))
+        except ValueError:
+            return False
+
+    faixas = inquirer.text(
+        message="Faixas etárias para a coluna 'faixa_etaria' (ex.: 18-25,26-59,60+; vazio = não criar):",
+        validate=valid_ranges,
+        invalid_message="Use faixas como 18-25,26-59,60+."
+    ).execute().strip() or None
+
+    output_dir = inquirer.text(
+        message="Digite o caminho para salvar o novo arquivo:"
     ).execute()
+    output_format = ask_output_format()
+
+    workers = 1
+    if file_path.lower().endswith(CSV_EXTENSIONS) and os.path.getsize(file_path) >= CHUNKED_MIN_BYTES:
+        workers = int(inquirer.text(
+            message="Arquivo grande: quantidade de processos em paralelo (1 = sem blocos):",
+            default=str(default_workers()),
+            validate=lambda x: x.isdigit() and int(x) > 0,
+            invalid_message="Informe um número inteiro positivo."
+        ).execute())
 
+    output_file = output_path_for(file_path, output_dir, "arquivo_com_idade_", output_format)
+    steps = [("idade", step_idade, {"coluna": date_column, "faixas": faixas})]
+    start_time = time.time()
     print("\n[cyan]Calculando idades...[/cyan]")
+    try:
+        if workers > 1:
+            info = run_chunked(file_path, steps, output_file, workers=workers)
+            rows_in, rows_out = info["linhas_entrada"], info["linhas_saida"]
+            if "aviso" in info:
+                print(f"[yellow]⚠ {info['aviso']}.[/yellow]")
+        else:
+            df = read_table(file_path)
+            rows_in = len(df)
+            df = step_idade(df, date_column, faixas)
+            print("[cyan]Salvando arquivo final...[/cyan]")
+            write_table(df, output_file)
+            rows_out = len(df)
+    except Exception as e:
+        print(f"[bold red]✗ Erro ao calcular as idades: {e}[/bold red]\n")
+        logging.error(f"Erro ao adicionar a coluna de idade em '{file_path}': {e}")
+        return
 
-    # Define o fuso horário do Brasil - São Paulo
-    brasil_tz = timezone("America/Sao_Paulo")
-    today = datetime.now(brasil_tz).date()  # Obtém a data atual no fuso horário correto
+    print("\n[bold green]╔══ Resumo da Operação ══╗[/bold green]")
+    print(f"[white]► Registros originais:[/white]          {rows_in:,}")
+    print(f"[white]► Registros com idade:[/white]          {rows_out:,}")
+    print(f"[white]► Datas inválidas removidas:[/white]    {rows_in - rows_out:,}")
+    if faixas:
+        print(f"[white]► Faixas etárias:[/white]               {faixas}")
+    print(f"[white]► Tempo total:[/white]                  {time.time() - start_time:.2f}s")
+    print(f"\n[bold green]✓ Processo concluído com sucesso![/bold green]")
+    print(f"[dim]📁 Arquivo salvo em: {output_file}[/dim]\n")
 
-    # Função para calcular idade
-    def calcular_idade(data_nascimento):
-        try:
-            data_nasc = datetime.strptime(data_nascimento, "%d/%m/%Y").date()
-            idade = today.year - data_nasc.year - ((today.month, today.day) < (data_nasc.month, data_nasc.day))
-            return str(idade)  # Converte para string para evitar valores decimais
-        except Exception:
-            return None  # Retorna None caso a data seja inválida
 
-    # Aplica a função de cálculo de idade
-    df["idade"] = df[date_column].apply(calcular_idade)
+def dividir_por_coluna():
+    """
+    Divide o arquivo em um arquivo por valor da coluna escolhida (ex.: um por UF), lendo a
+    entrada uma única vez, em vez de filtrar o arquivo inteiro uma vez para cada valor.
+    - Opcionalmente, mantém só as linhas que atendem a uma condição.
+    - Grava também um manifesto JSON com o valor, o arquivo e as linhas de cada partição.
+    """
+    print("\n[bold yellow]╔══ Dividir Arquivo por Coluna ══╗[/bold yellow]\n")
 
-    # Exclui linhas com idade vazia (datas inválidas)
-    df = df.dropna(subset=["idade"])
+    file_path = inquirer.text(
+        message="Digite o caminho do arquivo (Excel, CSV, Parquet ou Feather):"
+    ).execute()
 
-    # Converte a coluna "idade" explicitamente para string
-    df["idade"] = df["idade"].astype(str)
+    try:
+        sample = probe_table(file_path)
+    except Exception as e:
+        print(f"[bold red]✗ Erro ao ler o arquivo: {e}[/bold red]\n")
+        return
+    if sample.columns.empty:
+        print("[bold red]✗ O arquivo está vazio ou não contém dados válidos.[/bold red]\n")
+        return
 
-    # Pergunta o diretório para salvar o arquivo final
-    output_dir = inquirer.text(
-        message="Digite o caminho para salvar o novo arquivo CSV:"
+    column = inquirer.select(
+        message="Selecione a coluna que define as partições:",
+        choices=column_choices(sample)
     ).execute()
 
-    # Define o caminho do arquivo de saída
-    output_file = os.path.join(output_dir, f'arquivo_com_idade_{os.path.basename(file_path)}')
+    steps = []
+    if inquirer.confirm(message="Manter só as linhas que atendem a uma condição?", default=False).execute():
+        predicate = ask_condition(list(sample.columns))
+        steps = [("filtrar-condicao", step_filtrar_condicao, {"condicao": predicate})]
 
-    print("\n[cyan]Salvando arquivo final...[/cyan]")
+    output_dir = inquirer.text(
+        message="Digite a pasta para salvar as partições:",
+        default=partition_dir_for(file_path, "", column)
+    ).execute()
+    output_format = ask_output_format()
+
+    start_time = time.time()
+    print("\n[cyan]Dividindo o arquivo...[/cyan]")
     try:
-        # Salva o arquivo atualizado garantindo que a coluna "idade" seja string
-        df.to_csv(output_file, index=False, encoding="utf-8", sep=delimiter, quoting=1)
-        print(f"\n[bold green]✓ Processo concluído com sucesso![bold green]")
-        print(f"[dim]📁 Arquivo salvo em: {output_file}[dim]\n")
+        info = run_partitioned(file_path, column, output_dir, steps, formato=output_format)
     except Exception as e:
-        print(f"[bold red]✗ Erro ao salvar o arquivo: {e}[bold red]\n")
+        print(f"[bold red]✗ Erro ao dividir o arquivo: {e}[/bold red]\n")
+        logging.error(f"Erro ao dividir '{file_path}' pela coluna '{column}': {e}")
+        return
+
+    with open(info["manifesto"], encoding="utf-8") as f:
+        partitions = json.load(f)["particoes"]
+    print("\n[bold green]╔══ Resumo da Operação ══╗[/bold green]")
+    print(f"[white]► Registros originais:[/white]          {info['linhas_entrada']:,}")
+    print(f"[white]► Registros gravados:[/white]           {info['linhas_saida']:,}")
+    print(f"[white]► Partições:[/white]                    {info['particoes']:,}")
+    for entry in sorted(partitions, key=lambda e: -e["linhas"])[:5]:
+        value = "(vazio)" if entry["valor"] is None else entry["valor"]
+        print(f"[dim]  • {value}: {entry['linhas']:,} linhas[/dim]")
+    print(f"[white]► Tempo total:[/white]                  {time.time() - start_time:.2f}s")
+    print(f"\n[bold green]✓ Processo concluído com sucesso![/bold green]")
+    print(f"[dim]📁 Partições salvas em: {output_dir}[/dim]")
+    print(f"[dim]📄 Manifesto: {info['manifesto']}[/dim]\n")
 
 
 def filter_cpf_removal():
@@ -987,9 +2806,8 @@ def format_values_to_money():
         except (ValueError, TypeError):
             return value  # Retorna o valor original se não for possível formatar
 
-    # Aplica a formatação
-    for _ in track(range(100), description="[cyan]Processando valores...[/cyan]"):
-        df[selected_column] = df[selected_column].apply(format_money)
+    # Aplica a formatação (uma vez por valor distinto)
+    df[selected_column] = transform_unique(df[selected_column], format_money)
 
     # Pergunta o diretório para salvar
     output_dir = inquirer.text(
@@ -1044,7 +2862,7 @@ def filter_and_format_rgs():
         return True
 
     # Filtra os registros válidos e inválidos
-    base_df['RG_VALIDO'] = base_df[rg_column].apply(is_valid_rg)
+    base_df['RG_VALIDO'] = transform_unique(base_df[rg_column], is_valid_rg)
     invalid_rgs = base_df[~base_df['RG_VALIDO']].copy()
     valid_rgs = base_df[base_df['RG_VALIDO']].copy()
 
@@ -1086,16 +2904,20 @@ def filter_and_format_rgs():
         print(f"[bold red]✗ Erro ao salvar os arquivos: {e}[/bold red]\n")
 
 def formatar_coluna_data():
-    """Função para formatar colunas de data em um arquivo Excel."""
+    """
+    Padroniza uma coluna de datas (Excel, CSV, Parquet ou Feather) pelo motor de datas:
+    formato de entrada inferido (ou escolhido), datas misturadas/ISO/série do Excel e relatório
+    dos valores que não puderam ser convertidos.
+    """
     print("\n[bold yellow]╔══ Iniciando Formatação de Datas ══╗[/bold yellow]\n")
 
     # Recebe o arquivo
     file_path = inquirer.text(
-        message="Digite o caminho do arquivo Excel (.xlsx):"
+        message="Digite o caminho do arquivo (Excel, CSV, Parquet ou Feather):"
     ).execute()
 
     try:
-        df = pd.read_excel(file_path)
+        sample = probe_table(file_path)
     except Exception as e:
         print(f"[bold red]✗ Erro ao carregar o arquivo: {e}[/bold red]\n")
         return
@@ -1103,34 +2925,64 @@ def formatar_coluna_data():
     # Seleciona a coluna de data
     date_column = inquirer.select(
         message="Selecione a coluna de data:",
-        choices=df.columns.tolist()
+        choices=column_choices(sample)
     ).execute()
 
-    print("\n[cyan]Formatando dados...[/cyan]")
-
-    for _ in track(range(100), description="[cyan]Processando...[/cyan]"):
-        pass
+    input_format = inquirer.select(
+        message="Formato das datas no arquivo:",
+        choices=[Choice(None, "Detectar automaticamente")] + [
+            Choice(fmt, fmt.replace("%d", "dd").replace("%m", "mm").replace("%Y", "aaaa").replace("%y", "aa"))
+            for fmt in DATE_FORMATS
+        ],
+        default=None
+    ).execute()
 
-    # Converte as datas para o formato dd/MM/YYYY
-    try:
-        df[date_column] = pd.to_datetime(df[date_column], errors='coerce').dt.strftime('%d/%m/%Y')
-    except Exception as e:
-        print(f"[bold red]✗ Erro ao formatar as datas: {e}[/bold red]\n")
-        return
+    output_date_format = inquirer.select(
+        message="Formato de saída das datas:",
+        choices=[Choice("%d/%m/%Y", "dd/mm/aaaa"), Choice("%Y-%m-%d", "aaaa-mm-dd"), Choice("%d-%m-%Y", "dd-mm-aaaa")],
+        default="%d/%m/%Y"
+    ).execute()
 
     # Pergunta o diretório para salvar
     output_dir = inquirer.text(
         message="Digite o caminho para salvar o arquivo formatado:"
     ).execute()
+    output_format = ask_output_format()
+    save_invalid = inquirer.confirm(
+        message="Salvar as linhas com data inválida em um arquivo separado?",
+        default=False
+    ).execute()
 
-    output_file = os.path.join(output_dir, f"data_formatada_{os.path.basename(file_path)}")
+    output_file = output_path_for(file_path, output_dir, "data_formatada_", output_format)
+    invalid_file = output_path_for(file_path, output_dir, "datas_invalidas_", output_format) if save_invalid else None
 
+    print("\n[cyan]Formatando dados...[/cyan]")
+    start_time = time.time()
     try:
-        df.to_excel(output_file, index=False)
-        print(f"\n[bold green]✓ Processo concluído com sucesso![bold green]")
-        print(f"[dim]📁 Arquivo salvo em: {output_file}[dim]\n")
+        df = read_table(file_path)
+        df, info = step_formatar_data(df, date_column, output_date_format, input_format, invalid_file)
+        write_table(df, output_file)
     except Exception as e:
-        print(f"[bold red]✗ Erro ao salvar o arquivo: {e}[/bold red]\n")
+        print(f"[bold red]✗ Erro ao formatar as datas: {e}[/bold red]\n")
+        logging.error(f"Erro ao formatar a coluna de data '{date_column}' de '{file_path}': {e}")
+        return
+
+    print("\n[bold green]╔══ Resumo da Operação ══╗[/bold green]")
+    print(f"[white]► Formato de entrada:[/white]   {info['formato_entrada']}"
+          f"{'' if input_format else ' (detectado)'}")
+    print(f"[white]► Valores distintos:[/white]    {info['valores_distintos']:,}")
+    print(f"[white]► Datas convertidas:[/white]    {info['datas_convertidas']:,}")
+    print(f"[white]► Datas vazias:[/white]         {info['datas_vazias']:,}")
+    print(f"[white]► Datas inválidas:[/white]      {info['datas_invalidas']:,}")
+    if info["exemplos_invalidos"]:
+        examples = ", ".join(f"'{value}' ({count:,})" for value, count in info["exemplos_invalidos"][:5])
+        print(f"[yellow]  Mais frequentes: {examples}[/yellow]")
+    print(f"[white]► Tempo total:[/white]          {time.time() - start_time:.2f}s")
+    print(f"\n[bold green]✓ Processo concluído com sucesso![/bold green]")
+    print(f"[dim]📁 Arquivo salvo em: {output_file}[/dim]")
+    if invalid_file:
+        print(f"[dim]📁 Datas inválidas em: {invalid_file}[/dim]")
+    print()
 
 
 def dois_unify_excel_files_with_cpf():
@@ -1296,16 +3148,16 @@ def unifique_one():
 
     print(f"[cyan]Encontradas {len(files)} planilhas para unificação...[/cyan]\n")
 
-    # Unifica todas as planilhas em um único DataFrame
-    unified_df = pd.DataFrame()
-    for file in files:
-        try:
-            file_path = os.path.join(folder_path, file)
-            df = pd.read_excel(file_path)
-            unified_df = pd.concat([unified_df, df], ignore_index=True)
-            print(f"[green]✓ Unificada: {file}[green]")
-        except Exception as e:
-            print(f"[bold red]✗ Erro ao unificar {file}: {e}[bold red]")
+    # Lê as planilhas em paralelo (um arquivo por processo) e unifica em um único DataFrame
+    dfs = []
+    for file_path, df, error in read_tables_parallel([os.path.join(folder_path, f) for f in files], dtype=None):
+        file = os.path.basename(file_path)
+        if error:
+            print(f"[bold red]✗ Erro ao unificar {file}: {error}[bold red]")
+            continue
+        dfs.append(df)
+        print(f"[green]✓ Unificada: {file}[green]")
+    unified_df = pd.concat(dfs, ignore_index=True) if dfs else pd.DataFrame()
 
     # Pergunta o diretório para salvar
     output_dir = inquirer.text(
@@ -1337,8 +3189,9 @@ def filter_remove_by_name():
         message="Digite o caminho do arquivo base (.xlsx):"
     ).execute()
 
+    # Apenas cabeçalho e amostra para os prompts; a leitura completa fica para depois
     try:
-        base_df = pd.read_excel(base_file_path)
+        base_sample = probe_table(base_file_path)
     except Exception as e:
         print(f"[bold red]✗ Erro ao carregar o arquivo base: {e}[/bold red]\n")
         return
@@ -1346,7 +3199,7 @@ def filter_remove_by_name():
     # Seleciona a coluna de nome no arquivo base
     base_name_column = inquirer.select(
         message="Selecione a coluna de NOME no arquivo base:",
-        choices=base_df.columns.tolist()
+        choices=column_choices(base_sample)
     ).execute()
 
     # Recebe o arquivo de blacklist
@@ -1355,7 +3208,7 @@ def filter_remove_by_name():
     ).execute()
 
     try:
-        blacklist_df = pd.read_excel(blacklist_file_path)
+        blacklist_sample = probe_table(blacklist_file_path)
     except Exception as e:
         print(f"[bold red]✗ Erro ao carregar o arquivo de blacklist: {e}[/bold red]\n")
         return
@@ -1363,9 +3216,17 @@ def filter_remove_by_name():
     # Seleciona a coluna de nome no arquivo de blacklist
     blacklist_name_column = inquirer.select(
         message="Selecione a coluna de NOME no arquivo de blacklist:",
-        choices=blacklist_df.columns.tolist()
+        choices=column_choices(blacklist_sample)
     ).execute()
 
+    print("\n[cyan]Carregando os arquivos...[/cyan]")
+    try:
+        base_df = FRAME_CACHE.load(base_file_path, pd.read_excel)
+        blacklist_df = FRAME_CACHE.load(blacklist_file_path, pd.read_excel, usecols=[blacklist_name_column])
+    except Exception as e:
+        print(f"[bold red]✗ Erro ao carregar os arquivos: {e}[/bold red]\n")
+        return
+
     # Converte os nomes para caixa alta
     print("\n[cyan]Normalizando nomes para caixa alta...[/cyan]")
     for _ in track(range(100), description="[cyan]Processando...[/cyan]"):
@@ -1741,7 +3602,7 @@ def format_agency_column():
     # Aplica a formatação e conta alterações
     total_rows = len(df)
     original_column = df[agency_column].astype(str).copy()  # Copia os valores originais como string
-    df[agency_column] = df[agency_column].apply(format_agency)
+    df[agency_column] = transform_unique(df[agency_column], format_agency)
     modified_rows = (original_column != df[agency_column]).sum()  # Conta as linhas modificadas
 
     # Resumo da operação
@@ -1765,183 +3626,923 @@ def format_agency_column():
     except Exception as e:
         print(f"[bold red]✗ Erro ao salvar o arquivo: {e}[bold red]\n")
 
-def validate_and_format_cep():
-    """Valida, verifica existência e busca detalhes de CEPs usando a API OpenCEP."""
-    print("\n[bold yellow]╔══ Iniciando Validação e Busca de CEP ══╗[/bold yellow]\n")
+# --------------------- Cache persistente de CEPs --------------------- #
+CEP_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".datamagi", "cep_cache.sqlite")
+
+
+class CepCache:
+    """
+    Cache persistente (SQLite) das consultas de CEP.
+    - Guarda o payload do endereço e o instante da consulta, por CEP.
+    - TTL separado para CEPs existentes e para CEPs inexistentes (cache negativo).
+    - Limite de entradas com remoção dos menos acessados recentemente (LRU).
+    - Falhas de rede não são armazenadas, para serem consultadas novamente.
+    """
+
+    # Limite de parâmetros por consulta do SQLite
+    BATCH_SIZE = 900
+
+    def __init__(self, path=CEP_CACHE_PATH, ttl_days=30, negative_ttl_days=7, max_entries=2_000_000):
+        import sqlite3
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.ttl = ttl_days * 86400
+        self.negative_ttl = negative_ttl_days * 86400
+        self.max_entries = max_entries
+
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS ceps ("
+            " cep TEXT PRIMARY KEY,"
+            " payload TEXT,"
+            " consultado_em REAL NOT NULL,"
+            " acessado_em REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_ceps_acessado_em ON ceps (acessado_em)")
+        self.conn.commit()
+
+        self.stats = {"acertos": 0, "acertos_negativos": 0, "expirados": 0, "ausentes": 0, "gravados": 0, "removidos": 0}
+
+    def get_many(self, ceps):
+        """Retorna {cep: (status, dados)} para os CEPs presentes e ainda válidos no cache."""
+        now = time.time()
+        ceps = list(ceps)
+        found = {}
+        expired = 0
+
+        for start in range(0, len(ceps), self.BATCH_SIZE):
+            batch = ceps[start:start + self.BATCH_SIZE]
+            placeholders = ",".join("?" * len(batch))
+            rows = self.conn.execute(
+                f"SELECT cep, payload, consultado_em FROM ceps WHERE cep IN ({placeholders})", batch
+            ).fetchall()
+            for cep, payload, consultado_em in rows:
+                ttl = self.ttl if payload is not None else self.negative_ttl
+                if now - consultado_em > ttl:
+                    expired += 1
+                elif payload is None:
+                    found[cep] = (CepProvider.STATUS_INEXISTENTE, None)
+                    self.stats["acertos_negativos"] += 1
+                else:
+                    found[cep] = (CepProvider.STATUS_OK, json.loads(payload))
+                    self.stats["acertos"] += 1
+
+        # Atualiza o instante de acesso (base da remoção LRU)
+        self.conn.executemany("UPDATE ceps SET acessado_em = ? WHERE cep = ?", [(now, cep) for cep in found])
+        self.conn.commit()
+
+        self.stats["expirados"] += expired
+        self.stats["ausentes"] += len(ceps) - len(found) - expired
+        return found
+
+    def put_many(self, items):
+        """Grava pares (cep, (status, dados)); falhas de consulta são ignoradas."""
+        now = time.time()
+        rows = [
+            (cep, json.dumps(data, ensure_ascii=False) if status == CepProvider.STATUS_OK else None, now, now)
+            for cep, (status, data) in items
+            if status != CepProvider.STATUS_FALHA
+        ]
+        self.conn.executemany("INSERT OR REPLACE INTO ceps VALUES (?, ?, ?, ?)", rows)
+        self.conn.commit()
+        self.stats["gravados"] += len(rows)
+        self._evict()
+
+    def _evict(self):
+        """Remove entradas expiradas e, acima do limite, as menos acessadas recentemente."""
+        now = time.time()
+        removed = self.conn.execute(
+            "DELETE FROM ceps WHERE (payload IS NOT NULL AND consultado_em < ?)"
+            " OR (payload IS NULL AND consultado_em < ?)",
+            (now - self.ttl, now - self.negative_ttl),
+        ).rowcount
+
+        (total,) = self.conn.execute("SELECT COUNT(*) FROM ceps").fetchone()
+        if total > self.max_entries:
+            removed += self.conn.execute(
+                "DELETE FROM ceps WHERE cep IN (SELECT cep FROM ceps ORDER BY acessado_em LIMIT ?)",
+                (total - self.max_entries,),
+            ).rowcount
+
+        self.conn.commit()
+        self.stats["removidos"] += removed
+
+    def close(self):
+        self.conn.close()
+
+# --------------------- Base offline de CEPs --------------------- #
+CEP_OFFLINE_DB_PATH = os.path.join(os.path.expanduser("~"), ".datamagi", "cep_offline.sqlite")
+
+
+class CepOfflineIndex:
+    """
+    Índice local (SQLite) de uma base nacional de CEPs, para consultas sem rede.
+    O CEP é armazenado como inteiro na chave primária (rowid), o que mantém
+    o arquivo compacto e a busca por CEP em O(log n).
+    """
+
+    BATCH_SIZE = 900
+    FIELDS = ("logradouro", "bairro", "localidade", "uf")
+
+    def __init__(self, path=CEP_OFFLINE_DB_PATH):
+        import sqlite3
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS ceps ("
+            " cep INTEGER PRIMARY KEY,"
+            " logradouro TEXT,"
+            " bairro TEXT,"
+            " localidade TEXT,"
+            " uf TEXT)"
+        )
+        self.conn.commit()
+
+    def import_frame(self, df):
+        """Grava um DataFrame com as colunas cep + FIELDS; retorna o número de CEPs importados."""
+        ceps = df["cep"].astype(str).str.replace(r"\D", "", regex=True)
+        df = df.assign(cep=ceps)[ceps.str.len() == 8]
+        df = df.astype(object).where(df.notna(), None)
+        rows = [
+            (int(row[0]), *row[1:])
+            for row in df[["cep", *self.FIELDS]].itertuples(index=False, name=None)
+        ]
+        self.conn.executemany("INSERT OR REPLACE INTO ceps VALUES (?, ?, ?, ?, ?)", rows)
+        self.conn.commit()
+        return len(rows)
+
+    def count(self):
+        (total,) = self.conn.execute("SELECT COUNT(*) FROM ceps").fetchone()
+        return total
+
+    def get_many(self, ceps):
+        """Retorna {cep: (status, dados)} apenas para os CEPs encontrados no índice."""
+        ceps = list(ceps)
+        found = {}
+        for start in range(0, len(ceps), self.BATCH_SIZE):
+            batch = [int(cep) for cep in ceps[start:start + self.BATCH_SIZE]]
+            placeholders = ",".join("?" * len(batch))
+            rows = self.conn.execute(
+                f"SELECT cep, {', '.join(self.FIELDS)} FROM ceps WHERE cep IN ({placeholders})", batch
+            ).fetchall()
+            for cep, *values in rows:
+                cep = str(cep).zfill(8)
+                found[cep] = (CepProvider.STATUS_OK, {"cep": cep, **dict(zip(self.FIELDS, values))})
+        return found
+
+    def close(self):
+        self.conn.close()
+
+
+def import_cep_database():
+    """
+    Importa uma base nacional de CEPs (CSV/TXT ou XLSX) para o índice offline.
+    - Aceita dumps abertos em CSV e arquivos da DNE/Correios (separador '@').
+    - Detecta o separador pela primeira linha e lê o arquivo em blocos.
+    - O usuário escolhe as colunas de CEP, logradouro, bairro, cidade e UF.
+    """
+    print("\n[bold yellow]╔══ Importar Base Offline de CEPs ══╗[/bold yellow]\n")
 
-    # Recebe o caminho do arquivo
     file_path = inquirer.text(
-        message="Digite o caminho do arquivo Excel (.xlsx):"
+        message="Digite o caminho do arquivo da base de CEPs (.csv, .txt ou .xlsx):"
     ).execute()
 
+    if not os.path.isfile(file_path):
+        print(f"[bold red]✗ O caminho '{file_path}' não é um arquivo válido![bold red]\n")
+        return
+
+    is_excel = file_path.lower().endswith((".xlsx", ".xls"))
+    encoding = "utf-8"
+    delimiter = ";"
+
     try:
-        df = pd.read_excel(file_path)
+        if is_excel:
+            columns = pd.read_excel(file_path, nrows=0).columns.tolist()
+        else:
+            with open(file_path, "rb") as f:
+                first_line = f.readline()
+            try:
+                first_line = first_line.decode("utf-8")
+            except UnicodeDecodeError:
+                encoding = "latin-1"
+                first_line = first_line.decode("latin-1")
+            delimiter = max(["@", ";", "|", "\t", ","], key=first_line.count)
+
+            has_header = inquirer.confirm(
+                message="A primeira linha do arquivo contém os nomes das colunas?",
+                default=True
+            ).execute()
+            header = 0 if has_header else None
+            sample = pd.read_csv(file_path, sep=delimiter, encoding=encoding, header=header,
+                                 nrows=1, dtype=str)
+            if has_header:
+                columns = sample.columns.tolist()
+            else:
+                # Sem cabeçalho: colunas identificadas pela posição e por um valor de exemplo
+                columns = [Choice(col, f"Coluna {col + 1} (ex.: {sample.iloc[0, col]})") for col in sample.columns]
     except Exception as e:
-        print(f"[bold red]✗ Erro ao carregar o arquivo: {e}[bold red]\n")
+        print(f"[bold red]✗ Erro ao ler o cabeçalho do arquivo: {e}[bold red]\n")
         return
 
-    # Seleciona as colunas necessárias
-    cep_column = inquirer.select(
-        message="Selecione a coluna que contém os CEPs:",
-        choices=df.columns.tolist()
-    ).execute()
+    # Coluna do arquivo -> campo do índice. Uma coluna já escolhida sai das opções seguintes,
+    # senão o segundo campo sobrescreveria o primeiro no mapa
+    column_map = {}
+    for field, label in [("cep", "CEP"), ("logradouro", "Logradouro"), ("bairro", "Bairro"),
+                         ("localidade", "Cidade"), ("uf", "UF")]:
+        available = [c for c in columns if getattr(c, "value", c) not in column_map]
+        column_map[inquirer.select(
+            message=f"Selecione a coluna de {label}:",
+            choices=available
+        ).execute()] = field
 
-    endereco_column = inquirer.select(
-        message="Selecione a coluna de Endereço:",
-        choices=df.columns.tolist()
-    ).execute()
+    index = CepOfflineIndex()
+    total_rows = 0
+    imported = 0
 
-    bairro_column = inquirer.select(
-        message="Selecione a coluna de Bairro:",
-        choices=df.columns.tolist()
-    ).execute()
+    print("\n[cyan]Importando CEPs para a base offline...[/cyan]")
+    try:
+        if is_excel:
+            chunks = [pd.read_excel(file_path, usecols=list(column_map), dtype=str)]
+        else:
+            chunks = pd.read_csv(file_path, sep=delimiter, encoding=encoding, header=header,
+                                 usecols=list(column_map), dtype=str, chunksize=200_000,
+                                 on_bad_lines="skip")
+
+        for chunk in chunks:
+            total_rows += len(chunk)
+            imported += index.import_frame(chunk.rename(columns=column_map))
+            print(f"[green]✓ {total_rows:,} linhas lidas[/green]")
+    except Exception as e:
+        print(f"[bold red]✗ Erro ao importar a base de CEPs: {e}[bold red]\n")
+        index.close()
+        return
 
-    cidade_column = inquirer.select(
-        message="Selecione a coluna de Cidade:",
-        choices=df.columns.tolist()
-    ).execute()
+    total_index = index.count()
+    index.close()
 
-    estado_column = inquirer.select(
-        message="Selecione a coluna de Estado:",
-        choices=df.columns.tolist()
-    ).execute()
+    print("\n[bold green]╔══ Resumo da Operação ══╗[/bold green]")
+    print(f"[white]► Linhas lidas:[/white]              {total_rows:,}")
+    print(f"[white]► CEPs importados:[/white]           {imported:,}")
+    print(f"[white]► Linhas ignoradas (CEP inválido):[/white] {total_rows - imported:,}")
+    print(f"[white]► Total de CEPs na base offline:[/white] {total_index:,}")
+    print(f"\n[bold green]✓ Processo concluído com sucesso![/bold green]")
+    print(f"[dim]📁 Base offline salva em: {CEP_OFFLINE_DB_PATH}[/dim]\n")
 
-    print("\n[cyan]Validando CEPs...[/cyan]")
+# --------------------- Provedores de consulta de CEP --------------------- #
+CEP_PROVIDER_URLS = {
+    "opencep": "https://opencep.com/v1/{cep}.json",
+    "viacep": "https://viacep.com.br/ws/{cep}/json/",
+    "stub": os.environ.get("DATAMAGI_CEP_STUB_URL", "http://127.0.0.1:8765") + "/ws/{cep}/json/",
+}
 
-    # Validação inicial do CEP
-    def validate_cep(value):
-        if pd.isna(value):
-            return None
-        cep = str(value).strip().replace("-", "")
-        if len(cep) != 8 or not cep.isdigit():
-            return None
-        return cep
+# Ordem de failover padrão; pode ser alterada sem editar o código, por ex.:
+#   DATAMAGI_CEP_PROVIDERS="viacep:10,opencep:20"
+#   DATAMAGI_CEP_PROVIDERS="offline,stub:50"
+#   DATAMAGI_CEP_PROVIDERS="https://meu-servidor/cep/{cep}.json:8,opencep"
+DEFAULT_CEP_PROVIDERS = "opencep,viacep"
 
-    # Aplicar validação
-    df[cep_column] = df[cep_column].apply(validate_cep)
 
-    # Remove linhas com CEP inválido
-    initial_row_count = len(df)
-    df_invalid = df[df[cep_column].isna()].copy()
-    df = df.dropna(subset=[cep_column]).copy()
+class CepProvider:
+    """
+    Interface base dos provedores de CEP.
+    - `lookup(cep)` retorna (status, dados) no formato OpenCEP/ViaCEP.
+    - `max_concurrency` limita as consultas simultâneas neste provedor.
+    - `remote` indica consultas pela rede (elegíveis ao cache local).
+    - `authoritative=False` faz um CEP não encontrado seguir para o próximo provedor.
+    """
 
-    print(f"[bold green]✓ Linhas removidas devido a CEPs inválidos: {len(df_invalid)}[/bold green]\n")
+    STATUS_OK = "ok"
+    STATUS_INEXISTENTE = "inexistente"
+    STATUS_FALHA = "falha"
 
-    # Fase 1: Verificar se o CEP existe
-    print("[cyan]Verificando a existência dos CEPs...[/cyan]")
+    remote = True
+    authoritative = True
 
-    def check_cep_exists(cep):
-        try:
-            response = requests.get(f"https://opencep.com/v1/{cep}.json", timeout=5)
-            if response.status_code == 200:
-                data = response.json()
-                return "erro" not in data  # Retorna True se o CEP existir
-            return False
-        except Exception as e:
-            logging.warning(f"Erro ao verificar CEP {cep}: {e}")
-            return False
+    def __init__(self, name, max_concurrency=1):
+        self.name = name
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.stats = {"requisicoes": 0, "retentativas": 0, "limitadas": 0, "falhas": 0}
+
+    def prepare(self, ceps):
+        """Chamado uma vez antes das consultas, com todos os CEPs a resolver."""
 
-    # Adiciona uma nova coluna para marcar CEPs existentes
-    df["EXISTE"] = False
-    for index in track(df.index, description="[cyan]Verificando CEPs...[/cyan]"):
-        cep = df.at[index, cep_column]
-        df.at[index, "EXISTE"] = check_cep_exists(cep)
-        print(f"Verificando linha {index + 1}/{len(df)} - CEP: {cep}")
+    def lookup(self, cep):
+        raise NotImplementedError
 
-    # Fase 2: Obter detalhes dos CEPs existentes
-    print("[cyan]Buscando detalhes dos CEPs existentes...[/cyan]")
-    valid_indices = []
+    def is_throttled(self):
+        """Indica se o provedor está pausado por limite de taxa."""
+        return False
+
+
+class HttpCepProvider(CepProvider):
+    """
+    Provedor HTTP de CEPs (OpenCEP, ViaCEP, servidor local de testes ou URL própria).
+    - Reaproveita conexões (keep-alive) através de uma única requests.Session.
+    - Refaz consultas com backoff exponencial em falhas de rede e respostas 5xx.
+    - Respeita limites de taxa (HTTP 429 / Retry-After), pausando todas as consultas
+      deste provedor; durante a pausa o resolvedor usa o próximo provedor da lista.
+    """
 
-    def fetch_cep_details(cep):
+    def __init__(self, name, url_template, max_concurrency=20, timeout=5, max_retries=3, backoff=0.5):
+        from requests.adapters import HTTPAdapter
+
+        super().__init__(name, max_concurrency)
+        self.url_template = url_template
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._lock = threading.Lock()
+        self._paused_until = 0.0
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def is_throttled(self):
+        with self._lock:
+            return self._paused_until > time.monotonic()
+
+    def _wait_rate_limit(self):
+        """Aguarda enquanto a API estiver sinalizando limite de taxa."""
+        with self._lock:
+            wait = self._paused_until - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+
+    def _pause(self, seconds):
+        """Pausa todas as consultas deste provedor por `seconds` segundos."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def _retry_after(self, response, attempt):
+        """Lê o cabeçalho Retry-After (em segundos) ou usa o backoff padrão."""
         try:
-            response = requests.get(f"https://opencep.com/v1/{cep}.json")
+            return max(float(response.headers.get("Retry-After")), 0)
+        except (TypeError, ValueError):
+            return self.backoff * (2 ** attempt)
+
+    def lookup(self, cep):
+        """Consulta um CEP e retorna (status, dados)."""
+        url = self.url_template.format(cep=cep)
+        for attempt in range(self.max_retries + 1):
+            self._wait_rate_limit()
+            self._count("requisicoes")
+            if attempt:
+                self._count("retentativas")
+
+            try:
+                response = self.session.get(url, timeout=self.timeout)
+            except requests.RequestException as e:
+                logging.warning(f"[{self.name}] Erro ao consultar CEP {cep} (tentativa {attempt + 1}): {e}")
+                time.sleep(self.backoff * (2 ** attempt))
+                continue
+
             if response.status_code == 200:
-                return response.json()
-        except Exception as e:
-            logging.warning(f"Erro ao buscar detalhes do CEP {cep}: {e}")
-            return None
+                try:
+                    data = response.json()
+                except ValueError:
+                    data = None
+                if not isinstance(data, dict) or "erro" in data:
+                    return self.STATUS_INEXISTENTE, None
+                return self.STATUS_OK, data
+
+            if response.status_code in (400, 404):
+                return self.STATUS_INEXISTENTE, None
+
+            if response.status_code == 429:
+                self._count("limitadas")
+                self._pause(self._retry_after(response, attempt))
+                continue
 
-    for index in track(df.index, description="[cyan]Processando CEPs existentes...[/cyan]"):
-        if df.at[index, "EXISTE"]:
-            cep = df.at[index, cep_column]
-            address_data = fetch_cep_details(cep)
-            if address_data:
-                valid_indices.append(index)
-                df.at[index, endereco_column] = address_data.get("logradouro", df.at[index, endereco_column])
-                df.at[index, bairro_column] = address_data.get("bairro", df.at[index, bairro_column])
-                df.at[index, cidade_column] = address_data.get("localidade", df.at[index, cidade_column])
-                df.at[index, estado_column] = address_data.get("uf", df.at[index, estado_column])
-                print(f"Detalhes obtidos para CEP: {cep}")
-            else:
-                print(f"Falha ao buscar detalhes para o CEP: {cep}")
+            logging.warning(f"[{self.name}] Resposta {response.status_code} ao consultar CEP {cep} (tentativa {attempt + 1})")
+            time.sleep(self.backoff * (2 ** attempt))
 
-    # Remove CEPs não existentes do DataFrame
-    df_invalid = pd.concat([df_invalid, df[~df["EXISTE"]]])
-    df_valid = df.loc[valid_indices].copy()
-    df.drop(columns=["EXISTE"], inplace=True)
+        self._count("falhas")
+        return self.STATUS_FALHA, None
 
-    # Resumo final
-    print("\n[bold green]╔══ Resumo Final ══╗[/bold green]")
-    print(f"[white]► Total de linhas no arquivo original:[/white] {initial_row_count:,}")
-    print(f"[white]► CEPs válidos encontrados e detalhados:[/white] {len(df_valid):,}")
-    print(f"[white]► Linhas removidas (CEPs inválidos ou inexistentes):[/white] {len(df_invalid):,}")
 
-    # Pergunta o diretório para salvar
-    output_dir = inquirer.text(
-        message="Digite o caminho para salvar os arquivos:"
-    ).execute()
+class OfflineCepProvider(CepProvider):
+    """
+    Provedor que responde a partir da base offline importada (CepOfflineIndex).
+    Os CEPs são buscados em lote no `prepare`; CEPs ausentes seguem para o
+    próximo provedor da lista (ou são considerados inexistentes se for o último).
+    """
 
-    # Caminhos para os arquivos de saída
-    valid_output_file = os.path.join(output_dir, f"cep_validos_{os.path.basename(file_path)}")
-    invalid_output_file = os.path.join(output_dir, f"cep_invalidos_{os.path.basename(file_path)}")
+    remote = False
+    authoritative = False
 
-    # Salva os arquivos
-    try:
-        df_valid.to_excel(valid_output_file, index=False)
-        df_invalid.to_excel(invalid_output_file, index=False)
-        print(f"\n[bold green]✓ Arquivos salvos com sucesso![bold green]")
-        print(f"[dim]📁 Arquivo com CEPs válidos salvo em: {valid_output_file}[dim]")
-        print(f"[dim]📁 Arquivo com CEPs inválidos salvo em: {invalid_output_file}[dim]\n")
-    except Exception as e:
-        print(f"[bold red]✗ Erro ao salvar os arquivos: {e}[bold red]\n")
+    def __init__(self, name="offline", path=None):
+        super().__init__(name, max_concurrency=1)
+        self.path = path or CEP_OFFLINE_DB_PATH
+        self._found = {}
 
-def validador_de_bancos():
+    def prepare(self, ceps):
+        if not os.path.isfile(self.path):
+            raise FileNotFoundError(f"Base offline de CEPs não encontrada: {self.path}")
+        index = CepOfflineIndex(self.path)
+        self._found = index.get_many(ceps)
+        index.close()
+
+    def lookup(self, cep):
+        return self._found.get(cep, (self.STATUS_INEXISTENTE, None))
+
+
+def build_cep_providers(spec=None, default_concurrency=20):
     """
-    Valida colunas de banco, agência e conta.
-    Remove linhas que não atendem aos critérios:
-    - Banco: 1 a 3 dígitos
-    - Agência: 1 a 4 dígitos
-    - Conta: Não pode ter letras, espaços ou estar vazia.
+    Monta a lista de provedores a partir de "nome[:concorrência],..." (ordem = failover).
+    Nomes aceitos: opencep, viacep, stub, offline ou um modelo de URL com '{cep}'.
     """
-    print("\n[bold yellow]╔══ Iniciando Validação de Banco ══╗[/bold yellow]\n")
+    spec = spec or os.environ.get("DATAMAGI_CEP_PROVIDERS") or DEFAULT_CEP_PROVIDERS
+    providers = []
+    for item in [part.strip() for part in spec.split(",") if part.strip()]:
+        name, _, concurrency = item.rpartition(":")
+        if not name or not concurrency.isdigit():
+            name, concurrency = item, default_concurrency
+
+        if name == "offline":
+            providers.append(OfflineCepProvider())
+        elif name in CEP_PROVIDER_URLS:
+            providers.append(HttpCepProvider(name, CEP_PROVIDER_URLS[name], max_concurrency=concurrency))
+        elif "{cep}" in name:
+            providers.append(HttpCepProvider(name, name, max_concurrency=concurrency))
+        else:
+            raise ValueError(f"Provedor de CEP desconhecido: '{name}'")
+    return providers
 
-    # Recebe o caminho do arquivo
-    file_path = inquirer.text(
-        message="Digite o caminho do arquivo Excel (.xlsx):"
-    ).execute()
 
-    try:
-        df = pd.read_excel(file_path)
-    except Exception as e:
-        print(f"[bold red]✗ Erro ao carregar o arquivo: {e}[bold red]\n")
+class CepResolver:
+    """
+    Resolve CEPs percorrendo uma lista de provedores com failover automático.
+    - Cada provedor tem seu próprio limite de concorrência (asyncio + threads).
+    - Um provedor que falhar (após suas retentativas) ou estiver limitado por taxa
+      é substituído pelo próximo da lista para aquele CEP.
+    - O cache persistente (CepCache) é consultado antes do primeiro provedor remoto
+      e recebe as respostas obtidas pela rede.
+    """
+
+    def __init__(self, providers, cache=None):
+        if not providers:
+            raise ValueError("Informe ao menos um provedor de CEP.")
+        self.providers = providers
+        self.cache = cache
+        self.resolved_by = {provider.name: 0 for provider in providers}
+        self.resolved_by["cache"] = 0
+        self.total_ceps = 0
+
+    def resolve_many(self, ceps, description="[cyan]Consultando CEPs...[/cyan]", show_progress=True):
+        """Resolve vários CEPs; retorna [(status, dados)] na mesma ordem."""
+        ceps = list(ceps)
+        self.total_ceps += len(ceps)
+        for provider in self.providers:
+            provider.prepare(ceps)
+
+        has_remote = any(provider.remote for provider in self.providers)
+        cached = self.cache.get_many(ceps) if self.cache and has_remote else {}
+
+        results = asyncio.run(self._resolve_many_async(ceps, cached, description, show_progress))
+
+        if self.cache:
+            remote_names = {provider.name for provider in self.providers if provider.remote}
+            self.cache.put_many(
+                (cep, result) for cep, (result, source) in zip(ceps, results) if source in remote_names
+            )
+        return [result for result, _ in results]
+
+    async def _resolve_many_async(self, ceps, cached, description, show_progress):
+        from concurrent.futures import ThreadPoolExecutor
+        from rich.progress import Progress
+
+        loop = asyncio.get_running_loop()
+        semaphores = {p.name: asyncio.Semaphore(p.max_concurrency) for p in self.providers}
+        executors = {p.name: ThreadPoolExecutor(max_workers=p.max_concurrency) for p in self.providers}
+        remote = [p for p in self.providers if p.remote]
+        results = [None] * len(ceps)
+
+        async def resolve(cep):
+            answered_missing = failed = False
+            for provider in self.providers:
+                if provider.remote and cep in cached:
+                    self.resolved_by["cache"] += 1
+                    return cached[cep], "cache"
+
+                async with semaphores[provider.name]:
+                    # Failover: pula provedores limitados por taxa enquanto houver alternativa remota
+                    if provider.remote and provider.is_throttled() and provider is not remote[-1]:
+                        continue
+                    status, data = await loop.run_in_executor(executors[provider.name], provider.lookup, cep)
+
+                if status == CepProvider.STATUS_OK or (status == CepProvider.STATUS_INEXISTENTE and provider.authoritative):
+                    self.resolved_by[provider.name] += 1
+                    return (status, data), provider.name
+                answered_missing = answered_missing or status == CepProvider.STATUS_INEXISTENTE
+                failed = failed or status == CepProvider.STATUS_FALHA
+
+            # Só é inexistente se nenhum provedor falhou: "fora da base offline" + "API fora do ar" é falha
+            if answered_missing and not failed:
+                return (CepProvider.STATUS_INEXISTENTE, None), None
+            return (CepProvider.STATUS_FALHA, None), None
+
+        try:
+            with Progress(disable=not show_progress) as progress:
+                task = progress.add_task(description, total=len(ceps))
+
+                async def worker(position, cep):
+                    results[position] = await resolve(cep)
+                    progress.advance(task)
+
+                await asyncio.gather(*(worker(position, cep) for position, cep in enumerate(ceps)))
+        finally:
+            for executor in executors.values():
+                executor.shutdown(wait=False)
+
+        return results
+
+
+# --------------------- Servidor local de CEP para testes --------------------- #
+def make_cep_stub_server(host="127.0.0.1", port=8765, latency_ms=0, error_rate=0.0, rate_limit=0, offline_path=None):
+    """
+    Cria um servidor HTTP local que imita as APIs de CEP (sem internet).
+    - Rotas no formato ViaCEP (/ws/{cep}/json/) e OpenCEP (/v1/{cep}.json).
+    - Responde pela base offline, se existir; senão gera endereços sintéticos
+      determinísticos (CEPs terminados em 9 são inexistentes).
+    - `latency_ms`, `error_rate` (respostas 500) e `rate_limit` (req/s, responde 429)
+      permitem medir vazão e o comportamento de retentativas e failover.
+    """
+    import random
+    import re
+    import sqlite3
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+    offline_path = offline_path or CEP_OFFLINE_DB_PATH
+    use_offline = os.path.isfile(offline_path)
+    state = {"window": int(time.time()), "count": 0}
+    state_lock = threading.Lock()
+    local = threading.local()
+
+    def find_address(cep):
+        if use_offline:
+            if not hasattr(local, "conn"):
+                local.conn = sqlite3.connect(offline_path)
+            row = local.conn.execute(
+                "SELECT logradouro, bairro, localidade, uf FROM ceps WHERE cep = ?", (int(cep),)
+            ).fetchone()
+            if not row:
+                return None
+            return {"cep": cep, **dict(zip(CepOfflineIndex.FIELDS, row))}
+        if cep.endswith("9"):
+            return None
+        return {
+            "cep": cep,
+            "logradouro": f"Rua Sintética {cep[:5]}",
+            "bairro": f"Bairro {cep[5:]}",
+            "localidade": "Cidade Teste",
+            "uf": "SP",
+        }
+
+    class CepStubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Resposta enviada em um único pacote (evita atrasos de Nagle/ACK atrasado no keep-alive)
+        wbufsize = -1
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status, payload=None, headers=None):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8") if payload is not None else b""
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            match = re.fullmatch(r"/(?:ws/(\d+)/json/?|v1/(\d+)\.json)", self.path)
+            if not match:
+                return self._send(404, {"erro": True})
+
+            if rate_limit:
+                with state_lock:
+                    now = int(time.time())
+                    if now != state["window"]:
+                        state["window"], state["count"] = now, 0
+                    state["count"] += 1
+                    limited = state["count"] > rate_limit
+                if limited:
+                    return self._send(429, {"erro": "limite de requisições"}, {"Retry-After": "1"})
+
+            if latency_ms:
+                time.sleep(latency_ms / 1000)
+            if error_rate and random.random() < error_rate:
+                return self._send(500, {"erro": "falha simulada"})
+
+            cep = match.group(1) or match.group(2)
+            if len(cep) != 8:
+                return self._send(400, {"erro": True})
+            address = find_address(cep)
+            if address is None:
+                return self._send(200, {"erro": True})
+            self._send(200, address)
+
+    return ThreadingHTTPServer((host, port), CepStubHandler)
+
+
+def run_cep_stub_server():
+    """Inicia o servidor local de CEP para testes até o usuário interromper (Ctrl+C)."""
+    print("\n[bold yellow]╔══ Servidor Local de CEP (Testes) ══╗[/bold yellow]\n")
+
+    try:
+        port = int(inquirer.text(message="Porta do servidor:", default="8765").execute())
+        latency_ms = int(inquirer.text(message="Latência simulada por requisição (ms):", default="0").execute())
+        error_rate = float(inquirer.text(message="Taxa de erros simulados (0 a 1):", default="0").execute())
+        rate_limit = int(inquirer.text(message="Limite de requisições por segundo (0 = sem limite):", default="0").execute())
+    except ValueError:
+        print("[bold red]✗ Valor numérico inválido![bold red]\n")
+        return
+
+    try:
+        server = make_cep_stub_server(port=port, latency_ms=latency_ms, error_rate=error_rate, rate_limit=rate_limit)
+    except OSError as e:
+        print(f"[bold red]✗ Erro ao iniciar o servidor: {e}[bold red]\n")
+        return
+
+    print(f"[cyan]Servidor ouvindo em http://127.0.0.1:{port} (rotas /ws/<cep>/json/ e /v1/<cep>.json)[/cyan]")
+    print(f"[dim]Use DATAMAGI_CEP_PROVIDERS=stub e DATAMAGI_CEP_STUB_URL=http://127.0.0.1:{port} para consultá-lo.[/dim]")
+    print("[dim]Pressione Ctrl+C para encerrar.[/dim]\n")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    print("\n[bold green]✓ Servidor encerrado.[/bold green]\n")
+
+def normalize_cep(value):
+    """Remove o hífen e retorna o CEP com 8 dígitos, ou None se for inválido."""
+    if pd.isna(value):
+        return None
+    cep = str(value).strip().replace("-", "")
+    if len(cep) != 8 or not cep.isdigit():
+        return None
+    return cep
+
+
+CEP_INVALID_REASONS = {
+    CepProvider.STATUS_INEXISTENTE: "inexistente",
+    CepProvider.STATUS_FALHA: "falha na consulta",
+}
+
+
+def resolve_cep_frame(df, cep_column, address_columns, providers, cache=None, show_progress=True):
+    """
+    Valida o formato dos CEPs, resolve apenas os CEPs únicos pelos provedores e distribui
+    os endereços para todas as linhas com um join vetorizado.
+    - address_columns: {"logradouro": col, "bairro": col, "localidade": col, "uf": col}
+    - df_invalidos ganha a coluna MOTIVO_CEP: "formato inválido", "inexistente" ou "falha na
+      consulta" (provedores fora do ar; vale consultar de novo mais tarde).
+    Retorna (df_validos, df_invalidos, resolver).
+    """
+    df = df.copy()
+    df[cep_column] = transform_unique(as_text(df[cep_column]), normalize_cep)
+
+    # Linhas com CEP em formato inválido
+    df_invalid = df[df[cep_column].isna()].copy()
+    df_invalid["MOTIVO_CEP"] = "formato inválido"
+    df = df.dropna(subset=[cep_column]).copy()
+
+    # Consulta apenas os CEPs únicos: o mesmo payload indica existência e traz os detalhes
+    unique_ceps = df[cep_column].unique().tolist()
+    resolver = CepResolver(providers, cache=cache)
+    results = resolver.resolve_many(unique_ceps, show_progress=show_progress)
+
+    lookup_df = pd.DataFrame(
+        {
+            "EXISTE": [status == CepProvider.STATUS_OK for status, _ in results],
+            "MOTIVO_CEP": [CEP_INVALID_REASONS.get(status) for status, _ in results],
+            **{
+                f"_api_{field}": [(data or {}).get(field) for _, data in results]
+                for field in address_columns
+            },
+        },
+        index=pd.Index(unique_ceps, name=cep_column),
+    )
+
+    # Distribui os resultados para todas as linhas com um join vetorizado
+    df = df.drop(columns=["EXISTE", "MOTIVO_CEP"], errors="ignore").join(lookup_df, on=cep_column)
+    for field, column in address_columns.items():
+        api_values = df[f"_api_{field}"]
+        df[column] = api_values.where(df["EXISTE"] & api_values.notna(), df[column])
+    df.drop(columns=[f"_api_{field}" for field in address_columns], inplace=True)
+
+    # CEPs inexistentes ou não consultados vão para o arquivo de inválidos, com o motivo
+    df_invalid = pd.concat([df_invalid, df[~df["EXISTE"]].drop(columns=["EXISTE"])])
+    df_valid = df[df["EXISTE"]].drop(columns=["MOTIVO_CEP"])
+    return df_valid, df_invalid, resolver
+
+
+def validate_and_format_cep():
+    """Valida, verifica existência e busca detalhes de CEPs usando a API OpenCEP."""
+    print("\n[bold yellow]╔══ Iniciando Validação e Busca de CEP ══╗[/bold yellow]\n")
+
+    # Recebe o caminho do arquivo
+    file_path = inquirer.text(
+        message="Digite o caminho do arquivo Excel (.xlsx):"
+    ).execute()
+
+    try:
+        sample_df = probe_table(file_path)
+    except Exception as e:
+        print(f"[bold red]✗ Erro ao carregar o arquivo: {e}[bold red]\n")
+        return
+
+    # Seleciona as colunas necessárias
+    cep_column = inquirer.select(
+        message="Selecione a coluna que contém os CEPs:",
+        choices=column_choices(sample_df)
+    ).execute()
+
+    endereco_column = inquirer.select(
+        message="Selecione a coluna de Endereço:",
+        choices=column_choices(sample_df)
+    ).execute()
+
+    bairro_column = inquirer.select(
+        message="Selecione a coluna de Bairro:",
+        choices=column_choices(sample_df)
+    ).execute()
+
+    cidade_column = inquirer.select(
+        message="Selecione a coluna de Cidade:",
+        choices=column_choices(sample_df)
+    ).execute()
+
+    estado_column = inquirer.select(
+        message="Selecione a coluna de Estado:",
+        choices=column_choices(sample_df)
+    ).execute()
+
+    api_spec = os.environ.get("DATAMAGI_CEP_PROVIDERS") or DEFAULT_CEP_PROVIDERS
+    source = inquirer.select(
+        message="Selecione a fonte de consulta dos CEPs:",
+        choices=[
+            Choice("api", f"APIs online (failover: {api_spec})"),
+            Choice("offline", "Base offline importada"),
+            Choice("offline_api", "Base offline + APIs para CEPs não encontrados")
+        ]
+    ).execute()
+
+    if source in ("offline", "offline_api") and not os.path.isfile(CEP_OFFLINE_DB_PATH):
+        print("[bold red]✗ Base offline de CEPs não encontrada! Importe a base antes de usar este modo.[bold red]\n")
+        return
+
+    cache = None
+    concurrency = 20
+    if source != "offline":
+        concurrency = inquirer.text(
+            message="Número máximo de consultas simultâneas por provedor:",
+            default="20"
+        ).execute()
+        try:
+            concurrency = int(concurrency)
+        except ValueError:
+            concurrency = 20
+
+        use_cache = inquirer.confirm(
+            message="Usar o cache local de CEPs já consultados?",
+            default=True
+        ).execute()
+        cache = CepCache() if use_cache else None
+
+    provider_spec = {"api": api_spec, "offline": "offline", "offline_api": f"offline,{api_spec}"}[source]
+    try:
+        providers = build_cep_providers(provider_spec, default_concurrency=concurrency)
+    except ValueError as e:
+        print(f"[bold red]✗ {e}[bold red]\n")
+        return
+
+    address_columns = {
+        "logradouro": endereco_column,
+        "bairro": bairro_column,
+        "localidade": cidade_column,
+        "uf": estado_column,
+    }
+
+    print("\n[cyan]Carregando o arquivo...[/cyan]")
+    try:
+        df = FRAME_CACHE.load(file_path, pd.read_excel)
+    except Exception as e:
+        print(f"[bold red]✗ Erro ao carregar o arquivo: {e}[bold red]\n")
+        if cache:
+            cache.close()
+        return
+    initial_row_count = len(df)
+
+    print("\n[cyan]Validando e consultando CEPs únicos "
+          f"via {', '.join(p.name for p in providers)}...[/cyan]")
+    df_valid, df_invalid, resolver = resolve_cep_frame(df, cep_column, address_columns, providers, cache=cache)
+    if cache:
+        cache.close()
+
+    # Resumo final
+    print("\n[bold green]╔══ Resumo Final ══╗[/bold green]")
+    print(f"[white]► Total de linhas no arquivo original:[/white] {initial_row_count:,}")
+    print(f"[white]► CEPs válidos encontrados e detalhados:[/white] {len(df_valid):,}")
+    print(f"[white]► CEPs únicos consultados:[/white] {resolver.total_ceps:,}")
+    print(f"[white]► Linhas removidas (CEPs inválidos ou inexistentes):[/white] {len(df_invalid):,}")
+    for reason, total in df_invalid["MOTIVO_CEP"].value_counts().items():
+        print(f"[dim]  • {reason}: {total:,}[/dim]")
+    failures = int((df_invalid["MOTIVO_CEP"] == CEP_INVALID_REASONS[CepProvider.STATUS_FALHA]).sum())
+    if failures:
+        print(f"[yellow]⚠ {failures:,} linhas não puderam ser consultadas (provedores indisponíveis); "
+              f"tente novamente mais tarde.[/yellow]")
+    for name, total in resolver.resolved_by.items():
+        if total:
+            print(f"[white]► CEPs resolvidos via {name}:[/white] {total:,}")
+    for provider in providers:
+        if provider.remote and provider.stats["requisicoes"]:
+            print(f"[white]► Requisições ({provider.name}):[/white] {provider.stats['requisicoes']:,} "
+                  f"(retentativas: {provider.stats['retentativas']:,}, limitadas: {provider.stats['limitadas']:,}, "
+                  f"falhas: {provider.stats['falhas']:,})")
+    if cache:
+        print(f"[white]► Cache de CEPs:[/white] {cache.stats['acertos']:,} acertos, "
+              f"{cache.stats['acertos_negativos']:,} acertos negativos, "
+              f"{cache.stats['ausentes'] + cache.stats['expirados']:,} faltas "
+              f"({cache.stats['expirados']:,} expirados), {cache.stats['removidos']:,} removidos")
+
+    # Pergunta o diretório para salvar
+    output_dir = inquirer.text(
+        message="Digite o caminho para salvar os arquivos:"
+    ).execute()
+
+    # Caminhos para os arquivos de saída
+    valid_output_file = os.path.join(output_dir, f"cep_validos_{os.path.basename(file_path)}")
+    invalid_output_file = os.path.join(output_dir, f"cep_invalidos_{os.path.basename(file_path)}")
+
+    # Salva os arquivos
+    try:
+        df_valid.to_excel(valid_output_file, index=False)
+        df_invalid.to_excel(invalid_output_file, index=False)
+        print(f"\n[bold green]✓ Arquivos salvos com sucesso![bold green]")
+        print(f"[dim]📁 Arquivo com CEPs válidos salvo em: {valid_output_file}[dim]")
+        print(f"[dim]📁 Arquivo com CEPs inválidos salvo em: {invalid_output_file}[dim]\n")
+    except Exception as e:
+        print(f"[bold red]✗ Erro ao salvar os arquivos: {e}[bold red]\n")
+
+def validador_de_bancos():
+    """
+    Valida colunas de banco, agência e conta.
+    Remove linhas que não atendem aos critérios:
+    - Banco: 1 a 3 dígitos
+    - Agência: 1 a 4 dígitos
+    - Conta: Não pode ter letras, espaços ou estar vazia.
+    """
+    print("\n[bold yellow]╔══ Iniciando Validação de Banco ══╗[/bold yellow]\n")
+
+    # Recebe o caminho do arquivo
+    file_path = inquirer.text(
+        message="Digite o caminho do arquivo Excel (.xlsx):"
+    ).execute()
+
+    try:
+        sample_df = probe_table(file_path)
+    except Exception as e:
+        print(f"[bold red]✗ Erro ao carregar o arquivo: {e}[bold red]\n")
         return
 
     # Seleciona as colunas necessárias
     banco_column = inquirer.select(
         message="Selecione a coluna de Banco:",
-        choices=df.columns.tolist()
+        choices=column_choices(sample_df)
     ).execute()
 
     agencia_column = inquirer.select(
         message="Selecione a coluna de Agência:",
-        choices=df.columns.tolist()
+        choices=column_choices(sample_df)
     ).execute()
 
     conta_column = inquirer.select(
         message="Selecione a coluna de Conta:",
-        choices=df.columns.tolist()
+        choices=column_choices(sample_df)
     ).execute()
 
+    try:
+        df = FRAME_CACHE.load(file_path, pd.read_excel)
+    except Exception as e:
+        print(f"[bold red]✗ Erro ao carregar o arquivo: {e}[bold red]\n")
+        return
+
     print("\n[cyan]Validando dados...[/cyan]")
 
     # Funções de validação
@@ -1958,9 +4559,9 @@ def validador_de_bancos():
     initial_row_count = len(df)
 
     # Aplica validação para todas as colunas e filtra as linhas inválidas
-    df["VALIDO"] = df[banco_column].apply(is_valid_banco) & \
-                   df[agencia_column].apply(is_valid_agencia) & \
-                   df[conta_column].apply(is_valid_conta)
+    df["VALIDO"] = transform_unique(df[banco_column], is_valid_banco) & \
+                   transform_unique(df[agencia_column], is_valid_agencia) & \
+                   transform_unique(df[conta_column], is_valid_conta)
 
     df_invalid = df[~df["VALIDO"]].copy()  # Linhas inválidas
     df = df[df["VALIDO"]].copy()           # Linhas válidas
@@ -2008,7 +4609,7 @@ def validate_sex_column():
     ).execute()
 
     try:
-        df = pd.read_excel(file_path)
+        sample_df = probe_table(file_path)
     except Exception as e:
         print(f"[bold red]✗ Erro ao carregar o arquivo: {e}[/bold red]\n")
         return
@@ -2016,15 +4617,21 @@ def validate_sex_column():
     # Seleciona a coluna de sexo
     column_name = inquirer.select(
         message="Selecione a coluna que contém os valores de sexo:",
-        choices=df.columns.tolist()
+        choices=column_choices(sample_df)
     ).execute()
 
+    try:
+        df = FRAME_CACHE.load(file_path, pd.read_excel)
+    except Exception as e:
+        print(f"[bold red]✗ Erro ao carregar o arquivo: {e}[/bold red]\n")
+        return
+
     print("\n[cyan]Validando a coluna de sexo...[/cyan]")
 
     # Processando os valores
     valid_sex_values = {"M": "Masculino", "F": "Feminino"}
     try:
-        df[column_name] = df[column_name].apply(lambda x: valid_sex_values.get(str(x).strip(), x))
+        df[column_name] = transform_unique(df[column_name], lambda x: valid_sex_values.get(str(x).strip(), x))
 
         # Filtra as linhas válidas
         valid_rows = df[column_name].isin(["Masculino", "Feminino"])
@@ -2086,29 +4693,24 @@ def extract_ddd_and_number():
         choices=df.columns.tolist()
     ).execute()
 
-    # Inicializa contadores
     total_registros = len(df)
-    registros_validos = 0
-    registros_invalidos = 0
 
-    # Processa cada linha e separa o DDD do número
+    # Separa o DDD do número (uma vez por valor distinto)
     def process_phone(value):
-        nonlocal registros_validos, registros_invalidos
         if pd.isna(value):
-            registros_invalidos += 1
             return None, None
 
         value = str(value).strip()
         if len(value) == 11 and value.isdigit():
-            registros_validos += 1
             return value[:2], value[2:]
         else:
-            registros_invalidos += 1
             return None, None
 
     print("\n[cyan]Processando números...[/cyan]")
 
-    df[ddd_column], df[phone_column] = zip(*df[phone_column].apply(process_phone))
+    df[ddd_column], df[phone_column] = zip(*transform_unique(df[phone_column], process_phone))
+    registros_validos = int(df[ddd_column].notna().sum())
+    registros_invalidos = total_registros - registros_validos
 
     # Exibe resumo da operação
     print("\n[bold green]╔══ Resumo da Operação ══╗[/bold green]")
@@ -2380,32 +4982,24 @@ def whitelist_blacklist_removal_num():
 def whitelist_blacklist_removal_cpf():
     """
     Remove linhas do arquivo base que possuem CPFs contidos no arquivo de blacklist.
-    Suporta arquivos XLSX ou CSV, sempre carregando e salvando como string (dtype=str).
-    Mantém o mesmo formato de saída (XLSX ou CSV) do arquivo base.
+    Suporta arquivos XLSX, CSV (também .gz/.zst), Parquet ou Feather, sempre carregando
+    e salvando como string (dtype=str). Mantém o mesmo formato de saída do arquivo base.
+    Apenas as colunas de CPF são carregadas para decidir as linhas; as linhas completas
+    são gravadas depois, lendo o arquivo base em blocos.
     """
     import os
-    import pandas as pd
-    from InquirerPy import inquirer
-    from pathlib import Path
-    from rich.progress import track
 
     print("\n[bold yellow]╔══ Remoção de Linhas com CPFs na Blacklist ══╗[/bold yellow]\n")
 
-    # Função auxiliar para carregar XLSX ou CSV como string
-    def load_file_generic(file_path):
-        if file_path.lower().endswith(".xlsx"):
-            return pd.read_excel(file_path, engine="openpyxl", dtype=str)
-        elif file_path.lower().endswith(".csv"):
-            try:
-                return pd.read_csv(file_path, sep=';', dtype=str)
-            except:
-                return pd.read_csv(file_path, sep=',', dtype=str)
-        else:
-            raise ValueError("Formato de arquivo não suportado! Use .xlsx ou .csv.")
+    # Função auxiliar: cabeçalho e amostra de qualquer formato suportado
+    def probe_file_generic(file_path):
+        if not file_path.lower().endswith(TABLE_EXTENSIONS):
+            raise ValueError("Formato de arquivo não suportado! Use .xlsx, .csv, .csv.gz, .csv.zst, .parquet ou .feather.")
+        return probe_table(file_path)
 
-    # 1) Carrega o arquivo base
+    # 1) Arquivo base (somente cabeçalho e amostra)
     base_file_path = inquirer.text(
-        message="Digite o caminho do arquivo base (XLSX ou CSV):"
+        message="Digite o caminho do arquivo base (XLSX, CSV, Parquet ou Feather):"
     ).execute()
 
     if not os.path.isfile(base_file_path):
@@ -2413,24 +5007,24 @@ def whitelist_blacklist_removal_cpf():
         return
 
     try:
-        base_df = load_file_generic(base_file_path)
+        base_sample = probe_file_generic(base_file_path)
     except Exception as e:
         print(f"[bold red]✗ Erro ao carregar o arquivo base: {e}[bold red]\n")
         return
 
-    if base_df.empty:
+    if base_sample.empty:
         print("[bold red]✗ O arquivo base está vazio ou não possui dados válidos.[bold red]\n")
         return
 
     # Seleciona a coluna de CPF no arquivo base
     base_cpf_col = inquirer.select(
         message="Selecione a coluna de CPF no arquivo base:",
-        choices=base_df.columns.tolist()
+        choices=column_choices(base_sample)
     ).execute()
 
-    # 2) Carrega o arquivo de blacklist
+    # 2) Arquivo de blacklist
     blacklist_file_path = inquirer.text(
-        message="Digite o caminho do arquivo de blacklist (XLSX ou CSV):"
+        message="Digite o caminho do arquivo de blacklist (XLSX, CSV, Parquet ou Feather):"
     ).execute()
 
     if not os.path.isfile(blacklist_file_path):
@@ -2438,36 +5032,40 @@ def whitelist_blacklist_removal_cpf():
         return
 
     try:
-        blacklist_df = load_file_generic(blacklist_file_path)
+        blacklist_sample = probe_file_generic(blacklist_file_path)
     except Exception as e:
         print(f"[bold red]✗ Erro ao carregar o arquivo de blacklist: {e}[bold red]\n")
         return
 
-    if blacklist_df.empty:
+    if blacklist_sample.empty:
         print("[bold red]✗ O arquivo de blacklist está vazio ou não possui dados válidos.[bold red]\n")
         return
 
     # Seleciona a coluna de CPF no arquivo de blacklist
     blacklist_cpf_col = inquirer.select(
         message="Selecione a coluna de CPF no arquivo de blacklist:",
-        choices=blacklist_df.columns.tolist()
+        choices=column_choices(blacklist_sample)
     ).execute()
 
     print("\n[cyan]Removendo do arquivo base os CPFs presentes na blacklist...[/cyan]")
 
-    # 3) Cria um conjunto com os CPFs da blacklist (padronizando tudo como string sem espaços)
-    black_set = set(blacklist_df[blacklist_cpf_col].astype(str).str.strip())
+    # 3) Lê apenas as colunas de CPF e monta o conjunto da blacklist (strings sem espaços)
+    try:
+        blacklist_df = read_table(blacklist_file_path, usecols=[blacklist_cpf_col])
+        base_keys = read_key_columns(base_file_path, [base_cpf_col])
+    except Exception as e:
+        print(f"[bold red]✗ Erro ao carregar as colunas de CPF: {e}[bold red]\n")
+        return
+    black_set = set(as_text(blacklist_df[blacklist_cpf_col]).astype(str).str.strip())
 
-    initial_row_count = len(base_df)
+    initial_row_count = len(base_keys)
 
-    # 4) Marca quem NÃO está na blacklist como VALIDO
-    base_df["VALIDO"] = ~base_df[base_cpf_col].astype(str).str.strip().isin(black_set)
+    # 4) Marca quem NÃO está na blacklist como válido
+    valid_mask = ~as_text(base_keys[base_cpf_col]).astype(str).str.strip().isin(black_set).to_numpy()
+    del base_keys
 
-    valid_df = base_df[base_df["VALIDO"]].drop(columns=["VALIDO"]).copy()    # Linhas válidas
-    invalid_df = base_df[~base_df["VALIDO"]].drop(columns=["VALIDO"]).copy() # Linhas removidas
-
-    linhas_removidas = len(invalid_df)
-    linhas_restantes = len(valid_df)
+    linhas_restantes = int(valid_mask.sum())
+    linhas_removidas = initial_row_count - linhas_restantes
 
     # Exibe resumo da operação
     print("\n[bold green]╔══ Resumo da Operação ══╗[/bold green]")
@@ -2484,25 +5082,13 @@ def whitelist_blacklist_removal_cpf():
         print(f"[bold red]✗ O caminho '{output_dir}' não é uma pasta válida![bold red]\n")
         return
 
-    # 6) Define nomes dos arquivos de saída (mantendo extensão do base)
-    base_stem = Path(base_file_path).stem
-    ext = Path(base_file_path).suffix.lower()
-
-    valid_output_file = os.path.join(output_dir, f"whitelist_{base_stem}{ext}")
-    invalid_output_file = os.path.join(output_dir, f"blacklist_{base_stem}{ext}")
-
-    # 7) Salva no mesmo formato do base
-    def save_in_same_format(df_local, path_out):
-        if ext == ".xlsx":
-            df_local.to_excel(path_out, index=False, engine="openpyxl")
-        elif ext == ".csv":
-            df_local.to_csv(path_out, sep=';', index=False, encoding='utf-8')
-        else:
-            raise ValueError("Formato de arquivo não suportado!")
+    # 6) Define nomes dos arquivos de saída (mantendo o formato do base, inclusive compressão)
+    valid_output_file = output_path_for(base_file_path, output_dir, "whitelist_")
+    invalid_output_file = output_path_for(base_file_path, output_dir, "blacklist_")
 
+    # 7) Grava as linhas completas das duas saídas em uma única passada pelo arquivo base
     try:
-        save_in_same_format(valid_df, valid_output_file)
-        save_in_same_format(invalid_df, invalid_output_file)
+        stream_masked_rows(base_file_path, [(valid_output_file, valid_mask), (invalid_output_file, ~valid_mask)])
         print(f"\n[bold green]✓ Arquivos salvos com sucesso![bold green]")
         print(f"[dim]📁 Arquivo com CPFs válidos salvo em: {valid_output_file}[dim]")
         print(f"[dim]📁 Arquivo com CPFs removidos salvo em: {invalid_output_file}[dim]\n")
@@ -2551,7 +5137,7 @@ def filter_num_nine():
 
     # Aplica a formatação e filtra números inválidos
     initial_row_count = len(df)
-    df[number_column] = df[number_column].apply(format_number)
+    df[number_column] = transform_unique(df[number_column], format_number)
 
     df_invalid = df[df[number_column].isna()].copy()  # Números inválidos
     df = df.dropna(subset=[number_column]).copy()     # Números válidos
@@ -2635,9 +5221,9 @@ def filter_back_age():
     # Aplica a validação e filtra as linhas inválidas
     initial_row_count = len(df)
     df["VALIDO"] = ~(
-        df[banco_column].apply(is_invalid) |
-        df[agencia_column].apply(is_invalid) |
-        df[conta_column].apply(is_invalid)
+        transform_unique(df[banco_column], is_invalid) |
+        transform_unique(df[agencia_column], is_invalid) |
+        transform_unique(df[conta_column], is_invalid)
     )
 
     df_invalid = df[~df["VALIDO"]].copy()  # Linhas inválidas
@@ -2721,8 +5307,8 @@ def merge_ddd_number():
             return isinstance(value, str) and value.isdigit() and len(value) == 9
 
         # Aplica filtros de validação
-        df["VALIDO"] = df[ddd_column].astype(str).apply(is_valid_ddd) & \
-                       df[number_column].astype(str).apply(is_valid_number)
+        df["VALIDO"] = transform_unique(df[ddd_column].astype(str), is_valid_ddd) & \
+                       transform_unique(df[number_column].astype(str), is_valid_number)
 
         df_valid = df[df["VALIDO"]].copy()  # Linhas válidas
         df_invalid = df[~df["VALIDO"]].copy()  # Linhas inválidas
@@ -2977,7 +5563,7 @@ def validar_numeros_celular():
         # Aplica a validação com barra de progresso
         with Progress() as progress:
             task = progress.add_task("Validando números", total=len(df))
-            df["VALIDO"] = df[celular_column].apply(lambda x: is_valid_number(x))
+            df["VALIDO"] = transform_unique(df[celular_column], is_valid_number)
             progress.update(task, advance=len(df))
 
         # Separa números válidos e inválidos, mantendo apenas a coluna CPF
@@ -3105,7 +5691,7 @@ def formatar_numeros_para_11_digitos():
             return value  # Retorna o valor original
 
         # Aplica a formatação na coluna selecionada
-        df[column_name] = df[column_name].apply(format_number)
+        df[column_name] = transform_unique(df[column_name], format_number)
 
         # Pergunta o diretório para salvar o arquivo formatado
         output_dir = inquirer.text(
@@ -3675,7 +6261,7 @@ def validate_multiple_phone_columns_simple_split():
 
     # 4) Cria uma máscara booleana: se a PRIMEIRA coluna de telefone for válida => True
     first_phone_col = selected_columns[0]
-    mask_valid = df[first_phone_col].apply(is_valid_phone)
+    mask_valid = transform_unique(df[first_phone_col], is_valid_phone)
 
     # 5) Separa em dois DataFrames
     df_valid = df[mask_valid].copy()
@@ -4102,7 +6688,7 @@ def merge_folder_files_to_csv():
 
     for col in monetary_columns:
         if col in df_first_str.columns:
-            df_first_str[col] = df_first_str[col].apply(convert_to_monetary)
+            df_first_str[col] = transform_unique(df_first_str[col], convert_to_monetary)
 
     master_df = df_first_str.copy()
     master_columns = master_df.columns.tolist()
@@ -4127,7 +6713,7 @@ def merge_folder_files_to_csv():
         # Aplica conversão monetária
         for col in monetary_columns:
             if col in df_str.columns:
-                df_str[col] = df_str[col].apply(convert_to_monetary)
+                df_str[col] = transform_unique(df_str[col], convert_to_monetary)
 
         # Reindexa e concatena
         df_str = df_str.reindex(columns=master_columns)
@@ -5190,7 +7776,8 @@ def unify_csv_in_chunks_1m_lines():
     1) Recebe uma pasta contendo apenas arquivos CSV.
     2) Descobre a interseção de colunas (colunas em comum em todos os arquivos).
     3) Concatena todos os arquivos (apenas as colunas comuns).
-    4) Divide em arquivos CSV de até 1.000.000 linhas cada.
+    4) Divide em arquivos de até 1.000.000 linhas cada (CSV por padrão, ou CSV compactado,
+       Parquet ou Feather).
     5) Salva em uma subpasta 'unified_csv_1m' dentro da pasta original.
     """
 
@@ -5222,6 +7809,18 @@ def unify_csv_in_chunks_1m_lines():
 
     console.print(f"[cyan]→ Encontrados {len(all_files)} arquivos CSV na pasta.[/cyan]\n")
 
+    output_format = inquirer.select(
+        message="Formato dos arquivos gerados:",
+        choices=[
+            Choice("csv", "CSV (.csv)"),
+            Choice("csv.gz", "CSV compactado (.csv.gz)"),
+            Choice("csv.zst", "CSV compactado (.csv.zst)"),
+            Choice("parquet", "Parquet (.parquet)"),
+            Choice("feather", "Feather (.feather)"),
+        ],
+        default="csv"
+    ).execute()
+
     # ---------------------------------------------------------------------------
     # 2) Descobrir colunas comuns (lendo só o cabeçalho de cada CSV).
     # ---------------------------------------------------------------------------
@@ -5342,20 +7941,23 @@ def unify_csv_in_chunks_1m_lines():
         end_idx = start_idx + chunk_size
         df_chunk = df_unified.iloc[start_idx:end_idx].copy()
 
-        chunk_name = f"unified_chunk_{chunk_index + 1}.csv"
+        chunk_name = f"unified_chunk_{chunk_index + 1}{OUTPUT_FORMATS[output_format]}"
         chunk_path = os.path.join(output_dir, chunk_name)
 
-        # QUOTE_NONE -> não coloca aspas em campos
-        # Nenhuma célula será envolvida por aspas mesmo que contenha caracteres especiais
-        # Substituir escapechar se desejar (evitar perda de dados).
-        df_chunk.to_csv(
-            chunk_path,
-            index=False,
-            sep=';',
-            encoding='utf-8',
-            quoting=csv.QUOTE_NONE,
-            escapechar='\\'
-        )
+        if output_format in ("parquet", "feather"):
+            write_table(df_chunk, chunk_path)
+        else:
+            # QUOTE_NONE -> não coloca aspas em campos
+            # Nenhuma célula será envolvida por aspas mesmo que contenha caracteres especiais
+            # Substituir escapechar se desejar (evitar perda de dados).
+            df_chunk.to_csv(
+                chunk_path,
+                index=False,
+                sep=';',
+                encoding='utf-8',
+                quoting=csv.QUOTE_NONE,
+                escapechar='\\'
+            )
         console.print(f"[green]✓ Salvo: {chunk_path} com {len(df_chunk):,} linhas.[/green]")
 
         start_idx = end_idx
@@ -5366,7 +7968,1951 @@ def unify_csv_in_chunks_1m_lines():
 
 
 
+# --------------------- Operações reutilizáveis (modo não interativo) --------------------- #
+# Cada operação recebe um DataFrame (tudo como string) e retorna o DataFrame resultante.
+# Operações que produzem informações extras retornam (DataFrame, dict).
+
+def normalize_cpf_series(series):
+    """Remove caracteres não numéricos e completa com zeros à esquerda até 11 dígitos."""
+    return as_text(series).fillna("").astype(str).str.replace(r"\D", "", regex=True).str.zfill(11)
+
+
+def step_filtrar(df, coluna, valor):
+    """Mantém as linhas em que `coluna` é igual a `valor`."""
+    return df[df[coluna].astype(str) == str(valor)]
+
+
+def step_filtrar_numerico(df, coluna, maior_que=None, minimo=None, maximo=None):
+    """Mantém valores numéricos maiores que `maior_que` ou entre `minimo` e `maximo`."""
+    values = pd.to_numeric(as_text(df[coluna]), errors="coerce")
+    mask = pd.Series(True, index=df.index)
+    if maior_que is not None:
+        mask &= values > float(maior_que)
+    if minimo is not None:
+        mask &= values >= float(minimo)
+    if maximo is not None:
+        mask &= values <= float(maximo)
+    return df[mask]
+
+
+def step_filtrar_condicao(df, condicao):
+    """Mantém as linhas que atendem à condição composta, ex.: "UF em (SP, RJ) e IDADE entre 18 e 60"."""
+    return df[compile_predicate(condicao).mask(df)]
+
+
+def step_manter_colunas(df, colunas):
+    """Mantém apenas as colunas informadas."""
+    return df[list(colunas)]
+
+
+def step_remover_colunas(df, colunas):
+    """Remove as colunas informadas."""
+    return df.drop(columns=list(colunas))
+
+
+def step_normalizar_cpf(df, coluna):
+    """Ajusta CPFs para 11 dígitos (somente dígitos, zeros à esquerda)."""
+    values = as_text(df[coluna])
+    digits = values.fillna("").astype(str).str.replace(r"\D", "", regex=True)
+    mask = digits.str.len().between(1, 11)
+    df = df.copy()
+    df[coluna] = values.astype(object).where(~mask, digits.str.zfill(11))
+    return df
+
+
+def step_deduplicar_cpf(df, coluna):
+    """Normaliza os CPFs e mantém apenas a primeira ocorrência de cada um."""
+    df = df.copy()
+    df[coluna] = normalize_cpf_series(df[coluna])
+    return df.drop_duplicates(subset=[coluna], keep="first")
+
+
+def step_deduplicar(df, colunas):
+    """Remove linhas duplicadas considerando as colunas informadas (mantém a primeira)."""
+    return df.drop_duplicates(subset=list(colunas), keep="first")
+
+
+def step_remover_cpfs(df, coluna, arquivo, coluna_arquivo=None):
+    """Remove as linhas cujo CPF (normalizado) aparece no arquivo de blacklist."""
+    coluna_arquivo = coluna_arquivo or coluna
+    blacklist = read_table(arquivo, usecols=[coluna_arquivo])
+    black_set = set(normalize_cpf_series(blacklist[coluna_arquivo]))
+    keep = ~normalize_cpf_series(df[coluna]).isin(black_set)
+    return df[keep], {"removidos_blacklist": int((~keep).sum())}
+
+
+def step_remover_valores(df, coluna, arquivo, coluna_arquivo=None, maiusculas=False):
+    """Remove as linhas cujo valor da coluna aparece no arquivo de blacklist (nomes, UPAGs...)."""
+    coluna_arquivo = coluna_arquivo or coluna
+
+    def clean(series):
+        series = as_text(series).fillna("").astype(str).str.strip()
+        return series.str.upper() if maiusculas else series
+
+    blacklist = read_table(arquivo, usecols=[coluna_arquivo])
+    keep = ~clean(df[coluna]).isin(set(clean(blacklist[coluna_arquivo])))
+    return df[keep], {"removidos_blacklist": int((~keep).sum())}
+
+
+def step_remover_vazias(df, colunas):
+    """Remove as linhas com células vazias em qualquer uma das colunas informadas."""
+    mask = pd.Series(True, index=df.index)
+    for coluna in colunas:
+        mask &= as_text(df[coluna]).fillna("").astype(str).str.strip() != ""
+    return df[mask]
+
+
+def step_telefones(df, colunas, modo):
+    """
+    Formata colunas de telefone:
+    - "remover-55": números com 13 dígitos iniciados por '55' perdem o prefixo.
+    - "adicionar-55": números com 11 dígitos recebem o prefixo '55'.
+    - "11-digitos": números com 12 dígitos perdem o último dígito.
+    """
+    df = df.copy()
+    changed = 0
+    for coluna in colunas:
+        values = as_text(df[coluna]).astype("string").str.strip()
+        is_digit = values.str.isdigit().fillna(False)
+        length = values.str.len()
+        if modo == "remover-55":
+            mask = (length == 13) & values.str.startswith("55").fillna(False)
+            new_values = values.str[2:]
+        elif modo == "adicionar-55":
+            mask = (length == 11) & is_digit
+            new_values = "55" + values
+        elif modo == "11-digitos":
+            mask = (length == 12) & is_digit
+            new_values = values.str[:-1]
+        else:
+            raise ValueError(f"Modo de formatação de telefone desconhecido: '{modo}'")
+        mask = mask.fillna(False).astype(bool)
+        df[coluna] = as_text(df[coluna]).astype(object).where(~mask, new_values.astype(object))
+        changed += int(mask.sum())
+    return df, {"telefones_alterados": changed}
+
+
+def step_formatar_data(df, coluna, formato="%d/%m/%Y", formato_entrada=None, saida_invalidos=None):
+    """
+    Converte a coluna de data para o `formato` informado pelo motor de datas (DateColumn).
+    O formato de entrada é inferido de uma amostra quando não informado. Datas inválidas
+    ficam vazias; com `saida_invalidos`, as linhas com data inválida são gravadas nesse arquivo.
+    """
+    dates = DateColumn(df[coluna], formato_entrada)
+    if saida_invalidos:
+        write_table(df[dates.invalid_rows()], saida_invalidos)
+    df = df.copy()
+    df[coluna] = dates.format(formato)
+    info = dates.report()
+    if saida_invalidos:
+        info["saida_invalidos"] = saida_invalidos
+    return df, info
+
+
+def step_idade(df, coluna, faixas=None, formato_entrada=None):
+    """
+    Adiciona a coluna "idade" (e "faixa_etaria", com `faixas` como "18-25,26-59,60+") e
+    remove as linhas com data de nascimento inválida. O formato de entrada das datas é
+    inferido de uma amostra quando não informado.
+    """
+    ranges = parse_age_ranges(faixas) if faixas else None
+    df = df.copy()
+    ages = ages_in_years(df[coluna], formato=formato_entrada)
+    df["idade"] = _int_labels(ages)
+    if ranges:
+        df["faixa_etaria"] = age_range_labels(ages, ranges)
+    return df.dropna(subset=["idade"])
+
+
+def step_cep(df, coluna, logradouro, bairro, cidade, uf, provedores=None, cache=True,
+             saida_invalidos=None, show_progress=False):
+    """Valida e completa endereços pelo CEP; mantém apenas as linhas com CEP existente."""
+    providers = build_cep_providers(provedores)
+    cep_cache = CepCache() if cache and any(p.remote for p in providers) else None
+    address_columns = {"logradouro": logradouro, "bairro": bairro, "localidade": cidade, "uf": uf}
+    try:
+        df_valid, df_invalid, resolver = resolve_cep_frame(
+            df, coluna, address_columns, providers, cache=cep_cache, show_progress=show_progress
+        )
+    finally:
+        if cep_cache:
+            cep_cache.close()
+
+    if saida_invalidos:
+        write_table(df_invalid, saida_invalidos)
+
+    info = {
+        "ceps_unicos": resolver.total_ceps,
+        "linhas_invalidas": len(df_invalid),
+        "motivos_invalidos": {str(k): int(v) for k, v in df_invalid["MOTIVO_CEP"].value_counts().items()},
+        "resolvidos_por": {name: total for name, total in resolver.resolved_by.items() if total},
+        "requisicoes": {p.name: p.stats for p in providers if p.remote},
+    }
+    if saida_invalidos:
+        info["saida_invalidos"] = saida_invalidos
+    if cep_cache:
+        info["cache"] = cep_cache.stats
+    return df_valid.drop(columns=["EXISTE"]), info
+
+
+# --------------------- Receitas (pipelines declarativos) --------------------- #
+# Uma receita lista operações que são aplicadas em sequência sobre o mesmo DataFrame:
+# a entrada é lida uma única vez e apenas o resultado final é gravado.
+#
+#   nome: higienizacao
+#   passos:
+#     - acao: ajustar-cpf
+#       coluna: CPF
+#     - acao: remover-cpfs
+#       coluna: CPF
+#       arquivo: blacklist.xlsx
+#     - acao: deduplicar-cpf
+#       coluna: CPF
+#     - acao: manter-colunas
+#       colunas: [CPF, NOME, TELEFONE]
+
+RECIPE_STEPS = {
+    "filtrar": step_filtrar,
+    "filtrar-numerico": step_filtrar_numerico,
+    "filtrar-condicao": step_filtrar_condicao,
+    "manter-colunas": step_manter_colunas,
+    "remover-colunas": step_remover_colunas,
+    "ajustar-cpf": step_normalizar_cpf,
+    "deduplicar-cpf": step_deduplicar_cpf,
+    "deduplicar": step_deduplicar,
+    "remover-cpfs": step_remover_cpfs,
+    "remover-valores": step_remover_valores,
+    "remover-vazias": step_remover_vazias,
+    "telefones": step_telefones,
+    "formatar-data": step_formatar_data,
+    "idade": step_idade,
+    "cep": step_cep,
+}
+
+# Parâmetros que são caminhos de arquivo: relativos à pasta da receita
+RECIPE_PATH_KEYS = ("arquivo", "saida_invalidos")
+
+
+def load_recipe(path):
+    """
+    Lê e valida uma receita (.json, .yaml ou .yml).
+    Retorna {"nome": str, "passos": [(acao, funcao, parametros), ...]}.
+    Erros de estrutura, ações desconhecidas ou parâmetros inválidos geram ValueError
+    antes de qualquer leitura do arquivo de entrada.
+    """
+    import inspect
+
+    ext = os.path.splitext(path)[1].lower()
+    with open(path, "r", encoding="utf-8") as f:
+        if ext in (".yaml", ".yml"):
+            try:
+                import yaml
+            except ImportError:
+                raise ValueError("Receitas YAML exigem o pacote PyYAML (pip install pyyaml); use uma receita .json.")
+            data = yaml.safe_load(f)
+        elif ext == ".json":
+            data = json.load(f)
+        else:
+            raise ValueError(f"Formato de receita não suportado: '{ext}' (use .json, .yaml ou .yml)")
+
+    if isinstance(data, list):
+        data = {"passos": data}
+    if not isinstance(data, dict) or not isinstance(data.get("passos"), list) or not data["passos"]:
+        raise ValueError("A receita deve conter uma lista 'passos' com pelo menos uma ação.")
+
+    base_dir = os.path.dirname(os.path.abspath(path))
+    steps = []
+    for position, raw in enumerate(data["passos"], start=1):
+        if not isinstance(raw, dict) or "acao" not in raw:
+            raise ValueError(f"Passo {position}: cada passo precisa da chave 'acao'.")
+        action = raw["acao"]
+        func = RECIPE_STEPS.get(action)
+        if func is None:
+            raise ValueError(f"Passo {position}: ação desconhecida '{action}'. Disponíveis: {', '.join(RECIPE_STEPS)}")
+
+        params = {str(key).replace("-", "_"): value for key, value in raw.items() if key != "acao"}
+        for key in ("colunas",):
+            if isinstance(params.get(key), str):
+                params[key] = [params[key]]
+        for key in RECIPE_PATH_KEYS:
+            if isinstance(params.get(key), str) and not os.path.isabs(params[key]):
+                params[key] = os.path.join(base_dir, params[key])
+        try:
+            inspect.signature(func).bind(None, **params)
+        except TypeError as e:
+            raise ValueError(f"Passo {position} ({action}): parâmetros inválidos - {e}")
+        if "condicao" in params:
+            try:
+                compile_predicate(params["condicao"])
+            except ValueError as e:
+                raise ValueError(f"Passo {position} ({action}): {e}")
+        steps.append((action, func, params))
+
+    return {"nome": data.get("nome") or os.path.splitext(os.path.basename(path))[0], "passos": steps}
+
+
+def apply_recipe(df, recipe, on_step=None):
+    """
+    Aplica os passos da receita em memória, sem arquivos intermediários.
+    Retorna (DataFrame final, relatório por passo). `on_step(relatorio_do_passo)` é chamado após cada passo.
+    """
+    report = []
+    for position, (action, func, params) in enumerate(recipe["passos"], start=1):
+        started = time.perf_counter()
+        rows_before = len(df)
+        with metrics_stage(action, linhas_entrada=rows_before) as stage:
+            result = func(df, **params)
+            df, info = result if isinstance(result, tuple) else (result, {})
+            stage["linhas_saida"] = len(df)
+        entry = {
+            "passo": position,
+            "acao": action,
+            "linhas_antes": rows_before,
+            "linhas_depois": len(df),
+            "duracao_s": round(time.perf_counter() - started, 3),
+            **info,
+        }
+        report.append(entry)
+        logging.info(f"Receita '{recipe['nome']}' - passo {entry}")
+        if on_step:
+            on_step(entry)
+    return df, report
+
+
+def step_receita(df, receita):
+    """Executa uma receita completa como uma única operação (usado pela CLI)."""
+    recipe = load_recipe(receita)
+    df, report = apply_recipe(df, recipe)
+    return df, {"receita": recipe["nome"], "passos": report}
+
+
+def executar_receita():
+    """Executa uma receita (JSON/YAML) lendo a entrada uma vez e gravando apenas o resultado final."""
+    print("\n[bold yellow]╔══ Executar Receita (Pipeline) ══╗[/bold yellow]\n")
+
+    recipe_path = inquirer.text(
+        message="Digite o caminho da receita (.json, .yaml ou .yml):",
+        validate=lambda x: os.path.isfile(x) and x.lower().endswith((".json", ".yaml", ".yml")),
+        invalid_message="Arquivo inválido. Informe uma receita .json, .yaml ou .yml."
+    ).execute()
+
+    try:
+        recipe = load_recipe(recipe_path)
+    except (ValueError, OSError) as e:
+        print(f"[bold red]✗ Receita inválida: {e}[/bold red]\n")
+        return
+
+    print(f"[cyan]Receita '{recipe['nome']}' com {len(recipe['passos'])} passo(s):[/cyan]")
+    for position, (action, _, params) in enumerate(recipe["passos"], start=1):
+        print(f"  {position}. {action} {params}")
+
+    input_file = inquirer.text(
+        message="Digite o caminho do arquivo de entrada:",
+        validate=lambda x: os.path.isfile(x) and x.lower().endswith(TABLE_EXTENSIONS),
+        invalid_message="Arquivo inválido. Informe um arquivo Excel, CSV, Parquet ou Feather."
+    ).execute()
+
+    output_dir = inquirer.text(
+        message="Digite o diretório para salvar o arquivo final:",
+        validate=lambda x: os.path.isdir(x),
+        invalid_message="Diretório inválido."
+    ).execute()
+    output_format = ask_output_format()
+
+    # CSVs grandes podem ser processados em blocos paralelos
+    workers = 1
+    if input_file.lower().endswith(CSV_EXTENSIONS) and os.path.getsize(input_file) >= CHUNKED_MIN_BYTES:
+        workers = int(inquirer.text(
+            message="Arquivo grande: quantidade de processos em paralelo (1 = sem blocos):",
+            default=str(default_workers()),
+            validate=lambda x: x.isdigit() and int(x) > 0,
+            invalid_message="Informe um número inteiro positivo."
+        ).execute())
+
+    def show_step(entry):
+        print(f"[green]✓ {entry['passo']}. {entry['acao']}:[/green] "
+              f"{entry['linhas_antes']:,} → {entry['linhas_depois']:,} linhas ({entry['duracao_s']:.2f}s)")
+
+    start_time = time.time()
+    output_file = output_path_for(input_file, output_dir, "receita_", output_format)
+    passes = "1 leitura, 1 gravação"
+    try:
+        if workers > 1:
+            print(f"\n[cyan]Processando em blocos com {workers} processos...[/cyan]")
+            info = run_chunked(input_file, recipe["passos"], output_file, workers=workers)
+            report, rows_in, rows_out = info["passos"], info["linhas_entrada"], info["linhas_saida"]
+            if "aviso" in info:
+                print(f"[yellow]⚠ {info['aviso']}.[/yellow]")
+            for entry in report:
+                show_step(entry)
+        elif projection_columns(recipe["passos"]) is not None and supports_streaming(input_file):
+            columns = projection_columns(recipe["passos"])
+            if all(action in STREAMING_FILTER_STEPS for action, _, _ in recipe["passos"]):
+                print("\n[cyan]Receita só com filtros por linha: filtrando os blocos durante a leitura...[/cyan]")
+            else:
+                print(f"\n[cyan]Receita só com filtros/remoções: lendo apenas as colunas {', '.join(map(str, columns))}...[/cyan]")
+            info = run_projected(input_file, recipe["passos"], output_file, on_step=show_step)
+            report, rows_in, rows_out = info["passos"], info["linhas_entrada"], info["linhas_saida"]
+            if "projecao" in info:
+                print(f"[dim]Colunas lidas na filtragem: {len(columns)} de {info['projecao']['colunas_total']}[/dim]")
+                passes = "2 leituras (colunas-chave + blocos), 1 gravação"
+            else:
+                passes = "1 leitura em blocos (filtro na leitura), 1 gravação"
+        else:
+            print("\n[cyan]Lendo o arquivo de entrada...[/cyan]")
+            df = read_table(input_file)
+            rows_in = len(df)
+            memory = memory_summary(df)
+            if memory:
+                print(f"[dim]Memória: {memory['depois_mb']:,} MB "
+                      f"(sem compactação: ~{memory['antes_mb']:,} MB, {memory['reducao']}); "
+                      f"categorias: {', '.join(map(str, memory['categoricas'])) or 'nenhuma'}[/dim]")
+            df, report = apply_recipe(df, recipe, on_step=show_step)
+            write_table(df, output_file)
+            rows_out = len(df)
+    except KeyError as e:
+        print(f"[bold red]✗ Coluna não encontrada: {e}[/bold red]\n")
+        return
+    except Exception as e:
+        print(f"[bold red]✗ Erro ao executar a receita: {e}[/bold red]\n")
+        logging.error(f"Erro ao executar a receita '{recipe_path}': {e}")
+        return
+
+    elapsed = time.time() - start_time
+    print("\n[bold yellow]╔══ Resumo da Operação ══╗[/bold yellow]")
+    print(f"[cyan]• Receita:[/cyan] {recipe['nome']} ({len(report)} passos)")
+    print(f"[cyan]• Linhas de entrada:[/cyan] {rows_in:,}")
+    print(f"[cyan]• Linhas de saída:[/cyan] {rows_out:,}")
+    print(f"[cyan]• Leituras/gravações:[/cyan] {passes}")
+    print(f"[cyan]• Tempo total:[/cyan] {elapsed:.2f} segundos")
+    print(f"[cyan]• Arquivo salvo em:[/cyan] {output_file}")
+    print("[bold yellow]╚════════════════════════╝[/bold yellow]\n")
+
+
+# --------------------- Processamento em lote (paralelo) --------------------- #
+def _run_batch_task(task):
+    """Executa a receita sobre um arquivo em um processo do pool; falhas ficam isoladas no resultado."""
+    input_file, recipe_path, output_file = task
+    started = time.perf_counter()
+    result = {"arquivo": input_file, "saida": output_file, "pid": os.getpid()}
+    metrics = ActionMetrics("lote", origin="lote", entrada=input_file, saida=output_file, receita=recipe_path)
+    try:
+        with metrics:
+            recipe = load_recipe(recipe_path)
+            if projection_columns(recipe["passos"]) is not None and supports_streaming(input_file):
+                info = run_projected(input_file, recipe["passos"], output_file)
+                result.update(status="ok", **info)
+            else:
+                df = read_table(input_file, cache=False)
+                result["linhas_entrada"] = len(df)
+                df, report = apply_recipe(df, recipe)
+                write_table(df, output_file)
+                result.update(status="ok", linhas_saida=len(df), passos=report)
+    except Exception as e:
+        result.update(status="erro", erro=f"{type(e).__name__}: {e}")
+        logging.error(f"Lote: falha ao processar '{input_file}': {e}")
+    result["duracao_s"] = round(time.perf_counter() - started, 3)
+    result["etapas"] = metrics.stages
+    return result
+
+
+def run_batch(files, recipe_path, output_dir, workers=None, on_result=None, formato=None):
+    """
+    Aplica a receita a cada arquivo em um pool de processos (um arquivo por worker).
+    A receita é validada antes de iniciar o pool. `on_result(resultado)` é chamado conforme
+    cada arquivo termina. `formato` (chave de OUTPUT_FORMATS) define o formato de saída;
+    por padrão cada arquivo mantém o formato de entrada. Retorna os resultados na ordem de `files`.
+    """
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    load_recipe(recipe_path)
+    os.makedirs(output_dir, exist_ok=True)
+    tasks = [(f, recipe_path, output_path_for(f, output_dir, "receita_", formato)) for f in files]
+    workers = max(1, min(workers or default_workers(), len(tasks)))
+
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=disable_frame_cache) as pool:
+        futures = {pool.submit(_run_batch_task, task): task[0] for task in tasks}
+        for future in as_completed(futures):
+            input_file = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:  # ex.: worker encerrado pelo sistema (falta de memória)
+                result = {"arquivo": input_file, "status": "erro", "erro": f"{type(e).__name__}: {e}"}
+            results[input_file] = result
+            if on_result:
+                on_result(result)
+    return [results[f] for f in files]
+
+
+def summarize_batch(results):
+    """Agrega os resultados do lote: totais de arquivos, falhas e linhas."""
+    ok = [r for r in results if r["status"] == "ok"]
+    return {
+        "arquivos": len(results),
+        "sucesso": len(ok),
+        "falhas": len(results) - len(ok),
+        "linhas_entrada": sum(r.get("linhas_entrada", 0) for r in ok),
+        "linhas_saida": sum(r.get("linhas_saida", 0) for r in ok),
+    }
+
+
+def processar_pasta_em_lote():
+    """Aplica uma receita a todos os arquivos de uma pasta (ou padrão glob) em paralelo."""
+    print("\n[bold yellow]╔══ Processamento em Lote (Paralelo) ══╗[/bold yellow]\n")
+
+    source = inquirer.text(
+        message="Digite a pasta ou o padrão dos arquivos (ex.: C:/dados/*.xlsx):"
+    ).execute()
+    files = list_input_files(source)
+    if not files:
+        print(f"[bold red]✗ Nenhum arquivo Excel/CSV encontrado em: {source}[/bold red]\n")
+        return
+    print(f"[cyan]Encontrados {len(files)} arquivos.[/cyan]\n")
+
+    recipe_path = inquirer.text(
+        message="Digite o caminho da receita (.json, .yaml ou .yml):",
+        validate=lambda x: os.path.isfile(x) and x.lower().endswith((".json", ".yaml", ".yml")),
+        invalid_message="Arquivo inválido. Informe uma receita .json, .yaml ou .yml."
+    ).execute()
+
+    output_dir = inquirer.text(
+        message="Digite o diretório para salvar os arquivos processados:"
+    ).execute()
+    output_format = ask_output_format()
+
+    workers = inquirer.text(
+        message="Quantidade de processos em paralelo:",
+        default=str(min(default_workers(), len(files))),
+        validate=lambda x: x.isdigit() and int(x) > 0,
+        invalid_message="Informe um número inteiro positivo."
+    ).execute()
+
+    start_time = time.time()
+    progress = {"done": 0}
+
+    def show_result(result):
+        progress["done"] += 1
+        name = os.path.basename(result["arquivo"])
+        if result["status"] == "ok":
+            print(f"[green]✓ ({progress['done']}/{len(files)}) {name}:[/green] "
+                  f"{result['linhas_entrada']:,} → {result['linhas_saida']:,} linhas ({result['duracao_s']:.1f}s)")
+        else:
+            print(f"[bold red]✗ ({progress['done']}/{len(files)}) {name}: {result['erro']}[/bold red]")
+
+    try:
+        results = run_batch(files, recipe_path, output_dir, workers=int(workers), on_result=show_result,
+                            formato=output_format)
+    except (ValueError, OSError) as e:
+        print(f"[bold red]✗ Não foi possível iniciar o lote: {e}[/bold red]\n")
+        return
+
+    summary = summarize_batch(results)
+    elapsed = time.time() - start_time
+    print("\n[bold yellow]╔══ Resumo da Operação ══╗[/bold yellow]")
+    print(f"[cyan]• Arquivos processados:[/cyan] {summary['sucesso']:,} de {summary['arquivos']:,}")
+    print(f"[cyan]• Falhas:[/cyan] {summary['falhas']:,}")
+    print(f"[cyan]• Linhas de entrada:[/cyan] {summary['linhas_entrada']:,}")
+    print(f"[cyan]• Linhas de saída:[/cyan] {summary['linhas_saida']:,}")
+    print(f"[cyan]• Processos:[/cyan] {workers}")
+    print(f"[cyan]• Tempo total:[/cyan] {elapsed:.2f} segundos")
+    print(f"[cyan]• Arquivos salvos em:[/cyan] {output_dir}")
+    print("[bold yellow]╚════════════════════════╝[/bold yellow]\n")
+    for result in results:
+        if result["status"] != "ok":
+            print(f"[red]  - {os.path.basename(result['arquivo'])}: {result['erro']}[/red]")
+
+
+def run_batch_command(args):
+    """Subcomando 'lote' da CLI: processa vários arquivos e escreve o resumo agregado em JSON."""
+    started = time.perf_counter()
+    output_dir = args.saida or os.path.join(args.origem if os.path.isdir(args.origem) else ".", "lote")
+    summary = {"acao": "lote", "origem": args.origem, "receita": args.receita, "saida": output_dir}
+
+    files = list_input_files(args.origem)
+    if not files:
+        summary.update(status="erro", codigo_saida=EXIT_ENTRADA, erro=f"Nenhum arquivo encontrado em: {args.origem}")
+    else:
+        try:
+            results = run_batch(files, args.receita, output_dir, workers=args.processos, formato=args.formato_saida)
+        except (ValueError, OSError) as e:
+            summary.update(status="erro", codigo_saida=EXIT_ENTRADA, erro=str(e))
+        else:
+            totals = summarize_batch(results)
+            exit_code = EXIT_OK if totals["falhas"] == 0 else EXIT_ERRO
+            summary.update(status="ok" if exit_code == EXIT_OK else "parcial", codigo_saida=exit_code,
+                           **totals, resultados=results)
+
+    summary["duracao_s"] = round(time.perf_counter() - started, 3)
+    sys.stdout.write(json.dumps(summary, ensure_ascii=False, default=str) + "\n")
+    logging.info(f"CLI lote: {summary['status']} ({summary.get('sucesso', 0)}/{summary.get('arquivos', 0)} arquivos)")
+    return summary["codigo_saida"]
+
+
+# --------------------- Execução paralela por blocos de um CSV --------------------- #
+# Passos que tratam cada linha de forma independente: podem rodar em blocos separados.
+# Deduplicações precisam enxergar o arquivo inteiro e o CEP usa rede/cache compartilhados,
+# então rodam depois, sobre o resultado combinado.
+CHUNKED_MIN_BYTES = 100 * 1024 * 1024  # abaixo disso o custo dos processos não compensa
+
+CHUNK_SAFE_STEPS = {
+    "filtrar", "filtrar-numerico", "filtrar-condicao", "manter-colunas", "remover-colunas", "ajustar-cpf",
+    "remover-cpfs", "remover-valores", "remover-vazias", "telefones", "formatar-data", "idade",
+}
+
+
+def split_csv_byte_ranges(file_path, parts):
+    """
+    Divide o CSV em até `parts` intervalos de bytes [inicio, fim) alinhados ao fim de linha,
+    sem contar o cabeçalho. Campos entre aspas com quebra de linha podem cair no meio de um
+    limite: confira com ranges_split_quoted_field antes de usar os intervalos.
+    """
+    size = os.path.getsize(file_path)
+    with open(file_path, "rb") as f:
+        f.readline()
+        data_start = f.tell()
+        bounds = [data_start]
+        for i in range(1, parts):
+            target = data_start + (size - data_start) * i // parts
+            if target <= bounds[-1]:
+                continue
+            f.seek(target)
+            f.readline()
+            position = f.tell()
+            if bounds[-1] < position < size:
+                bounds.append(position)
+    bounds.append(size)
+    return [(start, end) for start, end in zip(bounds, bounds[1:]) if end > start]
+
+
+# Passos de data: sem formato_entrada, cada bloco inferiria o seu e poderia ler as datas de outro jeito
+DATE_STEPS = {"formatar-data", "idade"}
+DATE_SAMPLE_BYTES = 256 * 1024  # amostra lida do início de cada bloco para inferir o formato
+
+
+def _sample_csv_column(file_path, sep, ranges, column):
+    """Valores de `column` lidos do início de cada intervalo de bytes (amostra espalhada pelo arquivo)."""
+    import io
+
+    with open(file_path, "rb") as f:
+        data = [f.readline()]
+        for start, end in ranges:
+            f.seek(start)
+            piece = f.read(min(end - start, DATE_SAMPLE_BYTES))
+            if start + len(piece) < end:
+                piece = piece[:piece.rfind(b"\n") + 1]
+            data.append(piece if piece.endswith(b"\n") else piece + b"\n")
+    data = b"".join(data)
+    try:
+        sample = pd.read_csv(io.BytesIO(data), sep=sep, encoding="utf-8", dtype=str, usecols=[column])
+    except UnicodeDecodeError:
+        sample = pd.read_csv(io.BytesIO(data), sep=sep, encoding="latin-1", dtype=str, usecols=[column])
+    return sample[column]
+
+
+def fix_date_formats(file_path, sep, ranges, steps):
+    """
+    Define o formato_entrada dos passos de data (DATE_STEPS) que não o informam, inferido uma
+    vez de uma amostra de todos os blocos, para que todos os blocos leiam as datas igual.
+    Uma coluna já reformatada por um formatar-data anterior usa o formato gravado por ele.
+    """
+    try:
+        header = pd.read_csv(file_path, sep=sep, nrows=0, encoding="utf-8").columns
+    except UnicodeDecodeError:
+        header = pd.read_csv(file_path, sep=sep, nrows=0, encoding="latin-1").columns
+    fixed, written = [], {}
+    for action, func, params in steps:
+        if action in DATE_STEPS:
+            column = params["coluna"]
+            if not params.get("formato_entrada") and (column in written or column in header):
+                formato = written.get(column)
+                if formato is None:
+                    formato = infer_date_format(_date_text(_sample_csv_column(file_path, sep, ranges, column)))
+                params = {**params, "formato_entrada": formato}
+            if action == "formatar-data":
+                written[column] = params.get("formato", "%d/%m/%Y")
+        fixed.append((action, func, params))
+    return fixed
+
+
+def _merge_invalid_examples(lists, examples=10):
+    """Junta os exemplos_invalidos ([valor, quantidade]) de vários blocos, somando as quantidades."""
+    from collections import Counter
+
+    counts = Counter()
+    for pairs in lists:
+        for value, count in pairs:
+            counts[value] += count
+    return [[value, count] for value, count in counts.most_common(examples)]
+
+
+def ranges_split_quoted_field(file_path, ranges, block_bytes=16 * 1024 * 1024):
+    """
+    True se algum limite entre os intervalos cai dentro de um campo entre aspas (quebra de
+    linha dentro do campo). Com aspas escapadas como "", o limite está dentro de um campo
+    quando a quantidade de aspas antes dele é ímpar.
+    """
+    quotes = position = 0
+    with open(file_path, "rb") as f:
+        for start, _ in ranges[1:]:
+            while position < start:
+                data = f.read(min(block_bytes, start - position))
+                if not data:
+                    break
+                quotes += data.count(b'"')
+                position += len(data)
+            if quotes % 2:
+                return True
+    return False
+
+
+def _run_chunk_task(task):
+    """Lê um intervalo de bytes do CSV, aplica os passos e grava o bloco (sem cabeçalho) em um arquivo parcial."""
+    import io
+
+    file_path, sep, start, end, steps, part_path = task
+    with open(file_path, "rb") as f:
+        header = f.readline()
+        f.seek(start)
+        data = header + f.read(end - start)
+    try:
+        df = pd.read_csv(io.BytesIO(data), sep=sep, encoding="utf-8", dtype=str, low_memory=False)
+    except UnicodeDecodeError:
+        df = pd.read_csv(io.BytesIO(data), sep=sep, encoding="latin-1", dtype=str, low_memory=False)
+    del data
+
+    rows_in = len(df)
+    df, report = apply_recipe(df, {"nome": "bloco", "passos": steps})
+    df.to_csv(part_path, index=False, header=False, sep=';', encoding='utf-8')
+    return {"linhas_entrada": rows_in, "linhas_saida": len(df), "colunas": list(df.columns), "passos": report}
+
+
+def run_chunked(input_file, steps, output_file, workers=None, chunks=None):
+    """
+    Processa um CSV grande em paralelo: divide em blocos de bytes alinhados a linhas, aplica
+    os passos linha a linha (CHUNK_SAFE_STEPS) em um pool de processos e concatena os blocos
+    na ordem original. Os passos restantes (a partir do primeiro que não é seguro por bloco)
+    rodam em memória sobre o resultado combinado.
+    Retorna um resumo com linhas de entrada/saída, blocos e o relatório agregado por passo.
+    """
+    import shutil
+    import tempfile
+    from concurrent.futures import ProcessPoolExecutor
+
+    if not input_file.lower().endswith(CSV_EXTENSIONS):
+        raise ValueError("A execução por blocos aceita apenas arquivos CSV/TXT.")
+
+    split_at = len(steps)
+    for position, (action, _, params) in enumerate(steps):
+        # Um arquivo de inválidos por passo: os blocos não podem gravá-lo separadamente
+        if action not in CHUNK_SAFE_STEPS or params.get("saida_invalidos"):
+            split_at = position
+            break
+    chunk_steps, tail_steps = steps[:split_at], steps[split_at:]
+
+    workers = workers or default_workers()
+    ranges = split_csv_byte_ranges(input_file, chunks or workers * 2)
+
+    def run_in_memory(reason):
+        # Sem blocos: uma leitura completa, que entende campos entre aspas com quebra de linha
+        logging.warning(f"Execução em blocos de '{input_file}' cancelada: {reason}")
+        df = read_table(input_file, cache=False)
+        rows = len(df)
+        df, steps_report = apply_recipe(df, {"nome": "sem blocos", "passos": steps})
+        write_table(df, output_file)
+        return {"linhas_entrada": rows, "linhas_saida": len(df), "blocos": 1, "processos": 1,
+                "passos_por_bloco": 0, "passos": steps_report,
+                "aviso": f"{reason}; o arquivo foi processado sem blocos, em um único processo"}
+
+    if ranges_split_quoted_field(input_file, ranges):
+        return run_in_memory("há campos entre aspas com quebra de linha nos limites dos blocos")
+    sep = detect_csv_separator(input_file)
+    chunk_steps = fix_date_formats(input_file, sep, ranges, chunk_steps)
+    temp_dir = tempfile.mkdtemp(prefix="datamagi_blocos_", dir=os.path.dirname(os.path.abspath(output_file)))
+    try:
+        tasks = [(input_file, sep, start, end, chunk_steps, os.path.join(temp_dir, f"bloco_{i:05d}.csv"))
+                 for i, (start, end) in enumerate(ranges)]
+        with metrics_stage("blocos em paralelo", arquivo=input_file, bytes_lidos=os.path.getsize(input_file)) as stage:
+            try:
+                with ProcessPoolExecutor(max_workers=max(1, min(workers, len(tasks))),
+                                         initializer=disable_frame_cache) as pool:
+                    results = list(pool.map(_run_chunk_task, tasks))
+            except pd.errors.ParserError as e:
+                return run_in_memory(f"um bloco não pôde ser lido isoladamente ({e})")
+            stage["linhas_entrada"] = sum(r["linhas_entrada"] for r in results)
+            stage["linhas_saida"] = sum(r["linhas_saida"] for r in results)
+
+        # Relatório por passo somando todos os blocos
+        report = []
+        for position, (action, _, _) in enumerate(chunk_steps if results else []):
+            entries = [r["passos"][position] for r in results]
+            entry = {"passo": position + 1, "acao": action}
+            for key in entries[0]:
+                values = [e.get(key) for e in entries]
+                if key in entry:
+                    continue
+                if all(isinstance(value, (int, float)) for value in values):
+                    entry[key] = round(sum(values), 3)
+                elif key == "exemplos_invalidos":
+                    entry[key] = _merge_invalid_examples(values)
+                elif all(value == values[0] for value in values):
+                    entry[key] = values[0]
+            report.append(entry)
+
+        rows_in = sum(r["linhas_entrada"] for r in results)
+        columns = results[0]["colunas"] if results else list(read_table(input_file, nrows=0, cache=False).columns)
+        part_paths = [task[-1] for task in tasks]
+
+        if not tail_steps and output_file.lower().endswith(CSV_EXTENSIONS):
+            # Concatena os blocos direto no arquivo final, sem recarregar em memória
+            rows_out = sum(r["linhas_saida"] for r in results)
+            with metrics_stage("gravacao", arquivo=output_file, linhas_entrada=rows_out) as stage:
+                with open(output_file, "wb") as out:
+                    # Cabeçalho com as mesmas regras de aspas dos blocos (nomes com ';' ou '"')
+                    header = pd.DataFrame(columns=columns).to_csv(index=False, sep=';')
+                    out.write(header.encode("utf-8"))
+                    for part_path in part_paths:
+                        with open(part_path, "rb") as part:
+                            shutil.copyfileobj(part, out, 1024 * 1024)
+                stage["bytes_gravados"] = os.path.getsize(output_file)
+        else:
+            frames = [pd.read_csv(p, sep=';', header=None, names=columns, dtype=str, encoding='utf-8')
+                      for p in part_paths if os.path.getsize(p) > 0]
+            df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+            df, tail_report = apply_recipe(df, {"nome": "final", "passos": tail_steps})
+            for entry in tail_report:
+                entry["passo"] += len(chunk_steps)
+            report.extend(tail_report)
+            write_table(df, output_file)
+            rows_out = len(df)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    return {
+        "linhas_entrada": rows_in,
+        "linhas_saida": rows_out,
+        "blocos": len(ranges),
+        "processos": workers,
+        "passos_por_bloco": len(chunk_steps),
+        "passos": report,
+    }
+
+
+# --------------------- Projeção de colunas (filtros e remoções) --------------------- #
+# Filtros e remoções só olham para uma ou duas colunas-chave. Em vez de carregar todas as
+# colunas, a execução projetada lê apenas as chaves, calcula quais linhas ficam e depois
+# percorre o arquivo completo em blocos, gravando só essas linhas.
+PROJECTION_CHUNK_CELLS = 2_000_000  # tamanho do bloco (linhas x colunas) na gravação das linhas mantidas
+
+# Passos que apenas descartam linhas (sem alterar valores) -> parâmetros com as colunas-chave
+PROJECTION_STEPS = {
+    "filtrar": ("coluna",),
+    "filtrar-numerico": ("coluna",),
+    "filtrar-condicao": ("condicao",),
+    "deduplicar": ("colunas",),
+    "remover-cpfs": ("coluna",),
+    "remover-valores": ("coluna",),
+    "remover-vazias": ("colunas",),
+}
+
+
+# Passos que decidem cada linha sozinha, sem arquivo auxiliar: viram o filtro da leitura em blocos
+STREAMING_FILTER_STEPS = {"filtrar", "filtrar-numerico", "filtrar-condicao", "remover-vazias"}
+
+
+def projection_columns(steps):
+    """Colunas-chave usadas pelos passos, ou None se algum passo não for apenas um filtro de linhas."""
+    columns = []
+    for action, _, params in steps:
+        if action not in PROJECTION_STEPS:
+            return None
+        for key in PROJECTION_STEPS[action]:
+            if key == "condicao":
+                values = compile_predicate(params[key]).columns
+            else:
+                values = params[key] if isinstance(params[key], (list, tuple)) else [params[key]]
+            columns.extend(c for c in values if c not in columns)
+    return columns
+
+
+def supports_streaming(file_path):
+    """True se o arquivo pode ser relido em blocos: CSV (também .gz/.zst), Parquet, Feather ou Excel com cache colunar."""
+    if file_path.lower().endswith(EXCEL_EXTENSIONS):
+        return columnar_cache_meta(file_path) is not None
+    return file_path.lower().endswith(TABLE_EXTENSIONS)
+
+
+def read_key_columns(file_path, columns):
+    """Primeira fase: lê apenas as colunas-chave. Excel sem cache colunar é lido inteiro (uma vez, via FRAME_CACHE)."""
+    if supports_streaming(file_path):
+        return read_table(file_path, usecols=list(columns), cache=False)
+    return read_table(file_path, cache=False)[list(columns)]
+
+
+def iter_table_chunks(file_path, chunk_rows, encoding="utf-8", where=None, where_columns=None):
+    """
+    Percorre o arquivo em blocos de linhas, tudo como string, na mesma ordem de read_table.
+    Usa o cache colunar atualizado quando houver; Feather e Excel vêm de uma leitura única.
+    `where(bloco)` devolve a máscara das linhas mantidas: as demais são descartadas assim que
+    cada bloco é lido, antes de chegar a quem consome os blocos. Informando `where_columns`
+    (as colunas que `where` usa), CSVs são lidos em lotes Arrow: `where` recebe só essas colunas
+    e apenas as linhas mantidas são convertidas para pandas.
+    """
+    if where is not None and where_columns is not None and pyarrow_available() \
+            and not columnar_cache_meta(file_path) \
+            and file_path.lower().endswith(CSV_EXTENSIONS + COMPRESSED_CSV_EXTENSIONS):
+        yield from _iter_csv_filtered(file_path, chunk_rows, encoding, where, list(where_columns))
+        return
+    for chunk in _iter_table_chunks(file_path, chunk_rows, encoding):
+        yield chunk if where is None else chunk[where(chunk)]
+
+
+# Células lidas como vazias (NA), como no pd.read_csv
+CSV_NA_VALUES = ["", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+                 "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null"]
+CSV_ARROW_BLOCK_BYTES = 16 * 1024 * 1024
+
+
+def _iter_csv_filtered(file_path, chunk_rows, encoding, where, where_columns):
+    """Lotes Arrow do CSV filtrados por `where` antes da conversão para pandas (ver iter_table_chunks)."""
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+
+    header = list(read_table(file_path, nrows=0, cache=False).columns)
+    missing = [column for column in where_columns if column not in header]
+    if missing:
+        raise KeyError(", ".join(map(str, missing)))
+    reader = None
+    while True:
+        try:
+            # A abertura já lê o primeiro bloco; erro de UTF-8 vira UnicodeDecodeError (nova tentativa em latin-1)
+            if reader is None:
+                reader = pacsv.open_csv(
+                    pa.input_stream(file_path, compression="detect"),
+                    read_options=pacsv.ReadOptions(encoding=encoding, block_size=CSV_ARROW_BLOCK_BYTES),
+                    parse_options=pacsv.ParseOptions(delimiter=detect_csv_separator(file_path)),
+                    convert_options=pacsv.ConvertOptions(column_types={c: pa.string() for c in header},
+                                                         null_values=CSV_NA_VALUES, strings_can_be_null=True),
+                )
+                if reader.schema.names != header:
+                    # Ex.: cabeçalhos repetidos, que o pandas renomeia (.1, .2...) e o Arrow não
+                    reader.close()
+                    for chunk in _iter_table_chunks(file_path, chunk_rows, encoding):
+                        yield chunk[where(chunk)]
+                    return
+            batch = reader.read_next_batch()
+        except StopIteration:
+            return
+        except pa.ArrowInvalid as e:
+            if "utf8" in str(e).lower():
+                raise UnicodeDecodeError(encoding, b"", 0, 1, str(e))
+            raise
+        keys = pd.DataFrame({column: batch.column(column).to_pandas() for column in where_columns})
+        keep = np.asarray(where(keys), dtype=bool)
+        yield batch.filter(pa.array(keep)).to_pandas()
+
+
+def _iter_table_chunks(file_path, chunk_rows, encoding):
+    meta = columnar_cache_meta(file_path)
+    lower = file_path.lower()
+    if meta is not None or lower.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        source = columnar_cache_paths(file_path)[0] if meta else file_path
+        original_names = {str(c): c for c in meta["colunas"]} if meta else {}
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunk_rows):
+            chunk = _as_text_frame(batch.to_pandas())
+            chunk.columns = [original_names.get(c, c) for c in chunk.columns]
+            yield chunk
+    elif lower.endswith(CSV_EXTENSIONS + COMPRESSED_CSV_EXTENSIONS):
+        sep = detect_csv_separator(file_path)
+        yield from pd.read_csv(file_path, sep=sep, encoding=encoding, dtype=str,
+                               chunksize=chunk_rows)
+    else:
+        df = read_table(file_path, cache=False)
+        for start in range(0, len(df), chunk_rows):
+            yield df.iloc[start:start + chunk_rows]
+
+
+def stream_masked_rows(file_path, outputs, chunk_rows=None):
+    """
+    Segunda fase: percorre o arquivo completo em blocos e grava em cada saída apenas as linhas
+    marcadas na sua máscara. `outputs` é uma lista [(caminho, máscara booleana por linha)].
+    Saídas CSV (também .gz/.zst) são gravadas bloco a bloco; os demais formatos acumulam só
+    as linhas selecionadas. Retorna a quantidade de linhas gravadas em cada saída.
+    """
+    with metrics_stage("gravacao em blocos", arquivo=file_path, bytes_lidos=os.path.getsize(file_path)) as stage:
+        written = _stream_masked_rows(file_path, outputs, chunk_rows)
+        stage["linhas_saida"] = sum(written)
+        stage["bytes_gravados"] = sum(os.path.getsize(path) for path, _ in outputs)
+    return written
+
+
+def _stream_masked_rows(file_path, outputs, chunk_rows=None):
+    csv_outputs = CSV_EXTENSIONS + COMPRESSED_CSV_EXTENSIONS
+    if chunk_rows is None:
+        chunk_rows = max(1_000, PROJECTION_CHUNK_CELLS // max(1, len(probe_table(file_path).columns)))
+    for encoding in ("utf-8", "latin-1"):
+        handles = {}
+        selected = [[] for _ in outputs]
+        written = [0] * len(outputs)
+        position = 0
+        columns = None
+        try:
+            for chunk in iter_table_chunks(file_path, chunk_rows, encoding):
+                columns = chunk.columns
+                end = position + len(chunk)
+                for i, (path, mask) in enumerate(outputs):
+                    rows = chunk[mask[position:end]]
+                    written[i] += len(rows)
+                    if path.lower().endswith(csv_outputs):
+                        header = i not in handles
+                        if header:
+                            handles[i] = open_text_output(path)
+                        rows.to_csv(handles[i], index=False, header=header, sep=';')
+                    else:
+                        selected[i].append(rows)
+                position = end
+            break
+        except UnicodeDecodeError:
+            continue
+        finally:
+            for handle in handles.values():
+                handle.close()
+
+    if any(len(mask) != position for _, mask in outputs):
+        raise ValueError("O arquivo de entrada mudou durante o processamento; execute novamente.")
+    if columns is None:
+        columns = read_table(file_path, nrows=0, cache=False).columns
+    for i, (path, _) in enumerate(outputs):
+        if i not in handles:
+            df = pd.concat(selected[i], ignore_index=True) if selected[i] else pd.DataFrame(columns=columns)
+            write_table(df, path)
+    return written
+
+
+def run_projected(input_file, steps, output_file, chunk_rows=None, on_step=None):
+    """
+    Execução em duas fases para receitas só de filtros/remoções (PROJECTION_STEPS): aplica os
+    passos sobre as colunas-chave para descobrir as linhas mantidas e depois grava essas linhas
+    completas, lendo o arquivo em blocos. Retorna um resumo no formato de run_chunked.
+    """
+    columns = projection_columns(steps)
+    if columns is None:
+        raise ValueError("A execução projetada aceita apenas passos de filtro/remoção de linhas.")
+    header = list(probe_table(input_file).columns)
+    missing = [c for c in columns if c not in header]
+    if missing:
+        raise KeyError(", ".join(map(str, missing)))
+
+    if all(action in STREAMING_FILTER_STEPS for action, _, _ in steps):
+        return run_filtered(input_file, steps, output_file, chunk_rows, on_step)
+
+    keys = read_key_columns(input_file, columns)
+    result, report = apply_recipe(keys, {"nome": "projecao", "passos": steps}, on_step=on_step)
+    keep = keys.index.isin(result.index)
+    del keys, result
+    if chunk_rows is None:
+        chunk_rows = max(1_000, PROJECTION_CHUNK_CELLS // max(1, len(header)))
+    rows_out = stream_masked_rows(input_file, [(output_file, keep)], chunk_rows)[0]
+    return {
+        "linhas_entrada": len(keep),
+        "linhas_saida": rows_out,
+        "passos": report,
+        "projecao": {"colunas_lidas": columns, "colunas_total": len(header)},
+    }
+
+
+def run_filtered(input_file, steps, output_file, chunk_rows=None, on_step=None):
+    """
+    Execução em uma única leitura para receitas só de filtros linha a linha
+    (STREAMING_FILTER_STEPS): os passos viram o filtro da leitura em blocos (iter_table_chunks)
+    e cada bloco filtrado é gravado em seguida. As linhas descartadas nunca são acumuladas.
+    Retorna um resumo no formato de run_chunked, com as linhas antes/depois de cada passo.
+    """
+    header = list(probe_table(input_file).columns)
+    if chunk_rows is None:
+        chunk_rows = max(1_000, PROJECTION_CHUNK_CELLS // max(1, len(header)))
+    csv_output = output_file.lower().endswith(CSV_EXTENSIONS + COMPRESSED_CSV_EXTENSIONS)
+
+    with metrics_stage("filtro em blocos", arquivo=input_file, bytes_lidos=os.path.getsize(input_file)) as stage:
+        for encoding in ("utf-8", "latin-1"):
+            keep_rows, counts = streaming_filter(steps)
+            handle = None
+            selected = []
+            rows_out = 0
+            try:
+                for chunk in iter_table_chunks(input_file, chunk_rows, encoding, where=keep_rows,
+                                               where_columns=projection_columns(steps)):
+                    rows_out += len(chunk)
+                    if csv_output:
+                        first = handle is None
+                        if first:
+                            handle = open_text_output(output_file)
+                        chunk.to_csv(handle, index=False, header=first, sep=';')
+                    else:
+                        selected.append(chunk)
+                break
+            except UnicodeDecodeError:
+                continue
+            finally:
+                if handle is not None:
+                    handle.close()
+
+        if not csv_output or handle is None:
+            df = pd.concat(selected, ignore_index=True) if selected else pd.DataFrame(columns=header)
+            write_table(df, output_file)
+        rows_in = counts[0][0] if counts else 0
+        stage.update(linhas_entrada=rows_in, linhas_saida=rows_out, bytes_gravados=os.path.getsize(output_file))
+
+    report = streaming_filter_report(steps, counts, on_step)
+    return {"linhas_entrada": rows_in, "linhas_saida": rows_out, "passos": report, "filtro_na_leitura": True}
+
+
+def streaming_filter(steps):
+    """
+    Filtro da leitura em blocos para passos de STREAMING_FILTER_STEPS: retorna (where, contagens).
+    `where(bloco)` aplica os passos em sequência e devolve a máscara das linhas mantidas;
+    `contagens` acumula [linhas antes, linhas depois, segundos] de cada passo.
+    """
+    counts = [[0, 0, 0.0] for _ in steps]
+
+    def keep_rows(chunk):
+        kept = chunk
+        for count, (_, func, params) in zip(counts, steps):
+            started = time.perf_counter()
+            count[0] += len(kept)
+            result = func(kept, **params)
+            kept = result[0] if isinstance(result, tuple) else result
+            count[1] += len(kept)
+            count[2] += time.perf_counter() - started
+        return chunk.index.isin(kept.index)
+
+    return keep_rows, counts
+
+
+def streaming_filter_report(steps, counts, on_step=None):
+    """Relatório por passo (formato de apply_recipe) a partir das contagens de streaming_filter."""
+    report = []
+    for position, ((action, _, _), (before, after, seconds)) in enumerate(zip(steps, counts), start=1):
+        entry = {"passo": position, "acao": action, "linhas_antes": before, "linhas_depois": after,
+                 "duracao_s": round(seconds, 3)}
+        report.append(entry)
+        if on_step:
+            on_step(entry)
+    return report
+
+
+# --------------------- Saída particionada (um arquivo por valor) --------------------- #
+# Em vez de filtrar o mesmo arquivo uma vez por UF, banco etc., o arquivo é lido uma vez e cada
+# linha vai para o arquivo do seu valor na coluna escolhida. Um manifesto JSON lista as partições.
+PARTITION_MAX_OPEN = 64  # arquivos abertos ao mesmo tempo (DATAMAGI_PARTICOES_ABERTAS muda o padrão)
+PARTITION_BUFFER_ROWS = 200_000  # linhas acumuladas em memória (todas as partições) antes de gravar
+PARTITION_EMPTY_NAME = "vazio"  # nome do arquivo da partição das células vazias
+
+
+def partition_slug(value):
+    """Parte do nome de arquivo para o valor da partição (sem caracteres inválidos em nomes de arquivo)."""
+    import re
+
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return PARTITION_EMPTY_NAME
+    slug = re.sub(r"[^\w.-]+", "_", str(value).strip()).strip("._")
+    return slug[:80] or PARTITION_EMPTY_NAME
+
+
+def partition_dir_for(input_file, prefix, column):
+    """Pasta de saída padrão das partições: `<prefixo><entrada>_por_<coluna>` ao lado da entrada."""
+    stem = os.path.basename(with_table_extension(input_file, ""))
+    return os.path.join(os.path.dirname(input_file), f"{prefix}{stem}_por_{partition_slug(column)}")
+
+
+class PartitionWriter:
+    """
+    Grava cada valor da coluna em seu arquivo, `<nome>_<valor><ext>` em `output_dir`.
+    - As linhas de cada partição ficam em memória até somarem PARTITION_BUFFER_ROWS em todas as
+      partições; então todos os buffers são gravados, um bloco por arquivo.
+    - No máximo `max_open` arquivos ficam abertos; o usado há mais tempo é fechado e reaberto
+      depois para acrescentar (LRU).
+    - Excel, Parquet e Feather não aceitam acréscimo: cada partição vai para um CSV temporário,
+      convertido em close(), uma partição por vez.
+    """
+
+    def __init__(self, output_dir, name, ext, max_open=None, buffer_rows=PARTITION_BUFFER_ROWS):
+        self.output_dir = output_dir
+        self.name = name
+        self.ext = ext
+        if max_open is None:
+            raw = os.environ.get("DATAMAGI_PARTICOES_ABERTAS", "").strip()
+            max_open = int(raw) if raw.isdigit() else PARTITION_MAX_OPEN if not raw else 0
+            if max_open < 1:
+                raise ValueError(f"DATAMAGI_PARTICOES_ABERTAS deve ser um inteiro positivo (recebido: {raw!r}).")
+        self.max_open = max(1, max_open)
+        self.buffer_rows = buffer_rows
+        self.spool = ext not in CSV_EXTENSIONS + COMPRESSED_CSV_EXTENSIONS
+        self.partitions = {}  # chave -> {"valor", "arquivo", "linhas"}
+        self._buffers = {}
+        self._buffered = 0
+        self._handles = OrderedDict()
+        self._started = set()
+        self._slugs = set()
+
+    def _key(self, value):
+        return None if value is None or (not isinstance(value, str) and pd.isna(value)) else value
+
+    def _register(self, key):
+        slug = partition_slug(key)
+        candidate, suffix = slug, 2
+        while candidate.lower() in self._slugs:
+            # Valores diferentes com o mesmo nome de arquivo (ex.: "A/B" e "A_B")
+            candidate, suffix = f"{slug}_{suffix}", suffix + 1
+        self._slugs.add(candidate.lower())
+        path = os.path.join(self.output_dir, f"{self.name}_{candidate}{self.ext}")
+        self.partitions[key] = {"valor": key, "arquivo": path, "linhas": 0}
+
+    def _target(self, key):
+        path = self.partitions[key]["arquivo"]
+        return path + ".parcial.csv" if self.spool else path
+
+    def write(self, chunk, column):
+        """Distribui as linhas do bloco pelas partições, conforme o valor de `column`."""
+        import numpy as np
+
+        if chunk.empty:
+            return
+        codes, uniques = pd.factorize(chunk[column])
+        order = np.argsort(codes, kind="stable")
+        bounds = np.cumsum(np.bincount(codes + 1, minlength=len(uniques) + 1))
+        starts = np.concatenate(([0], bounds[:-1]))
+        values = [None, *uniques]  # código -1 (vazio) fica na primeira posição
+        for value, start, end in zip(values, starts, bounds):
+            if start == end:
+                continue
+            key = self._key(value)
+            if key not in self.partitions:
+                self._register(key)
+            rows = chunk.take(order[start:end])
+            self._buffers.setdefault(key, []).append(rows)
+            self.partitions[key]["linhas"] += len(rows)
+            self._buffered += len(rows)
+        if self._buffered >= self.buffer_rows:
+            self.flush()
+
+    def flush(self):
+        """Grava os buffers de todas as partições."""
+        for key, frames in self._buffers.items():
+            handle = self._handle(key)
+            pd.concat(frames).to_csv(handle, index=False, header=key not in self._started, sep=';')
+            self._started.add(key)
+        self._buffers = {}
+        self._buffered = 0
+
+    def _handle(self, key):
+        if key in self._handles:
+            self._handles.move_to_end(key)
+            return self._handles[key]
+        while len(self._handles) >= self.max_open:
+            _, oldest = self._handles.popitem(last=False)
+            oldest.close()
+        handle = open_text_output(self._target(key), append=key in self._started)
+        self._handles[key] = handle
+        return handle
+
+    def close(self):
+        """Grava o que restou, fecha os arquivos e converte os temporários (Excel/Parquet/Feather)."""
+        self.flush()
+        for handle in self._handles.values():
+            handle.close()
+        self._handles.clear()
+        if self.spool:
+            for key, entry in self.partitions.items():
+                spool = self._target(key)
+                # Só a célula vazia é ausente: textos como "NA" ou "null" ficam como nas partições CSV
+                df = pd.read_csv(spool, sep=';', dtype=str, encoding='utf-8', keep_default_na=False, na_values=[""])
+                write_table(df, entry["arquivo"])
+                os.remove(spool)
+
+    def discard(self):
+        """Fecha e apaga tudo o que foi gravado (ex.: nova tentativa com outra codificação)."""
+        for handle in self._handles.values():
+            handle.close()
+        for key in self.partitions:
+            for path in {self._target(key), self.partitions[key]["arquivo"]}:
+                if os.path.exists(path):
+                    os.remove(path)
+        self.__init__(self.output_dir, self.name, self.ext, self.max_open, self.buffer_rows)
+
+    def manifest(self):
+        """Partições ordenadas pelo valor (vazio por último), com arquivo e quantidade de linhas."""
+        entries = sorted(self.partitions.values(), key=lambda e: (e["valor"] is None, str(e["valor"])))
+        return [{"valor": e["valor"], "arquivo": os.path.basename(e["arquivo"]), "linhas": e["linhas"]}
+                for e in entries]
+
+
+def run_partitioned(input_file, column, output_dir, steps=None, formato=None, max_open=None,
+                    chunk_rows=None, on_step=None):
+    """
+    Grava um arquivo por valor de `column` em `output_dir`, lendo a entrada uma única vez, e um
+    manifesto `<entrada>_particoes.json` com o valor, o arquivo e as linhas de cada partição.
+    Passos que só filtram linhas (STREAMING_FILTER_STEPS) viram o filtro da leitura em blocos;
+    com outros passos, o arquivo é processado em memória (apply_recipe) e depois dividido.
+    Retorna um resumo no formato de run_chunked.
+    """
+    steps = steps or []
+    header = list(probe_table(input_file).columns)
+    if column not in header:
+        raise KeyError(column)
+    ext = OUTPUT_FORMATS[formato] if formato else table_extension(input_file)
+    if ext in EXCEL_EXTENSIONS:
+        ext = ".xlsx"
+    name = os.path.basename(with_table_extension(input_file, ""))
+    os.makedirs(output_dir, exist_ok=True)
+    writer = PartitionWriter(output_dir, name, ext, max_open=max_open)
+    if chunk_rows is None:
+        chunk_rows = max(1_000, PROJECTION_CHUNK_CELLS // max(1, len(header)))
+
+    with metrics_stage("particionamento", arquivo=input_file, bytes_lidos=os.path.getsize(input_file)) as stage:
+        if supports_streaming(input_file) and all(action in STREAMING_FILTER_STEPS for action, _, _ in steps):
+            for encoding in ("utf-8", "latin-1"):
+                keep_rows, counts = streaming_filter(steps)
+                rows_in = 0
+                try:
+                    for chunk in iter_table_chunks(input_file, chunk_rows, encoding,
+                                                   where=keep_rows if steps else None,
+                                                   where_columns=projection_columns(steps) if steps else None):
+                        rows_in += len(chunk)
+                        writer.write(chunk, column)
+                    break
+                except UnicodeDecodeError:
+                    writer.discard()
+            report = streaming_filter_report(steps, counts, on_step)
+            if steps:
+                rows_in = counts[0][0]
+        else:
+            df = read_table(input_file, cache=False)
+            rows_in = len(df)
+            df, report = apply_recipe(df, {"nome": "particionar", "passos": steps}, on_step=on_step)
+            for start in range(0, len(df), chunk_rows):
+                writer.write(df.iloc[start:start + chunk_rows], column)
+        writer.close()
+
+        partitions = writer.manifest()
+        rows_out = sum(entry["linhas"] for entry in partitions)
+        manifest_path = os.path.join(output_dir, f"{name}_particoes.json")
+        with open(manifest_path, "w", encoding="utf-8") as f:
+            json.dump({"entrada": input_file, "coluna": column, "linhas_entrada": rows_in, "linhas_saida": rows_out,
+                       "particoes": partitions}, f, ensure_ascii=False, indent=2, default=str)
+        stage.update(linhas_entrada=rows_in, linhas_saida=rows_out,
+                     bytes_gravados=sum(os.path.getsize(os.path.join(output_dir, e["arquivo"])) for e in partitions))
+
+    return {
+        "linhas_entrada": rows_in,
+        "linhas_saida": rows_out,
+        "particoes": len(partitions),
+        "manifesto": manifest_path,
+        "passos": report,
+    }
+
+
+# --------------------- Ações do cache colunar --------------------- #
+def gerar_cache_colunar():
+    """Converte uma base para o cache colunar (Parquet), reaproveitado nas próximas leituras."""
+    print("\n[bold yellow]╔══ Gerar Cache Colunar (Parquet) ══╗[/bold yellow]\n")
+
+    if not pyarrow_available():
+        print("[bold red]✗ O cache colunar requer o pacote pyarrow (pip install pyarrow).[/bold red]\n")
+        return
+
+    file_path = inquirer.text(
+        message="Digite o caminho do arquivo (Excel ou CSV):",
+        validate=lambda x: os.path.isfile(x) and x.lower().endswith(EXCEL_EXTENSIONS + CSV_EXTENSIONS + COMPRESSED_CSV_EXTENSIONS),
+        invalid_message="Arquivo inválido. Informe um arquivo Excel ou CSV."
+    ).execute()
+
+    if read_columnar_cache(file_path, usecols=[]) is not None:
+        rebuild = inquirer.confirm(
+            message="O cache deste arquivo já está atualizado. Gerar novamente?",
+            default=False
+        ).execute()
+        if not rebuild:
+            return
+
+    start_time = time.time()
+    print("\n[cyan]Convertendo para Parquet...[/cyan]")
+    try:
+        info = build_columnar_cache(file_path)
+    except Exception as e:
+        print(f"[bold red]✗ Erro ao gerar o cache colunar: {e}[/bold red]\n")
+        logging.error(f"Erro ao gerar o cache colunar de '{file_path}': {e}")
+        return
+
+    elapsed = time.time() - start_time
+    print("\n[bold yellow]╔══ Resumo da Operação ══╗[/bold yellow]")
+    print(f"[cyan]• Linhas:[/cyan] {info['linhas']:,}")
+    print(f"[cyan]• Colunas:[/cyan] {info['colunas']:,}")
+    print(f"[cyan]• Tamanho original:[/cyan] {info['bytes_origem'] / 1024 / 1024:,.1f} MB")
+    print(f"[cyan]• Tamanho do cache:[/cyan] {info['bytes_cache'] / 1024 / 1024:,.1f} MB")
+    print(f"[cyan]• Tempo total:[/cyan] {elapsed:.2f} segundos")
+    print(f"[cyan]• Cache salvo em:[/cyan] {info['cache']}")
+    print("[bold yellow]╚════════════════════════╝[/bold yellow]\n")
+    print("[dim]As próximas leituras deste arquivo usarão o cache enquanto ele não for alterado.[/dim]\n")
+
+
+def run_columnar_command(args):
+    """Subcomando 'colunar' da CLI: gera o cache Parquet de um arquivo e escreve o resumo em JSON."""
+    started = time.perf_counter()
+    summary = {"acao": "colunar", "entrada": args.entrada}
+    if not os.path.isfile(args.entrada):
+        summary.update(status="erro", codigo_saida=EXIT_ENTRADA, erro=f"Arquivo não encontrado: {args.entrada}")
+    else:
+        try:
+            summary.update(build_columnar_cache(args.entrada))
+            summary.update(status="ok", codigo_saida=EXIT_OK)
+        except Exception as e:
+            summary.update(status="erro", codigo_saida=EXIT_ERRO, erro=str(e))
+    summary["duracao_s"] = round(time.perf_counter() - started, 3)
+    sys.stdout.write(json.dumps(summary, ensure_ascii=False, default=str) + "\n")
+    return summary["codigo_saida"]
+
+
+# --------------------- Dados sintéticos e benchmark --------------------- #
+# Gerador determinístico de cadastros brasileiros realistas (CPFs com e sem dígito verificador
+# válido, telefones com/sem 55 e nono dígito, CEPs, datas em formatos misturados, dados
+# bancários, UPAG e nomes acentuados) e um benchmark que executa cada ação da CLI de ponta a
+# ponta em um processo separado, medindo tempo, CPU e pico de memória.
+SYNTH_CHUNK_ROWS = 250_000
+EXCEL_MAX_ROWS = 1_048_575  # limite de linhas de dados de uma planilha .xlsx
+
+SYNTH_FIRST_NAMES = [
+    "JOSÉ", "MARIA", "JOÃO", "ANA", "ANTÔNIO", "FRANCISCA", "LUÍS", "MÁRCIA", "SEBASTIÃO",
+    "CONCEIÇÃO", "PAULO", "LÚCIA", "CARLOS", "ADRIANA", "RAIMUNDO", "JULIANA", "FÁBIO",
+    "PATRÍCIA", "ANDRÉ", "SÔNIA", "Mário", "Cláudia", "José Antônio", "Maria da Glória",
+]
+SYNTH_LAST_NAMES = [
+    "SILVA", "SANTOS", "OLIVEIRA", "SOUZA", "RODRIGUES", "FERREIRA", "ALVES", "PEREIRA",
+    "LIMA", "GOMES", "CONCEIÇÃO", "ARAÚJO", "GONÇALVES", "RIBEIRO", "MELO", "BARBOSA",
+    "DE JESUS", "DAMIÃO", "ASSUNÇÃO", "BRANDÃO", "Magalhães", "Figueirêdo",
+]
+# (cidade, UF, DDD, faixa de CEP)
+SYNTH_CITIES = [
+    ("SÃO PAULO", "SP", "11", 1000000, 5999999),
+    ("RIO DE JANEIRO", "RJ", "21", 20000000, 23799999),
+    ("BELO HORIZONTE", "MG", "31", 30000000, 31999999),
+    ("SALVADOR", "BA", "71", 40000000, 42599999),
+    ("RECIFE", "PE", "81", 50000000, 52999999),
+    ("FORTALEZA", "CE", "85", 60000000, 61599999),
+    ("CURITIBA", "PR", "41", 80000000, 82999999),
+    ("PORTO ALEGRE", "RS", "51", 90000000, 91999999),
+    ("BRASÍLIA", "DF", "61", 70000000, 72799999),
+    ("GOIÂNIA", "GO", "62", 74000000, 74899999),
+    ("MANAUS", "AM", "92", 69000000, 69099999),
+    ("BELÉM", "PA", "91", 66000000, 66999999),
+]
+SYNTH_STREETS = ["RUA DAS FLORES", "AV. BRASIL", "RUA SÃO JOÃO", "TRAVESSA DA CONCEIÇÃO",
+                 "AVENIDA PAULISTA", "RUA DOM PEDRO II", "ESTRADA DO CAMPO", "RUA 7 DE SETEMBRO"]
+SYNTH_DISTRICTS = ["CENTRO", "JARDIM AMÉRICA", "VILA NOVA", "BOA VISTA", "SÃO CRISTÓVÃO", "LIBERDADE"]
+SYNTH_BANKS = ["001", "033", "104", "237", "341", "260", "077", "212", "422", "745"]
+
+
+def _pick(rng, values, size, weights=None):
+    import numpy as np
+
+    values = np.asarray(values, dtype=object)
+    p = None if weights is None else np.asarray(weights, dtype=float) / sum(weights)
+    return values[rng.choice(len(values), size=size, p=p)]
+
+
+def _choose(rng, variants, weights):
+    """Monta a coluna sorteando, linha a linha, uma das variantes (arrays do mesmo tamanho) com os pesos dados."""
+    import numpy as np
+
+    size = len(variants[0])
+    p = np.asarray(weights, dtype=float) / sum(weights)
+    code = rng.choice(len(variants), size=size, p=p)
+    return np.choose(code, [np.asarray(v, dtype=object) for v in variants])
+
+
+def _zfill(values, width):
+    """Inteiros -> texto com zeros à esquerda, vetorizado com tabelas de grupos de até 3 dígitos."""
+    import numpy as np
+
+    values = np.asarray(values, dtype=np.int64)
+    result = None
+    for position in range(0, width, 3):
+        digits = min(3, width - position)
+        table = np.array([f"{i:0{digits}d}" for i in range(10 ** digits)], dtype=object)
+        part = table[values // 10 ** (width - position - digits) % 10 ** digits]
+        result = part if result is None else result + part
+    return result
+
+
+def _to_text(values):
+    import numpy as np
+
+    return np.asarray(values).astype(str).astype(object)
+
+
+def synthetic_cpfs(rng, size):
+    """CPFs com dígitos verificadores válidos; parte sem zeros à esquerda, formatada, inválida ou vazia."""
+    import numpy as np
+
+    base = rng.integers(0, 10, size=(size, 9))
+    d1 = (base @ np.arange(10, 1, -1)) * 10 % 11 % 10
+    digits = np.column_stack([base, d1])
+    d2 = (digits @ np.arange(11, 1, -1)) * 10 % 11 % 10
+    digits = np.column_stack([digits, d2])
+    # ~5% com o último dígito trocado (dígito verificador inválido)
+    invalid = rng.random(size) < 0.05
+    digits[invalid, 10] = (digits[invalid, 10] + rng.integers(1, 10, int(invalid.sum()))) % 10
+    numbers = digits @ (10 ** np.arange(10, -1, -1, dtype=np.int64))
+
+    formatted = (_zfill(numbers // 10 ** 8, 3) + "." + _zfill(numbers // 10 ** 5, 3) + "."
+                 + _zfill(numbers // 100, 3) + "-" + _zfill(numbers, 2))
+    cpfs = _choose(rng, [
+        _zfill(numbers, 11),
+        formatted,
+        _to_text(numbers),  # como vem de planilhas com a coluna numérica (sem zeros à esquerda)
+        np.full(size, "", dtype=object),
+    ], [80, 10, 9, 1])
+
+    # ~3% de CPFs repetidos (para as deduplicações)
+    repeated = np.flatnonzero(rng.random(size) < 0.03)
+    cpfs[repeated] = cpfs[rng.integers(0, size, len(repeated))]
+    return cpfs
+
+
+def synthetic_phones(rng, ddd, size):
+    """Celulares com e sem 55 e nono dígito, alguns com máscara ou vazios."""
+    import numpy as np
+
+    number = rng.integers(60_000_000, 100_000_000, size)
+    text = _to_text(number)
+    return _choose(rng, [
+        "55" + ddd + "9" + text,                                                     # 13 dígitos
+        ddd + "9" + text,                                                            # 11 dígitos
+        ddd + text,                                                                  # 10 dígitos (sem o nono)
+        "55" + ddd + text,                                                           # 12 dígitos
+        "(" + ddd + ") 9" + _to_text(number // 10_000) + "-" + _zfill(number, 4),    # com máscara
+        np.full(size, "", dtype=object),
+    ], [25, 45, 12, 5, 8, 5])
+
+
+def synthetic_dates(rng, size):
+    """Datas de nascimento em formatos misturados: dd/mm/aaaa, ISO, serial do Excel, dd-mm-aaaa e inválidas."""
+    import numpy as np
+
+    dates = np.datetime64("1935-01-01") + rng.integers(0, 70 * 365, size).astype("timedelta64[D]")
+    months = dates.astype("datetime64[M]")
+    year = _to_text(dates.astype("datetime64[Y]").astype(np.int64) + 1970)
+    month = _zfill(months.astype(np.int64) % 12 + 1, 2)
+    day = _zfill((dates - months).astype(np.int64) + 1, 2)
+    serial = _to_text((dates - np.datetime64("1899-12-30")).astype(np.int64))
+    return _choose(rng, [
+        day + "/" + month + "/" + year,
+        year + "-" + month + "-" + day,
+        serial,
+        day + "-" + month + "-" + year,
+        _pick(rng, ["31/02/1980", "00/00/0000", "", "NAO INFORMADO", "1975"], size),
+    ], [60, 20, 8, 7, 5])
+
+
+def generate_synthetic_frame(rows, seed=42, chunk=0, extra_columns=0):
+    """
+    Gera um bloco de `rows` cadastros sintéticos (tudo como string). O mesmo (seed, chunk)
+    sempre produz os mesmos dados. `extra_columns` adiciona colunas genéricas para simular
+    bases largas.
+    """
+    import numpy as np
+
+    rng = np.random.default_rng([seed, chunk])
+    upag_pool = _to_text(np.random.default_rng(seed).integers(100_000_000, 999_999_999, 300))
+
+    city = rng.integers(0, len(SYNTH_CITIES), rows)
+    cities = np.array([c[0] for c in SYNTH_CITIES], dtype=object)[city]
+    ufs = np.array([c[1] for c in SYNTH_CITIES], dtype=object)[city]
+    ddds = np.array([c[2] for c in SYNTH_CITIES], dtype=object)[city]
+    cep_low = np.array([c[3] for c in SYNTH_CITIES])[city]
+    cep_high = np.array([c[4] for c in SYNTH_CITIES])[city]
+
+    ceps = cep_low + (rng.random(rows) * (cep_high - cep_low)).astype(np.int64)
+    cep = _choose(rng, [
+        _zfill(ceps, 8),
+        _zfill(ceps // 1000, 5) + "-" + _zfill(ceps, 3),
+        _to_text(ceps),
+        np.full(rows, "", dtype=object),
+    ], [77, 15, 5, 3])
+
+    names = (_pick(rng, SYNTH_FIRST_NAMES, rows) + " " + _pick(rng, SYNTH_LAST_NAMES, rows)
+             + " " + _pick(rng, SYNTH_LAST_NAMES, rows))
+
+    agency_number = rng.integers(1, 10_000, rows)
+    agency = _choose(rng, [_zfill(agency_number, 4),
+                           _zfill(agency_number, 4) + "-" + _to_text(rng.integers(0, 10, rows))], [80, 20])
+    account = _choose(rng, [_to_text(rng.integers(1_000, 10_000_000, rows)) + "-" + _to_text(rng.integers(0, 10, rows)),
+                            np.full(rows, "", dtype=object)], [97, 3])
+
+    cents = (rng.gamma(2.0, 900.0, rows) * 100).round().astype(np.int64)
+    reais, cents = _to_text(cents // 100), _zfill(cents, 2)
+    values = _choose(rng, [reais + "." + cents, reais + "," + cents], [70, 30])
+
+    number = _choose(rng, [_to_text(rng.integers(1, 3_000, rows)), np.full(rows, "S/N", dtype=object)], [95, 5])
+    rg_number = _to_text(rng.integers(1_000_000, 999_999_999, rows))
+    rg = _choose(rng, [rg_number, rg_number + "-" + _pick(rng, list("0123456789X"), rows)], [85, 15])
+
+    df = pd.DataFrame({
+        "nome": names,
+        "cpf": synthetic_cpfs(rng, rows),
+        "rg": rg,
+        "data_nascimento": synthetic_dates(rng, rows),
+        "sexo": _pick(rng, ["M", "F", "MASCULINO", "FEMININO", "m", "f", ""], rows, [35, 35, 10, 10, 3, 3, 4]),
+        "telefone": synthetic_phones(rng, ddds, rows),
+        "celular": synthetic_phones(rng, ddds, rows),
+        "cep": cep,
+        "logradouro": _pick(rng, SYNTH_STREETS, rows),
+        "numero": number,
+        "bairro": _pick(rng, SYNTH_DISTRICTS, rows),
+        "cidade": cities,
+        "uf": ufs,
+        "banco": _pick(rng, SYNTH_BANKS, rows),
+        "agencia": agency,
+        "conta": account,
+        "upag": _pick(rng, upag_pool, rows),
+        "valor_beneficio": values,
+    })
+    for i in range(extra_columns):
+        df[f"extra_{i + 1}"] = _to_text(rng.integers(0, 1_000_000, rows))
+    return df
+
+
+def _synthetic_csv_task(task):
+    """Gera um bloco sintético em um processo do pool e devolve o CSV (';') como texto."""
+    size, seed, chunk, extra_columns = task
+    df = generate_synthetic_frame(size, seed, chunk, extra_columns)
+    return df.to_csv(index=False, header=(chunk == 0), sep=';')
+
+
+def generate_synthetic_file(file_path, rows, seed=42, extra_columns=0, chunk_rows=SYNTH_CHUNK_ROWS, workers=None):
+    """
+    Grava `rows` cadastros sintéticos no formato da extensão do arquivo. CSV (também .gz/.zst)
+    é gerado em blocos paralelos e gravado em ordem, sem limite de tamanho; .xlsx aceita até
+    EXCEL_MAX_ROWS linhas. O conteúdo depende só de (rows, seed, extra_columns, chunk_rows).
+    Retorna um resumo com linhas, colunas e tamanho.
+    """
+    from collections import deque
+
+    lower = file_path.lower()
+    if lower.endswith(".xlsx") and rows > EXCEL_MAX_ROWS:
+        raise ValueError(f"Planilhas .xlsx comportam no máximo {EXCEL_MAX_ROWS:,} linhas; use CSV.")
+    started = time.perf_counter()
+    tasks = [(min(chunk_rows, rows - start), seed, i, extra_columns)
+             for i, start in enumerate(range(0, rows, chunk_rows))] or [(0, seed, 0, extra_columns)]
+    columns = list(generate_synthetic_frame(0, seed, 0, extra_columns).columns)
+
+    if lower.endswith(CSV_EXTENSIONS + COMPRESSED_CSV_EXTENSIONS):
+        workers = min(workers or default_workers(), len(tasks))
+        with open_text_output(file_path) as out:
+            if workers <= 1:
+                for task in tasks:
+                    out.write(_synthetic_csv_task(task))
+            else:
+                from concurrent.futures import ProcessPoolExecutor
+
+                # Janela limitada de blocos em andamento: a memória não cresce com o tamanho da base
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    pending = deque()
+                    for task in tasks:
+                        pending.append(pool.submit(_synthetic_csv_task, task))
+                        if len(pending) >= workers * 2:
+                            out.write(pending.popleft().result())
+                    while pending:
+                        out.write(pending.popleft().result())
+    else:
+        df = pd.concat([generate_synthetic_frame(*task) for task in tasks], ignore_index=True)
+        write_table(df, file_path)
+
+    return {
+        "arquivo": file_path,
+        "linhas": rows,
+        "colunas": len(columns),
+        "bytes": os.path.getsize(file_path),
+        "duracao_s": round(time.perf_counter() - started, 3),
+    }
+
+
+# Ações medidas pelo benchmark: subcomando da CLI -> argumentos ({lista} e {receita} são gerados)
+BENCH_CASES = {
+    "filtrar": ["--coluna", "uf", "--valor", "SP"],
+    "filtrar-numerico": ["--coluna", "valor_beneficio", "--maior-que", "1000"],
+    "filtrar-condicao": ["--condicao", "uf em (SP, RJ, MG) e sexo = F e nao telefone vazio"],
+    "ajustar-cpf": ["--coluna", "cpf"],
+    "deduplicar-cpf": ["--coluna", "cpf"],
+    "remover-cpfs": ["--coluna", "cpf", "--arquivo", "{lista}", "--coluna-arquivo", "cpf"],
+    "remover-vazias": ["--colunas", "telefone", "cep"],
+    "telefones": ["--colunas", "telefone", "celular", "--modo", "remover-55"],
+    "formatar-data": ["--coluna", "data_nascimento"],
+    "idade": ["--coluna", "data_nascimento"],
+    "receita": ["--receita", "{receita}"],
+}
+
+BENCH_RECIPE = {
+    "nome": "benchmark",
+    "passos": [
+        {"acao": "ajustar-cpf", "coluna": "cpf"},
+        {"acao": "remover-cpfs", "coluna": "cpf", "arquivo": "{lista}", "coluna-arquivo": "cpf"},
+        {"acao": "telefones", "colunas": ["telefone", "celular"], "modo": "remover-55"},
+        {"acao": "remover-vazias", "colunas": ["telefone"]},
+        {"acao": "deduplicar-cpf", "coluna": "cpf"},
+    ],
+}
+
+
+# Inicialização medida pelo benchmark (sem base): importar o módulo e responder à CLI como
+# script (`python app.py`, recompilado a cada execução) e como módulo (`python -m app`, usa o
+# bytecode em cache). O modo não interativo é executado milhares de vezes; subir o processo conta.
+BENCH_STARTUP_CASES = {
+    "inicio-import": ["-c", "import {modulo}"],
+    "inicio-cli": ["{script}", "--help"],
+    "inicio-cli-modulo": ["-m", "{modulo}", "--help"],
+}
+
+
+def _startup_command(case):
+    """Comando (executado na pasta do script) que mede um caso de inicialização."""
+    script = os.path.abspath(__file__)
+    module = os.path.splitext(os.path.basename(script))[0]
+    return [sys.executable, *(a.replace("{script}", script).replace("{modulo}", module)
+                              for a in BENCH_STARTUP_CASES[case])]
+
+
+def _run_measured(command, cwd=None):
+    """
+    Executa o comando em um processo filho e mede tempo de parede, CPU e pico de memória (RSS)
+    do próprio filho. Em sistemas sem os.wait4 (Windows) o pico de memória fica como None.
+    """
+    import subprocess
+
+    started = time.perf_counter()
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=cwd)
+    if hasattr(os, "wait4"):
+        # O resumo JSON é pequeno, então esperar antes de ler a saída não trava o pipe
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        stdout, stderr = process.stdout.read(), process.stderr.read()
+        process.stdout.close()
+        process.stderr.close()
+        peak_mb = usage.ru_maxrss / 1024 if sys.platform != "darwin" else usage.ru_maxrss / 1024 / 1024
+        cpu_s = usage.ru_utime + usage.ru_stime
+    else:
+        stdout, stderr = process.communicate()
+        peak_mb = cpu_s = None
+    elapsed = time.perf_counter() - started
+
+    summary = {}
+    lines = stdout.decode("utf-8", errors="replace").strip().splitlines()
+    if lines:
+        try:
+            summary = json.loads(lines[-1])
+        except ValueError:
+            pass
+    if process.returncode != 0 and "erro" not in summary:
+        summary["erro"] = stderr.decode("utf-8", errors="replace").strip()[-500:]
+    return {
+        "codigo_saida": process.returncode,
+        "duracao_s": round(elapsed, 3),
+        "cpu_s": round(cpu_s, 3) if cpu_s is not None else None,
+        "pico_rss_mb": round(peak_mb, 1) if peak_mb is not None else None,
+        "resumo": summary,
+    }
+
+
+def prepare_benchmark_inputs(work_dir, rows, formato="csv", seed=42, extra_columns=0):
+    """
+    Gera (ou reaproveita) a base sintética, a lista de CPFs para remoção (10% da base) e a
+    receita do benchmark. Retorna (base, lista, receita).
+    """
+    os.makedirs(work_dir, exist_ok=True)
+    suffix = f"_{extra_columns}extras" if extra_columns else ""
+    base = os.path.join(work_dir, f"sintetico_{rows}_s{seed}{suffix}{OUTPUT_FORMATS[formato]}")
+    if not os.path.isfile(base):
+        generate_synthetic_file(base, rows, seed=seed, extra_columns=extra_columns)
+
+    blacklist = os.path.join(work_dir, f"lista_cpfs_{rows}_s{seed}{suffix}.csv")
+    if not os.path.isfile(blacklist):
+        cpfs = read_table(base, usecols=["cpf"], cache=False, compact=False)
+        cpfs.iloc[::10].to_csv(blacklist, index=False, sep=';', encoding='utf-8')
+
+    recipe = {
+        "nome": BENCH_RECIPE["nome"],
+        "passos": [{key: os.path.basename(blacklist) if value == "{lista}" else value for key, value in step.items()}
+                   for step in BENCH_RECIPE["passos"]],
+    }
+    recipe_path = os.path.join(work_dir, f"receita_benchmark_{rows}_s{seed}{suffix}.json")
+    with open(recipe_path, "w", encoding="utf-8") as f:
+        json.dump(recipe, f, ensure_ascii=False, indent=2)
+    return base, blacklist, recipe_path
+
+
+def _measure_case(command, action, formato, rows, extra_columns, repeats, cwd=None):
+    """Executa o comando `repeats` vezes e resume: menor tempo, maior pico de memória."""
+    import datetime
+
+    runs = [_run_measured(command, cwd) for _ in range(max(1, repeats))]
+    best = min(runs, key=lambda r: r["duracao_s"])
+    peaks = [r["pico_rss_mb"] for r in runs if r["pico_rss_mb"] is not None]
+    result = {
+        "data": datetime.datetime.now().isoformat(timespec="seconds"),
+        "acao": action,
+        "formato": formato,
+        "linhas": rows,
+        "colunas_extras": extra_columns,
+        "status": "ok" if best["codigo_saida"] == EXIT_OK else "erro",
+        "duracao_s": best["duracao_s"],
+        "cpu_s": best["cpu_s"],
+        "pico_rss_mb": max(peaks) if peaks else None,
+        "linhas_por_s": int(rows / best["duracao_s"]) if rows and best["duracao_s"] else None,
+        "linhas_saida": best["resumo"].get("linhas_saida"),
+    }
+    if result["status"] != "ok":
+        result["erro"] = best["resumo"].get("erro")
+    return result
+
+
+def run_benchmark(sizes, work_dir, formats=("csv",), actions=None, seed=42, repeats=1,
+                  extra_columns=0, on_result=None):
+    """
+    Mede cada ação (BENCH_CASES) de ponta a ponta sobre bases sintéticas de cada tamanho e
+    formato, além da inicialização (BENCH_STARTUP_CASES: uma vez só, formato "-" e 0 linhas).
+    Cada execução roda em um processo novo (sem caches de sessão). Com `repeats` > 1
+    fica o menor tempo e o maior pico de memória. Retorna uma lista de resultados.
+    """
+    available = [*BENCH_STARTUP_CASES, *BENCH_CASES]
+    actions = list(actions or available)
+    unknown = [a for a in actions if a not in available]
+    if unknown:
+        raise ValueError(f"Ações desconhecidas no benchmark: {', '.join(unknown)}. Disponíveis: {', '.join(available)}")
+
+    results = []
+
+    def record(result):
+        results.append(result)
+        if on_result:
+            on_result(result)
+
+    for case in [a for a in actions if a in BENCH_STARTUP_CASES]:
+        record(_measure_case(_startup_command(case), case, "-", 0, 0, repeats,
+                             cwd=os.path.dirname(os.path.abspath(__file__))))
+
+    actions = [a for a in actions if a in BENCH_CASES]
+    for formato in formats if actions else ():
+        for rows in sizes:
+            base, blacklist, recipe_path = prepare_benchmark_inputs(work_dir, rows, formato, seed, extra_columns)
+            for action in actions:
+                arguments = [a.replace("{lista}", blacklist).replace("{receita}", recipe_path)
+                             for a in BENCH_CASES[action]]
+                output_file = os.path.join(work_dir, f"saida_{action}{OUTPUT_FORMATS[formato]}")
+                command = [sys.executable, os.path.abspath(__file__), action, base, "-o", output_file, *arguments]
+                record(_measure_case(command, action, formato, rows, extra_columns, repeats))
+                if os.path.isfile(output_file):
+                    os.remove(output_file)
+    return results
+
+
+def compare_benchmarks(results, baseline_path, tolerance=0.2):
+    """
+    Compara os resultados com uma execução anterior (arquivo JSON lines do benchmark).
+    Retorna as regressões: tempo ou pico de memória acima de (1 + tolerance) x a referência.
+    """
+    baseline = {}
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                # A última medição de cada caso vale como referência
+                baseline[(entry["acao"], entry["formato"], entry["linhas"], entry.get("colunas_extras", 0))] = entry
+
+    regressions = []
+    for result in results:
+        reference = baseline.get((result["acao"], result["formato"], result["linhas"], result["colunas_extras"]))
+        if not reference or result["status"] != "ok":
+            continue
+        for metric in ("duracao_s", "pico_rss_mb"):
+            before, after = reference.get(metric), result.get(metric)
+            if before and after and after > before * (1 + tolerance):
+                regressions.append({"acao": result["acao"], "formato": result["formato"], "linhas": result["linhas"],
+                                    "metrica": metric, "referencia": before, "atual": after,
+                                    "variacao": f"{(after / before - 1) * 100:+.0f}%"})
+    return regressions
+
+
+def run_generate_command(args):
+    """Subcomando 'gerar-dados' da CLI: grava uma base sintética e escreve o resumo em JSON."""
+    summary = {"acao": "gerar-dados"}
+    try:
+        summary.update(generate_synthetic_file(args.saida, args.linhas, seed=args.semente,
+                                               extra_columns=args.colunas_extras, workers=args.processos))
+        summary.update(status="ok", codigo_saida=EXIT_OK)
+    except Exception as e:
+        summary.update(status="erro", codigo_saida=EXIT_ERRO, erro=str(e))
+    sys.stdout.write(json.dumps(summary, ensure_ascii=False, default=str) + "\n")
+    return summary["codigo_saida"]
+
+
+def run_benchmark_command(args):
+    """
+    Subcomando 'bench' da CLI: mede as ações, mostra a tabela de resultados, acrescenta os
+    resultados ao arquivo JSON lines e, com --comparar, falha (código 1) se houver regressões.
+    """
+    from rich.table import Table
+    from rich.console import Console
+
+    console = Console(stderr=True)
+    results_path = args.resultados or os.path.join(args.pasta, "benchmark.jsonl")
+
+    def show(result):
+        rss = f"{result['pico_rss_mb']:,.0f} MB" if result["pico_rss_mb"] is not None else "-"
+        status = "[green]ok[/green]" if result["status"] == "ok" else f"[red]erro: {result.get('erro')}[/red]"
+        console.print(f"[cyan]{result['acao']}[/cyan] {result['linhas']:,} linhas ({result['formato']}): "
+                      f"{result['duracao_s']:.2f}s, {rss} {status}")
+
+    try:
+        results = run_benchmark(args.tamanhos, args.pasta, formats=args.formatos, actions=args.acoes,
+                                seed=args.semente, repeats=args.repeticoes,
+                                extra_columns=args.colunas_extras, on_result=show)
+    except Exception as e:
+        sys.stdout.write(json.dumps({"acao": "bench", "status": "erro", "codigo_saida": EXIT_ERRO,
+                                     "erro": str(e)}, ensure_ascii=False) + "\n")
+        return EXIT_ERRO
+
+    table = Table(title="Benchmark DataMagi")
+    for header in ("Ação", "Formato", "Linhas", "Tempo (s)", "CPU (s)", "Pico RSS (MB)", "Linhas/s", "Status"):
+        table.add_column(header, justify="left" if header in ("Ação", "Formato", "Status") else "right")
+    for r in results:
+        table.add_row(r["acao"], r["formato"], f"{r['linhas']:,}", f"{r['duracao_s']:.2f}",
+                      f"{r['cpu_s']:.2f}" if r["cpu_s"] is not None else "-",
+                      f"{r['pico_rss_mb']:,.0f}" if r["pico_rss_mb"] is not None else "-",
+                      f"{r['linhas_por_s']:,}" if r["linhas_por_s"] else "-", r["status"])
+    console.print(table)
+
+    regressions = compare_benchmarks(results, args.comparar, args.tolerancia) if args.comparar else []
+    os.makedirs(os.path.dirname(results_path) or ".", exist_ok=True)
+    with open(results_path, "a", encoding="utf-8") as f:
+        for result in results:
+            f.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+    failures = sum(r["status"] != "ok" for r in results)
+    summary = {"acao": "bench", "casos": len(results), "falhas": failures, "resultados": results_path,
+               "regressoes": regressions}
+    exit_code = EXIT_ERRO if failures or regressions else EXIT_OK
+    summary.update(status="ok" if exit_code == EXIT_OK else "regressao" if regressions else "erro",
+                   codigo_saida=exit_code)
+    sys.stdout.write(json.dumps(summary, ensure_ascii=False, default=str) + "\n")
+    return exit_code
+
+
 def main():
+    # Carrega o pandas em segundo plano enquanto o usuário escolhe a ação no menu
+    threading.Thread(target=pd.load, name="datamagi-preload", daemon=True).start()
     while True:
         choice = inquirer.select(
             message="Selecione uma categoria:",
@@ -5379,7 +9925,12 @@ def main():
                 Choice("6", "Mapeamento de Colunas"),
                 Choice("7", "Formatação de Datas"),
                 Choice("8", "Buscar e Validar CEPs"),
-                Choice("9", "Sair")
+                Choice("9", "Importar Base Offline de CEPs"),
+                Choice("10", "Servidor Local de CEP (Testes)"),
+                Choice("11", "Executar Receita (Pipeline)"),
+                Choice("12", "Processar Pasta em Lote (Paralelo)"),
+                Choice("13", "Gerar Cache Colunar (Parquet)"),
+                Choice("14", "Sair")
             ]
         ).execute()
 
@@ -5394,12 +9945,22 @@ def main():
         elif choice == "5":
             formatacoes()
         elif choice == "6":
-            map_columns_and_merge()
+            run_action(map_columns_and_merge)
         elif choice == "7":
-            formatar_coluna_data()
+            run_action(formatar_coluna_data)
         elif choice == "8":
-            validate_and_format_cep()
+            run_action(validate_and_format_cep)
         elif choice == "9":
+            run_action(import_cep_database)
+        elif choice == "10":
+            run_cep_stub_server()
+        elif choice == "11":
+            run_action(executar_receita)
+        elif choice == "12":
+            run_action(processar_pasta_em_lote)
+        elif choice == "13":
+            run_action(gerar_cache_colunar)
+        elif choice == "14":
             print("Programa encerrado!")
             break
 
@@ -5416,27 +9977,30 @@ def filtros_unicos():
                 Choice("6", "Validador Banco, Agência e Conta"),
                 Choice("7", "Validar Números de Celular (simples)"),
                 Choice("8", "Validar várias colunas de celular (nova função)"),  # <-- Nova opção
-                Choice("9", "Voltar")
+                Choice("9", "Dividir arquivo por coluna (um arquivo por valor)"),
+                Choice("10", "Voltar")
             ]
         ).execute()
 
         if choice == "1":
-            filter_single_excel()
+            run_action(filter_single_excel)
         elif choice == "2":
-            filter_numeric()
+            run_action(filter_numeric)
         elif choice == "3":
-            extract_ddd_and_number()
+            run_action(extract_ddd_and_number)
         elif choice == "4":
-            filter_agencies()
+            run_action(filter_agencies)
         elif choice == "5":
-            validador_de_bancos()
+            run_action(validador_de_bancos)
         elif choice == "6":
-            filter_back_age()
+            run_action(filter_back_age)
         elif choice == "7":
-            validar_numeros_celular()
+            run_action(validar_numeros_celular)
         elif choice == "8":
-            validate_multiple_phone_columns_simple_split()  # <-- Chama a nova função
+            run_action(validate_multiple_phone_columns_simple_split)  # <-- Chama a nova função
         elif choice == "9":
+            run_action(dividir_por_coluna)
+        elif choice == "10":
             break
 
 
@@ -5455,13 +10019,13 @@ def filtros_multiplos():
         ).execute()
 
         if choice == "1":
-            filter_multiple_excel()
+            run_action(filter_multiple_excel)
         elif choice == "2":
-            select_common_columns_and_reduce()  # Função já existente
+            run_action(select_common_columns_and_reduce)  # Função já existente
         elif choice == "3":
-            deduplicate_cpfs_across_files()     # Função já existente
+            run_action(deduplicate_cpfs_across_files)     # Função já existente
         elif choice == "4":
-            unify_csv_in_chunks_1m_lines()      # <-- Chamada da nova função
+            run_action(unify_csv_in_chunks_1m_lines)      # <-- Chamada da nova função
         elif choice == "5":
             break
 
@@ -5486,25 +10050,25 @@ def remocoes():
         ).execute()
 
         if choice == "1":
-            filter_cpf_removal()
+            run_action(filter_cpf_removal)
         elif choice == "2":
-            filter_remove_by_name()
+            run_action(filter_remove_by_name)
         elif choice == "3":
-            filter_phone_numbers_csv()
+            run_action(filter_phone_numbers_csv)
         elif choice == "4":
-            delete_rows_with_empty_cells()
+            run_action(delete_rows_with_empty_cells)
         elif choice == "5":
-            whitelist_blacklist_removal_num()
+            run_action(whitelist_blacklist_removal_num)
         elif choice == "6":
-            whitelist_blacklist_removal_cpf()  # remove CPFs da blacklist
+            run_action(whitelist_blacklist_removal_cpf)  # remove CPFs da blacklist
         elif choice == "7":
-            remover_duplicatas_cpfs()
+            run_action(remover_duplicatas_cpfs)
         elif choice == "8":
-            apply_blacklist_phones()
+            run_action(apply_blacklist_phones)
         elif choice == "9":
-            remover_duplicatas_phones()
+            run_action(remover_duplicatas_phones)
         elif choice == "10":
-            remove_upag_blacklist()  # <-- Chamada da nova função
+            run_action(remove_upag_blacklist)  # <-- Chamada da nova função
         elif choice == "11":
             break
 
@@ -5530,21 +10094,21 @@ def adicoes_unificacoes():
         ).execute()
 
         if choice == "1":
-            unify_excel_files()
+            run_action(unify_excel_files)
         elif choice == "2":
-            unify_excel_files_with_cpf()
+            run_action(unify_excel_files_with_cpf)
         elif choice == "3":
-            dois_unify_excel_files_with_cpf()
+            run_action(dois_unify_excel_files_with_cpf)
         elif choice == "4":
-            unifique_one()
+            run_action(unifique_one)
         elif choice == "5":
-            merge_ddd_number()
+            run_action(merge_ddd_number)
         elif choice == "6":
-            unify_data_multiple_search_by_cpf_csv()
+            run_action(unify_data_multiple_search_by_cpf_csv)
         elif choice == "7":
-            merge_folder_files_to_csv()
+            run_action(merge_folder_files_to_csv)
         elif choice == "8":
-            unify_files_with_cpf_csv()  # <-- Chamada para a nova função
+            run_action(unify_files_with_cpf_csv)  # <-- Chamada para a nova função
         elif choice == "9":
             break
 
@@ -5572,37 +10136,337 @@ def formatacoes():
         ).execute()
 
         if choice == "1":
-            adjust_cpfs_to_11_digits()
+            run_action(adjust_cpfs_to_11_digits)
         elif choice == "2":
-            format_values_to_money()
+            run_action(format_values_to_money)
         elif choice == "3":
-            format_numbers_with_prefix()
+            run_action(format_numbers_with_prefix)
         elif choice == "4":
-            filter_and_format_rgs()
+            run_action(filter_and_format_rgs)
         elif choice == "5":
-            format_benefit_file()
+            run_action(format_benefit_file)
         elif choice == "6":
-            validate_address_number()
+            run_action(validate_address_number)
         elif choice == "7":
-            validate_sex_column()
+            run_action(validate_sex_column)
         elif choice == "8":
-            format_agency_column()
+            run_action(format_agency_column)
         elif choice == "9":
-            filter_num_nine()
+            run_action(filter_num_nine)
         elif choice == "10":
-            formatar_numeros_para_11_digitos()
+            run_action(formatar_numeros_para_11_digitos)
         elif choice == "11":
-            adicionar_coluna_idade()
+            run_action(adicionar_coluna_idade)
         elif choice == "12":
-            remove_55_prefix_from_phone_columns()
+            run_action(remove_55_prefix_from_phone_columns)
         elif choice == "13":
             # Aqui chamamos a nova função, por ex.:
-            check_phone_correctness_by_cpf()  # <-- Nova chamada
+            run_action(check_phone_correctness_by_cpf)  # <-- Nova chamada
         elif choice == "14":
             break
 
 
 
 
+# --------------------- Interface de linha de comando (não interativa) --------------------- #
+EXIT_OK = 0
+EXIT_ERRO = 1
+EXIT_USO = 2       # argumentos inválidos (argparse)
+EXIT_ENTRADA = 3   # arquivo ou coluna inexistente
+
+
+def build_cli_parser():
+    """Monta o parser da CLI: um subcomando por ação, com flags equivalentes aos prompts do menu."""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="datamagi",
+        description="DataMagi em modo não interativo. Sem argumentos, abre o menu interativo.",
+    )
+    parser.add_argument("--perfil", "--profile", dest="perfil", choices=PROFILE_MODES,
+                        help="Perfila a ação: cpu (cProfile .pstats + pilhas .collapsed) ou memoria (tracemalloc)")
+    parser.add_argument("--perfil-saida", dest="perfil_saida",
+                        help="Prefixo dos artefatos do perfil (padrão: ao lado da saída ou em ~/.datamagi/perfis)")
+    subparsers = parser.add_subparsers(dest="comando", required=True, metavar="COMANDO")
+
+    def add_command(name, step, prefix, help_text):
+        command = subparsers.add_parser(name, help=help_text, description=help_text)
+        command.add_argument("entrada", help="Arquivo de entrada (Excel, CSV, .csv.gz, .csv.zst, Parquet ou Feather)")
+        if name == "particionar":
+            command.add_argument("-o", "--saida", help="Pasta das partições (padrão: <entrada>_por_<coluna> na mesma pasta)")
+        else:
+            command.add_argument("-o", "--saida", help=f"Arquivo de saída (padrão: {prefix}<entrada> na mesma pasta)")
+        command.add_argument("--formato-saida", dest="formato_saida", choices=list(OUTPUT_FORMATS),
+                             help="Formato do arquivo de saída (padrão: extensão de --saida ou formato da entrada)")
+        command.add_argument("--processos", type=int, default=1,
+                             help="CSV: processa o arquivo em blocos paralelos com N processos (padrão: 1)")
+        if name != "particionar":
+            command.add_argument("--particionar-por", dest="particionar_por", metavar="COLUNA",
+                                 help="Grava um arquivo por valor da coluna; --saida passa a ser a pasta das partições")
+        command.set_defaults(passo=step, prefixo=prefix)
+        return command
+
+    command = add_command("filtrar", step_filtrar, "filtered_", "Mantém as linhas em que a coluna tem o valor informado.")
+    command.add_argument("--coluna", required=True)
+    command.add_argument("--valor", required=True)
+
+    command = add_command("filtrar-numerico", step_filtrar_numerico, "numeric_filtered_",
+                          "Filtra valores numéricos maiores que um valor ou entre dois valores.")
+    command.add_argument("--coluna", required=True)
+    command.add_argument("--maior-que", dest="maior_que", type=float)
+    command.add_argument("--minimo", type=float)
+    command.add_argument("--maximo", type=float)
+
+    def condition(text):
+        try:
+            compile_predicate(text)
+        except ValueError as e:
+            raise argparse.ArgumentTypeError(str(e))
+        return text
+
+    command = add_command("filtrar-condicao", step_filtrar_condicao, "filtered_",
+                          "Mantém as linhas que atendem a uma condição: =, !=, >, <, em (...), entre ... e ..., "
+                          "comeca com, termina com, contem, regex, vazio, combinados com e/ou/nao.")
+    command.add_argument("--condicao", required=True, type=condition,
+                         help="Ex.: 'UF em (SP, RJ) e IDADE entre 18 e 60 e nao STATUS = CANCELADO'")
+
+    command = add_command("particionar", None, "",
+                          "Grava um arquivo por valor da coluna (ex.: um por UF) lendo a entrada uma única vez, "
+                          "com um manifesto JSON das partições.")
+    command.add_argument("--coluna", dest="particionar_por", required=True)
+    command.add_argument("--condicao", type=condition, help="Mantém só as linhas que atendem à condição")
+
+    command = add_command("manter-colunas", step_manter_colunas, "kept_columns_", "Mantém apenas as colunas informadas.")
+    command.add_argument("--colunas", nargs="+", required=True)
+
+    command = add_command("remover-colunas", step_remover_colunas, "removed_columns_", "Remove as colunas informadas.")
+    command.add_argument("--colunas", nargs="+", required=True)
+
+    command = add_command("ajustar-cpf", step_normalizar_cpf, "cpfs_ajustados_", "Ajusta os CPFs para 11 dígitos.")
+    command.add_argument("--coluna", required=True)
+
+    command = add_command("deduplicar-cpf", step_deduplicar_cpf, "sem_duplicatas_",
+                          "Normaliza os CPFs e remove duplicatas (mantém a primeira ocorrência).")
+    command.add_argument("--coluna", required=True)
+
+    command = add_command("deduplicar", step_deduplicar, "sem_duplicatas_",
+                          "Remove linhas duplicadas pelas colunas informadas (ex.: telefone).")
+    command.add_argument("--colunas", nargs="+", required=True)
+
+    command = add_command("remover-cpfs", step_remover_cpfs, "cpf_filtered_",
+                          "Remove as linhas cujo CPF está no arquivo de blacklist/remoção.")
+    command.add_argument("--coluna", required=True, help="Coluna de CPF do arquivo de entrada")
+    command.add_argument("--arquivo", required=True, help="Arquivo com os CPFs a remover")
+    command.add_argument("--coluna-arquivo", dest="coluna_arquivo", help="Coluna de CPF do arquivo de remoção (padrão: --coluna)")
+
+    command = add_command("remover-valores", step_remover_valores, "filtra_remove_",
+                          "Remove as linhas cujo valor está no arquivo de blacklist (nomes, UPAGs...).")
+    command.add_argument("--coluna", required=True)
+    command.add_argument("--arquivo", required=True)
+    command.add_argument("--coluna-arquivo", dest="coluna_arquivo")
+    command.add_argument("--maiusculas", action="store_true", help="Compara em caixa alta (ex.: nomes)")
+
+    command = add_command("remover-vazias", step_remover_vazias, "rows_removed_",
+                          "Remove as linhas com células vazias nas colunas informadas.")
+    command.add_argument("--colunas", nargs="+", required=True)
+
+    command = add_command("telefones", step_telefones, "telefones_formatados_", "Formata colunas de telefone.")
+    command.add_argument("--colunas", nargs="+", required=True)
+    command.add_argument("--modo", required=True, choices=["remover-55", "adicionar-55", "11-digitos"])
+
+    command = add_command("formatar-data", step_formatar_data, "data_formatada_", "Padroniza uma coluna de datas.")
+    command.add_argument("--coluna", required=True)
+    command.add_argument("--formato", default="%d/%m/%Y", help="Formato de saída (padrão: %%d/%%m/%%Y)")
+    command.add_argument("--formato-entrada", dest="formato_entrada",
+                         help="Formato de entrada, ex.: %%m/%%d/%%Y (padrão: inferido de uma amostra)")
+    command.add_argument("--saida-invalidos", dest="saida_invalidos",
+                         help="Arquivo para as linhas com data inválida")
+
+    command = add_command("idade", step_idade, "arquivo_com_idade_",
+                          "Adiciona a coluna de idade a partir da data de nascimento "
+                          "(dd/mm/aaaa, ISO ou série do Excel).")
+    command.add_argument("--coluna", required=True)
+    def age_ranges(text):
+        try:
+            parse_age_ranges(text)
+        except ValueError as e:
+            raise argparse.ArgumentTypeError(str(e))
+        return text
+
+    command.add_argument("--faixas", type=age_ranges, help="Cria a coluna 'faixa_etaria', ex.: '18-25,26-59,60+'")
+    command.add_argument("--formato-entrada", dest="formato_entrada",
+                         help="Formato das datas, ex.: %%m/%%d/%%Y (padrão: inferido de uma amostra)")
+
+    command = add_command("cep", step_cep, "cep_validos_", "Valida CEPs e completa os endereços.")
+    command.add_argument("--coluna", required=True, help="Coluna de CEP")
+    command.add_argument("--logradouro", required=True)
+    command.add_argument("--bairro", required=True)
+    command.add_argument("--cidade", required=True)
+    command.add_argument("--uf", required=True)
+    command.add_argument("--provedores", help="Ordem de failover, ex.: 'offline,opencep:20,viacep:5'")
+    command.add_argument("--sem-cache", dest="cache", action="store_false", help="Não usa o cache local de CEPs")
+    command.add_argument("--saida-invalidos", dest="saida_invalidos", help="Arquivo para as linhas com CEP inválido")
+
+    command = add_command("receita", step_receita, "receita_",
+                          "Executa uma receita (JSON/YAML) em memória: uma leitura e uma gravação.")
+    command.add_argument("--receita", required=True, help="Arquivo da receita (.json, .yaml ou .yml)")
+
+    command = subparsers.add_parser("lote", help="Aplica uma receita a todos os arquivos de uma pasta, em paralelo.",
+                                    description="Aplica uma receita a todos os arquivos de uma pasta, em paralelo.")
+    command.add_argument("origem", help="Pasta ou padrão glob dos arquivos (ex.: 'dados/*.xlsx')")
+    command.add_argument("--receita", required=True, help="Arquivo da receita (.json, .yaml ou .yml)")
+    command.add_argument("-o", "--saida", help="Pasta de saída (padrão: <origem>/lote)")
+    command.add_argument("--processos", type=int, help="Processos em paralelo (padrão: um por núcleo)")
+    command.add_argument("--formato-saida", dest="formato_saida", choices=list(OUTPUT_FORMATS), help="Formato de saída (padrão: o de cada entrada)")
+    command.set_defaults(handler=run_batch_command)
+
+    command = subparsers.add_parser("colunar", help="Gera o cache colunar (Parquet) de um arquivo.",
+                                    description="Gera o cache colunar (Parquet) de um arquivo; as próximas "
+                                                "leituras o reutilizam enquanto o arquivo não mudar.")
+    command.add_argument("entrada", help="Arquivo de entrada (.xlsx, .xls, .xlsb ou .csv)")
+    command.set_defaults(handler=run_columnar_command)
+
+    command = subparsers.add_parser("gerar-dados", help="Gera uma base sintética de cadastros (para testes e benchmark).",
+                                    description="Gera uma base sintética e determinística de cadastros brasileiros "
+                                                "(CPF, telefones, CEP, datas, dados bancários, UPAG, nomes).")
+    command.add_argument("saida", help="Arquivo de saída (.csv, .csv.gz, .csv.zst, .xlsx, .parquet ou .feather)")
+    command.add_argument("--linhas", type=int, default=100_000, help="Quantidade de linhas (padrão: 100000)")
+    command.add_argument("--semente", type=int, default=42, help="Semente do gerador (padrão: 42)")
+    command.add_argument("--colunas-extras", dest="colunas_extras", type=int, default=0,
+                         help="Colunas adicionais para simular bases largas (padrão: 0)")
+    command.add_argument("--processos", type=int, help="CSV: processos gerando blocos em paralelo (padrão: um por núcleo)")
+    command.set_defaults(handler=run_generate_command)
+
+    command = subparsers.add_parser("bench", help="Mede tempo e memória de cada ação sobre bases sintéticas.",
+                                    description="Mede tempo, CPU e pico de memória de cada ação de ponta a ponta "
+                                                "(um processo por execução) sobre bases sintéticas.")
+    command.add_argument("--tamanhos", type=int, nargs="+", default=[10_000, 100_000],
+                         help="Quantidades de linhas das bases (padrão: 10000 100000)")
+    command.add_argument("--formatos", nargs="+", default=["csv"], choices=list(OUTPUT_FORMATS),
+                         help="Formatos das bases (padrão: csv)")
+    command.add_argument("--acoes", nargs="+", choices=[*BENCH_STARTUP_CASES, *BENCH_CASES],
+                         help="Ações medidas, incluindo a inicialização (inicio-*) (padrão: todas)")
+    command.add_argument("--pasta", default=os.path.join(os.path.expanduser("~"), ".datamagi", "benchmark"),
+                         help="Pasta das bases geradas e dos resultados (padrão: ~/.datamagi/benchmark)")
+    command.add_argument("--semente", type=int, default=42)
+    command.add_argument("--repeticoes", type=int, default=1, help="Execuções por caso; vale o menor tempo (padrão: 1)")
+    command.add_argument("--colunas-extras", dest="colunas_extras", type=int, default=0)
+    command.add_argument("--resultados", help="Arquivo JSON lines onde os resultados são acrescentados "
+                                              "(padrão: <pasta>/benchmark.jsonl)")
+    command.add_argument("--comparar", help="Resultados anteriores (JSON lines) para detectar regressões")
+    command.add_argument("--tolerancia", type=float, default=0.2,
+                         help="Variação aceita em relação a --comparar (padrão: 0.2 = 20%%)")
+    command.set_defaults(handler=run_benchmark_command)
+
+    return parser
+
+
+def run_cli(argv=None):
+    """
+    Executa uma ação sem prompts e escreve um resumo em JSON (uma linha) na saída padrão.
+    Retorna o código de saída do processo (EXIT_*). Sem argumentos, abre o menu interativo.
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        if inquirer is None:
+            sys.stderr.write("InquirerPy não está instalado; use os subcomandos da CLI (--help).\n")
+            return EXIT_ERRO
+        main()
+        return EXIT_OK
+
+    args = build_cli_parser().parse_args(argv)
+    # Execução única: o cache da sessão só serve ao menu (inclui os arquivos auxiliares dos passos)
+    disable_frame_cache()
+    if getattr(args, "handler", None):
+        if not args.perfil:
+            return args.handler(args)
+        stamp = time.strftime("%Y%m%d_%H%M%S")
+        profiler = ActionProfiler(args.perfil, args.perfil_saida or os.path.join(PROFILE_DIR, f"{args.comando}_{stamp}"))
+        with profiler:
+            code = args.handler(args)
+        sys.stderr.write(f"Perfil ({args.perfil}) gravado em: {', '.join(profiler.artifacts)}\n")
+        return code
+    params = {key: value for key, value in vars(args).items()
+              if key not in ("comando", "entrada", "saida", "passo", "prefixo", "processos", "formato_saida",
+                             "perfil", "perfil_saida", "particionar_por")}
+    if args.particionar_por:
+        # Partições: a saída é uma pasta; o formato vai para run_partitioned
+        output_file = args.saida or partition_dir_for(args.entrada, args.prefixo, args.particionar_por)
+    else:
+        output_file = args.saida or output_path_for(args.entrada, os.path.dirname(args.entrada), args.prefixo)
+        if args.formato_saida:
+            output_file = with_table_extension(output_file, OUTPUT_FORMATS[args.formato_saida])
+    summary = {"acao": args.comando, "entrada": args.entrada, "saida": output_file}
+    profiler = nullcontext()
+    if args.perfil:
+        # Os artefatos ficam ao lado da saída: <saida>.perfil.pstats, <saida>.perfil.collapsed, ...
+        profiler = ActionProfiler(args.perfil, args.perfil_saida or output_file)
+        summary["perfil"] = profiler.artifacts
+    started = time.perf_counter()
+    metrics = ActionMetrics(args.comando, origin="cli", entrada=args.entrada, saida=output_file)
+
+    def finish(status, exit_code, **extra):
+        metrics.status = status
+        summary.update(status=status, codigo_saida=exit_code, duracao_s=round(time.perf_counter() - started, 3), **extra)
+        if metrics.stages:
+            summary["etapas"] = metrics.stages
+        sys.stdout.write(json.dumps(summary, ensure_ascii=False, default=str) + "\n")
+        level = logging.INFO if exit_code == EXIT_OK else logging.ERROR
+        logging.log(level, f"CLI {args.comando}: {summary}")
+        return exit_code
+
+    if not os.path.isfile(args.entrada):
+        return finish("erro", EXIT_ENTRADA, erro=f"Arquivo não encontrado: {args.entrada}")
+
+    with profiler, metrics:
+        return _run_cli_command(args, params, output_file, finish)
+
+
+def _run_cli_command(args, params, output_file, finish):
+    """Executa o subcomando (em memória, por projeção ou em blocos) e chama `finish` com o resultado."""
+    try:
+        if args.comando == "receita":
+            recipe = load_recipe(args.receita)
+            steps, info = recipe["passos"], {"receita": recipe["nome"]}
+        elif args.comando == "particionar":
+            steps, info = [], {}
+            if args.condicao:
+                steps = [("filtrar-condicao", step_filtrar_condicao, {"condicao": args.condicao})]
+        else:
+            steps, info = [(args.comando, args.passo, params)], {}
+
+        if args.particionar_por:
+            info.update(run_partitioned(args.entrada, args.particionar_por, output_file, steps,
+                                        formato=args.formato_saida))
+            rows_in, rows_out = info.pop("linhas_entrada"), info.pop("linhas_saida")
+        elif args.processos > 1 and args.entrada.lower().endswith(CSV_EXTENSIONS):
+            info.update(run_chunked(args.entrada, steps, output_file, workers=args.processos))
+            rows_in, rows_out = info.pop("linhas_entrada"), info.pop("linhas_saida")
+        elif projection_columns(steps) is not None and supports_streaming(args.entrada):
+            # Só filtros/remoções: lê as colunas-chave e grava as linhas mantidas em blocos
+            info.update(run_projected(args.entrada, steps, output_file))
+            rows_in, rows_out = info.pop("linhas_entrada"), info.pop("linhas_saida")
+        else:
+            df = read_table(args.entrada, cache=False)
+            rows_in = len(df)
+            memory = memory_summary(df)
+            # A receita registra uma etapa por passo (apply_recipe); as demais ações, uma etapa só
+            step_stage = nullcontext({}) if args.comando == "receita" else metrics_stage(args.comando, linhas_entrada=rows_in)
+            with step_stage as stage:
+                result = args.passo(df, **params)
+                df, info = result if isinstance(result, tuple) else (result, {})
+                stage["linhas_saida"] = len(df)
+            if memory:
+                info["memoria"] = memory
+            write_table(df, output_file)
+            rows_out = len(df)
+    except (KeyError, FileNotFoundError) as e:
+        return finish("erro", EXIT_ENTRADA, erro=f"Coluna ou arquivo inexistente: {e}")
+    except Exception as e:
+        return finish("erro", EXIT_ERRO, erro=str(e))
+
+    return finish("ok", EXIT_OK, linhas_entrada=rows_in, linhas_saida=rows_out, **info)
+
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(run_cli())